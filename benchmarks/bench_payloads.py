@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Compare building order bodies per request with the pre-encoded pools
+
+Every case produces the bytes that go on the wire, on a single core.
+The multipart case before the pools includes writing out the
+`FormData`, which aiohttp does when it sends the request.
+
+Run from the root of the repository:
+
+    > python benchmarks/bench_payloads.py
+"""
+import io
+import json
+import random
+import timeit
+
+from aiohttp import FormData
+
+from loadgen.payloads import csv_orders, json_orders
+
+NUMBER = 20000
+
+
+class Buffer(object):
+    __slots__ = ('size',)
+
+    def __init__(self):
+        self.size = 0
+
+    async def write(self, data):
+        self.size += len(data)
+
+
+def build_json():
+    data = {
+        'customer_id': random.randint(1, 1000),
+        'lines': [],
+    }
+    for i in range(0, random.randint(1, 5)):
+        data['lines'].append({
+            'id': random.randint(1, 6),
+            'amount': random.randint(1, 4)
+        })
+    return len(json.dumps(data).encode('utf-8'))
+
+
+def _drive(coro):
+    # The buffer never waits, so the coroutine finishes in one step
+    try:
+        coro.send(None)
+    except StopIteration:
+        pass
+
+
+def build_csv():
+    customer_id = random.randint(1, 1000)
+    lines = []
+    for i in range(0, random.randint(1, 5)):
+        lines.append(','.join(map(str, [
+            random.randint(1, 6), random.randint(1, 4)
+        ])))
+    data = FormData()
+    data.add_field('customer', str(customer_id))
+    data.add_field(
+        'file',
+        io.BytesIO('\n'.join(lines).encode('utf8')),
+        filename='data.csv',
+        content_type='text/plain'
+    )
+    buf = Buffer()
+    _drive(data().write(buf))
+    return buf.size
+
+
+def main():
+    json_pool = json_orders()
+    csv_pool = csv_orders()
+    cases = [
+        (
+            'order json',
+            build_json,
+            lambda: len(json_pool.next()),
+        ),
+        (
+            'order csv multipart',
+            build_csv,
+            lambda: len(csv_pool.next()),
+        ),
+    ]
+    print('%d bodies each, on one core' % NUMBER)
+    print('%-20s %10s %10s %12s %12s' % (
+        '', 'ns before', 'ns after', 'MB/s before', 'MB/s after'))
+    for name, before, after in cases:
+        size = sum(after() for _ in range(len(json_pool))) / len(json_pool)
+        times = [
+            min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER
+            for func in (before, after)
+        ]
+        print('%-20s %10.0f %10.0f %12.1f %12.1f' % (
+            name, times[0] * 1e9, times[1] * 1e9,
+            size / times[0] / 1e6, size / times[1] / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Compare drawing IDs per request with taking them from a sampler
+
+The sampler draws its blocks in a background thread, so the time spent
+drawing is left out of its per-request cost but still uses the CPU.
+`blocks` is the time to draw one ID of a block, whoever draws it.
+
+Run from the root of the repository:
+
+    > python benchmarks/bench_sampler.py
+"""
+import random
+import timeit
+
+from loadgen.alias import AliasTable
+from loadgen.sampler import BLOCK, Sampler, numpy, uniform, zipf
+
+NUMBER = 200000
+IDS = 1000
+
+
+def main():
+    law = zipf(IDS, 1.1)
+    alias = AliasTable(range(IDS), law.weights)
+    rng = random.Random(1)
+    if numpy is not None:
+        rng = numpy.random.default_rng(1)
+    cases = [
+        (
+            'uniform',
+            lambda: random.randint(0, IDS - 1),
+            Sampler(uniform(IDS)).next,
+            lambda: uniform(IDS).draw(rng, BLOCK),
+        ),
+        (
+            'zipf',
+            alias.pick,
+            Sampler(law).next,
+            lambda: law.draw(rng, BLOCK),
+        ),
+    ]
+    print('%d IDs each, ns/request, %s' % (
+        NUMBER, 'with NumPy' if numpy is not None else 'without NumPy'))
+    print('%-10s %10s %10s %10s' % ('', 'before', 'after', 'blocks'))
+    for name, before, after, block in cases:
+        times = [
+            min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER * 1e9
+            for func in (before, after)
+        ]
+        times.append(min(timeit.repeat(block, number=20, repeat=5))
+                     / 20 / BLOCK * 1e9)
+        print('%-10s %10.0f %10.0f %10.0f' % (name, times[0], times[1],
+                                              times[2]))
+
+
+if __name__ == '__main__':
+    main()
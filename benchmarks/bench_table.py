@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Compare Molotov's weighted scenario pick with the alias table
+
+Run from the root of the repository:
+
+    > python benchmarks/bench_table.py
+"""
+import timeit
+
+import molotov
+from molotov.api import pick_scenario
+
+from loadgen.live import LiveConfig
+from loadgen.table import ScenarioTable
+
+# The weights registered by scenarios/molotov_scenarios.py for opbeans-python
+WEIGHTS = [2, 8, 7, 8, 6, 6, 6, 8, 8, 8, 8, 2, 8, 8, 1, 2, 1, 2]
+NUMBER = 200000
+
+
+def _coroutine():
+    async def _scenario(session):
+        pass
+    return _scenario
+
+
+def main():
+    table = ScenarioTable(LiveConfig(defaults={'error_weight': 2}))
+    for i, weight in enumerate(WEIGHTS):
+        molotov.scenario(weight=weight, name='molotov_%d' % i)(_coroutine())
+        table.entries.append(('table_%d' % i, weight, None))
+    table.pick()
+
+    results = [
+        ('molotov pick_scenario', lambda: pick_scenario(0, 0)),
+        ('ScenarioTable.pick', lambda: table.pick(0, 0)),
+        ('AliasTable.pick', table._alias.pick),
+    ]
+    print('%d scenarios, %d picks each' % (len(WEIGHTS), NUMBER))
+    for name, func in results:
+        elapsed = min(timeit.repeat(func, number=NUMBER, repeat=5))
+        print('%-24s %8.0f ns/pick' % (name, elapsed / NUMBER * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Compare building request URLs per request with the pre-built catalogue
+
+Run from the root of the repository:
+
+    > python benchmarks/bench_urls.py
+"""
+import random
+import timeit
+from urllib.parse import urljoin
+
+from loadgen.urls import URLCatalogue
+
+SERVER_URL = 'http://toxi:9999'
+NUMBER = 200000
+
+
+def join(base_url, *fragments):
+    path = '/'.join(fragments)
+    return urljoin(base_url, path)
+
+
+def main():
+    URLS = URLCatalogue(SERVER_URL)
+    STATS_URL = URLS.join('api', 'stats')
+    CUSTOMER_URLS = URLS.ids('api/customers/{}', 1, 1000)
+    PRODUCT_CUSTOMERS_LIMIT_URLS = URLS.product(
+        'api/products/{}/customers?limit={}', range(1, 7), range(50, 120, 10))
+
+    cases = [
+        (
+            'static path',
+            lambda: join(SERVER_URL, 'api', 'stats'),
+            lambda: STATS_URL,
+        ),
+        (
+            'customer id',
+            lambda: join(SERVER_URL, 'api', 'customers', str(random.randint(1, 1000))),  # noqa
+            CUSTOMER_URLS.pick,
+        ),
+        (
+            'product customers limit',
+            lambda: join(SERVER_URL, 'api', 'products', str(random.randint(1, 6)), 'customers?limit=%d' % (random.randint(5, 11) * 10)),  # noqa
+            PRODUCT_CUSTOMERS_LIMIT_URLS.pick,
+        ),
+    ]
+    print('%d URLs each, ns/request' % NUMBER)
+    print('%-24s %10s %10s' % ('', 'before', 'after'))
+    for name, before, after in cases:
+        times = [
+            min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER * 1e9
+            for func in (before, after)
+        ]
+        print('%-24s %10.0f %10.0f' % (name, times[0], times[1]))
+
+
+if __name__ == '__main__':
+    main()
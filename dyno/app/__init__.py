@@ -24,6 +24,7 @@ from flask_socketio import SocketIO
 from flask_cors import CORS
 from werkzeug.utils import import_string
 from . import cfg
+from .events import BUS
 
 def _env_init(app_env):
     """
@@ -93,11 +94,18 @@ def create_app(app_env='prod'):
     app.config.from_object(config_class)
     CORS(app)
     from .api import bp as api_bp  # noqa E402
+    from .api import cluster, control  # noqa E402
     app.register_blueprint(api_bp, url_prefix=app.config['API_PREFIX'])
+    cluster.init_app(app)
+    if not app.testing:
+        # Only the app which serves requests watches the jobs it starts
+        app.before_first_request(control.SUPERVISOR.start)
+        app.before_first_request(control.STREAM.start)
     return app
 
 app = create_app()
 socketio = SocketIO(app, cors_allowed_origins=app.config['CORS_ORIGINS'])
+BUS.init_app(app, socketio)
 
 @app.route('/log')
 def index():
@@ -4,3 +4,4 @@ from flask import Blueprint
 bp = Blueprint('api', __name__)
 
 from . import control  # noqa E402
+from . import cluster  # noqa E402
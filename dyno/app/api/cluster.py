@@ -0,0 +1,493 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Running one job across several Dyno hosts
+
+A Dyno started with `DYNO_ROLE=agent` registers itself with the Dyno
+at `DYNO_COORDINATOR_URL` every `HEARTBEAT_INTERVAL` seconds, giving
+`DYNO_AGENT_URL` as the address the coordinator can reach it on. A Dyno
+started with `DYNO_ROLE=coordinator` accepts those registrations and
+runs cluster jobs through its ordinary /api endpoints on the agents:
+
+* /api/cluster/start splits the rate and workers of a job evenly between
+  the live agents and starts it on each of them with the same
+  `start_at`, so the agents start sending together.
+* /api/cluster/stats merges the raw stats of every agent before the
+  percentiles are computed.
+* An agent which misses its heartbeats for `AGENT_TIMEOUT` seconds is
+  taken off its jobs, its share of every job is handed to the agents
+  which are left through /api/update, and it is sent /api/stop for each
+  job, until it answers. An agent which fails an update keeps its place
+  and is sent its share again on the next round.
+
+Several agents can run on one host as long as each listens on a port of
+its own.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from . import bp
+from flask import request
+from loadgen import report
+from loadgen.shard import Shard
+
+STANDALONE = 'standalone'
+COORDINATOR = 'coordinator'
+AGENT = 'agent'
+
+ROLE = os.environ.get('DYNO_ROLE', STANDALONE)
+
+# Where an agent registers
+COORDINATOR_URL = os.environ.get('DYNO_COORDINATOR_URL')
+
+# Where the coordinator reaches an agent
+AGENT_URL = os.environ.get('DYNO_AGENT_URL')
+
+# Seconds between two registrations of an agent
+HEARTBEAT_INTERVAL = float(os.environ.get('DYNO_HEARTBEAT_INTERVAL', 2.0))
+
+# Seconds without a registration after which an agent is taken off its jobs
+AGENT_TIMEOUT = 3 * HEARTBEAT_INTERVAL
+
+# Seconds between a cluster start request and the time the agents start
+# sending, which covers launching the job processes on every agent
+START_LEAD = 2.0
+
+# Seconds to wait for an agent to answer
+REQUEST_TIMEOUT = 5.0
+
+""" Public HTTP methods """
+
+
+@bp.route('/cluster/register', methods=['POST'])
+def register_agent() -> dict:
+    """
+    Register an agent, or renew its registration
+
+    Exposed via HTTP at /api/cluster/register
+
+    Supported HTTP methods: POST
+
+    Parameters
+    ----------
+    url : str
+        The base URL the coordinator reaches the agent on
+
+    Examples
+    --------
+    Sample JSON payload to send to this endpoint:
+    > {"url":"http://10.0.0.2:8999"}
+    """
+    if ROLE != COORDINATOR:
+        return "Not a coordinator", 400
+    r = request.get_json() or {}
+    url = r.get('url')
+    if not url:
+        return "Must supply url", 400
+    with LOCK:
+        AGENTS[url.rstrip('/')] = {'last_seen': time.time()}
+    return {}
+
+
+@bp.route('/cluster/agents', methods=['GET'])
+def get_agents() -> dict:
+    """
+    List the registered agents
+
+    Exposed via HTTP at /api/cluster/agents
+
+    Supported HTTP methods: GET
+
+    Returns
+    -------
+    dict
+        The agents keyed by URL, with when each was last seen and
+        whether it is still considered alive
+
+    Examples
+    --------
+    ❯ curl -s http://localhost:8999/api/cluster/agents|jq
+    {
+      "http://10.0.0.2:8999": {
+        "alive": true,
+        "last_seen": 1600000042.0
+      }
+    }
+    """
+    now = time.time()
+    with LOCK:
+        return {
+            url: dict(agent, alive=_is_alive(agent, now))
+            for url, agent in AGENTS.items()
+        }
+
+
+@bp.route('/cluster/start', methods=['POST'])
+def start_cluster_job() -> dict:
+    """
+    Start a job on every live agent
+
+    Exposed via HTTP at /api/cluster/start
+
+    Supported HTTP methods: POST
+
+    Parameters
+    ----------
+    The same as for /api/start. `rate` and `workers` are the totals for
+    the whole cluster and are split evenly between the agents. Every
+    other parameter is passed to the agents as it is.
+
+    Returns
+    -------
+    dict
+        The `start_at` time the agents start sending at and the share
+        of the job each agent was given
+
+    Examples
+    --------
+    Sample JSON payload to send to this endpoint:
+    > {"job":"opbeans-python","port":"8000","rate":3000}
+    """
+    if ROLE != COORDINATOR:
+        return "Not a coordinator", 400
+    r = request.get_json() or {}
+    if not r.get('job'):
+        return "Must supply job", 400
+    job = r['job'].replace('opbeans-', '')
+    config = dict(r, job=job)
+    config.setdefault('workers', '3')
+    agents = _live_agents()
+    if not agents:
+        return "No agents available", 503
+    start_at = time.time() + START_LEAD
+    with LOCK:
+        previous = CLUSTER_JOBS.get(job) or {}
+        stopping = previous.get('stopping', []) + previous.get('agents', [])
+        CLUSTER_JOBS[job] = {
+            'config': config,
+            'agents': agents,
+            'shares': {},
+            'pending': [],
+            'stopping': [url for url in stopping if url not in agents],
+        }
+    _rebalance_job(job, start_at=start_at)
+    with LOCK:
+        cluster_job = CLUSTER_JOBS.get(job)
+        if not cluster_job or not cluster_job['agents']:
+            return "No agent started the job", 503
+        return {'start_at': start_at, 'agents': cluster_job['shares']}
+
+
+@bp.route('/cluster/stop', methods=['GET'])
+def stop_cluster_job() -> dict:
+    """
+    Stop a job on every agent running it
+
+    Exposed via HTTP at /api/cluster/stop
+
+    Supported HTTP methods: GET
+
+    Parameters
+    ----------
+    job : str
+        The job to stop
+
+    Examples
+    --------
+    > curl http://localhost:8999/api/cluster/stop?job=opbeans-python
+    """
+    job = (request.args.get('job') or '').replace('opbeans-', '')
+    with LOCK:
+        cluster_job = CLUSTER_JOBS.pop(job, None)
+    if cluster_job is not None:
+        _fan_out(cluster_job['agents'] + cluster_job['stopping'], 'GET',
+                 '/api/stop?job=' + job)
+    return {}
+
+
+@bp.route('/cluster/stats', methods=['GET'])
+def get_cluster_stats() -> dict:
+    """
+    Fetch the stats of a job merged over every agent running it
+
+    Exposed via HTTP at /api/cluster/stats
+
+    Supported HTTP methods: GET
+
+    Parameters
+    ----------
+    job : str
+        The job to return the stats of
+
+    Returns
+    -------
+    dict
+        The stats as returned by /api/stats for a single Dyno, with
+        `agents` holding the number of agents which answered. The
+        histograms of all agents are merged before the percentiles are
+        taken, so the percentiles hold for the whole cluster.
+    """
+    job = (request.args.get('job') or '').replace('opbeans-', '')
+    with LOCK:
+        cluster_job = CLUSTER_JOBS.get(job)
+        agents = list(cluster_job['agents']) if cluster_job else []
+    replies = _fan_out(agents, 'GET', '/api/stats?raw=1&job=' + job)
+    snapshots = [
+        reply[job] for reply in replies.values()
+        if reply is not None and job in reply
+    ]
+    ret = report.merge(snapshots)
+    ret['processes'] = sum(s.get('processes', 0) for s in snapshots)
+    ret['agents'] = len(snapshots)
+    return {job: report.summarize(ret)}
+
+
+""" Private helper functions """
+
+
+def _is_alive(agent: dict, now: float) -> bool:
+    return now - agent['last_seen'] < AGENT_TIMEOUT
+
+
+def _live_agents() -> list:
+    """
+    Return the URLs of the agents which are still sending heartbeats
+    """
+    now = time.time()
+    with LOCK:
+        return sorted(
+            url for url, agent in AGENTS.items() if _is_alive(agent, now)
+        )
+
+
+def _call_agent(url: str, method: str, path: str, body=None):
+    """
+    Send a request to an agent and return its JSON response
+
+    Raises
+    ------
+    OSError
+        If the agent cannot be reached or the request failed
+    """
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = Request(
+        url + path,
+        data=data,
+        method=method,
+        headers={'Content-Type': 'application/json'},
+    )
+    with urlopen(req, timeout=REQUEST_TIMEOUT) as res:
+        return json.loads(res.read().decode('utf-8') or '{}')
+
+
+def _fan_out(agents, method: str, path: str, bodies=None) -> dict:
+    """
+    Send the same request, or one body per agent, to several agents at
+    once
+
+    Returns
+    -------
+    dict
+        The response of each agent keyed by URL, or None if it failed
+    """
+    bodies = bodies or {}
+
+    def _call(url):
+        try:
+            return _call_agent(url, method, path, bodies.get(url))
+        except (OSError, URLError, ValueError):
+            return None
+
+    agents = list(agents)
+    if not agents:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(agents)) as pool:
+        return dict(zip(agents, pool.map(_call, agents)))
+
+
+def _shares(config: dict, agents: list) -> dict:
+    """
+    Split the rate, load shape and workers of a job between agents, the
+    same way the processes of a sharded job split them
+    """
+    ret = {}
+    for index, url in enumerate(agents):
+        shard = Shard(index, len(agents))
+        share = {'workers': shard.split(float(config['workers']))}
+        if config.get('rate'):
+            share['rate'] = shard.scale(float(config['rate']))
+        if config.get('shape'):
+            share['shape_scale'] = shard.scale(1.0)
+        ret[url] = share
+    return ret
+
+
+def _rebalance_job(job: str, start_at=None) -> None:
+    """
+    Spread a cluster job over its live agents.
+
+    With `start_at`, the job is started on every agent. Otherwise the
+    agents which are still running the job are given their new share
+    through /api/update. Agents which stopped sending heartbeats are
+    taken off the job and sent /api/stop. If an agent fails to start
+    the job, it is sent /api/stop too and the job is spread again over
+    the agents which are left. An agent which fails an update keeps
+    its place and is sent its share again by `rebalance()`.
+    """
+    while True:
+        live_agents = set(_live_agents())
+        with LOCK:
+            cluster_job = CLUSTER_JOBS.get(job)
+            if cluster_job is None:
+                return
+            agents = [a for a in cluster_job['agents'] if a in live_agents]
+            retired = [a for a in cluster_job['agents'] if a not in agents]
+            config = cluster_job['config']
+        shares = _shares(config, agents)
+        if start_at is not None:
+            path = '/api/start'
+            bodies = {
+                url: dict(config, start_at=start_at, **share)
+                for url, share in shares.items()
+            }
+        else:
+            path = '/api/update'
+            bodies = {
+                url: dict(share, job=job) for url, share in shares.items()
+            }
+        replies = _fan_out(agents, 'POST', path, bodies)
+        failed = [url for url, reply in replies.items() if reply is None]
+        with LOCK:
+            cluster_job = CLUSTER_JOBS.get(job)
+            if cluster_job is None:
+                return
+            if start_at is None:
+                # An agent which failed an update is still running its
+                # old share, which is sent again on the next round
+                cluster_job['pending'] = failed
+                failed = []
+            else:
+                cluster_job['pending'] = []
+            retired += failed
+            cluster_job['agents'] = [a for a in agents if a not in failed]
+            cluster_job['shares'] = {
+                url: shares[url] for url in cluster_job['agents']
+            }
+            cluster_job['stopping'] += [
+                url for url in retired if url not in cluster_job['stopping']
+            ]
+        _stop_agents(job, retired)
+        if not failed:
+            return
+        # Hand the shares of the agents which did not start to the rest
+        start_at = None
+
+
+def _stop_agents(job: str, agents: list) -> None:
+    """
+    Send /api/stop for a job to agents which were taken off it. The
+    agents which answer are forgotten, the rest are tried again by
+    `rebalance()` once they send heartbeats.
+    """
+    replies = _fan_out(agents, 'GET', '/api/stop?job=' + job)
+    stopped = {url for url, reply in replies.items() if reply is not None}
+    with LOCK:
+        cluster_job = CLUSTER_JOBS.get(job)
+        if cluster_job is not None:
+            cluster_job['stopping'] = [
+                url for url in cluster_job['stopping'] if url not in stopped
+            ]
+
+
+def rebalance() -> None:
+    """
+    Hand the share of every agent which has stopped sending heartbeats
+    to the agents which are left, send again the shares which an agent
+    failed to take, and stop the jobs of agents which were taken off
+    them and can be reached again
+    """
+    live_agents = set(_live_agents())
+    with LOCK:
+        jobs = [
+            job for job, cluster_job in CLUSTER_JOBS.items()
+            if set(cluster_job['agents']) - live_agents or
+            cluster_job['pending']
+        ]
+        stopping = {
+            job: [url for url in cluster_job['stopping']
+                  if url in live_agents]
+            for job, cluster_job in CLUSTER_JOBS.items()
+        }
+    for job in jobs:
+        _rebalance_job(job)
+    for job, agents in stopping.items():
+        if agents:
+            _stop_agents(job, agents)
+
+
+def _monitor() -> None:
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        rebalance()
+
+
+def _heartbeat() -> None:
+    while True:
+        try:
+            _call_agent(
+                COORDINATOR_URL,
+                'POST',
+                '/api/cluster/register',
+                {'url': AGENT_URL}
+            )
+        except (OSError, URLError, ValueError):
+            # The coordinator may not be up yet
+            pass
+        time.sleep(HEARTBEAT_INTERVAL)
+
+
+def init_app(app) -> None:
+    """
+    Start the background work of the role this Dyno was given:
+    heartbeats for an agent and dropping silent agents for a
+    coordinator. Nothing is started under test.
+    """
+    if app.testing:
+        return
+    if ROLE == AGENT:
+        if not (COORDINATOR_URL and AGENT_URL):
+            raise Exception(
+                'An agent needs DYNO_COORDINATOR_URL and DYNO_AGENT_URL'
+            )
+        target = _heartbeat
+    elif ROLE == COORDINATOR:
+        target = _monitor
+    else:
+        return
+    threading.Thread(target=target, daemon=True).start()
+
+
+# The registered agents, keyed by URL, and the jobs run on them
+AGENTS = {}
+CLUSTER_JOBS = {}
+LOCK = threading.Lock()
@@ -1,17 +1,158 @@
 # -*- coding: utf-8 -*-
+import json
 import os
 import subprocess
-import signal
+import threading
+import time
+import traceback
 
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 from . import bp
-import socketio
 from flask import request
+from .. import autotune
+from loadgen import live, report, sampler
+from loadgen.engine_client import (
+    EngineClient,
+    EngineError,
+    RemoteJob,
+    WarmJob,
+    ZygoteClient,
+)
+from loadgen.shape import Shape
+from loadgen.shard import SHARD_ENV, SHARDS_ENV, ShardGroup
+from loadgen.settings import (PAYLOAD_ENV, POOL_ENV, REPLAY_ENV, SEED_ENV,
+                              SPEC_ENV, STATSD_ENV)
+from ..events import BUS
+from ..registry import ScenarioRegistry
+from ..store import RUNNING, STOPPED, JobStore, adopt
+from ..stream import StatsStream
+from ..supervisor import Supervisor
 
 # TODO Pull this from config object instead
 DEBUG = os.environ.get('DYNO_DEBUG')
 
+# Where per-job files such as the live configuration are kept
+RUNTIME_DIR = os.environ.get('DYNO_RUNTIME_DIR', '/tmp/dyno')
+
+# Where the jobs are recorded so that a restarted Dyno can pick them up
+STATE_FILE = os.environ.get(
+    'DYNO_STATE_FILE',
+    os.path.join(RUNTIME_DIR, 'jobs.jsonl')
+)
+
+# The number of Molotov workers started for a job unless more are
+# requested. Workers above the configured count sit idle so that the
+# count can be raised later without restarting the job.
+MAX_WORKERS = 32
+
+# Configuration keys which can be applied to a running job
+LIVE_KEYS = (
+    'workers',
+    'error_weight',
+    'app_latency_weight',
+    'app_latency_label',
+    'app_latency_lower_bound',
+    'app_latency_upper_bound',
+    'rate',
+    'arrival',
+    'max_in_flight',
+    'start_at',
+    'shape',
+    'shape_start',
+    'shape_scale',
+    'replay_speed',
+    'replay_loop',
+    'payload_seed',
+    'ids',
+    )
+
+# Configuration keys for open-loop jobs. See `loadgen.arrival`.
+ARRIVAL_KEYS = ('rate', 'arrival', 'max_in_flight')
+
+# Configuration keys which hold a job back until an agreed time, so that
+# the agents of a cluster job start together. See `dyno.app.api.cluster`.
+SYNC_KEYS = ('start_at',)
+
+# Configuration keys for jobs whose rate follows a load shape. See
+# `loadgen.shape`.
+SHAPE_KEYS = ('shape', 'shape_start', 'shape_scale')
+
+# Configuration keys for jobs which replay a capture. See `loadgen.replay`.
+REPLAY_KEYS = ('replay_speed', 'replay_loop')
+
+# Configuration keys for the pools of pre-encoded request bodies. See
+# `loadgen.payloads`.
+PAYLOAD_KEYS = ('payload_seed',)
+
+# Configuration keys for the distribution of the IDs which scenarios
+# request. See `loadgen.sampler`.
+ID_KEYS = ('ids',)
+
+# The directory which holds the scenario files, specs and JSONL captures
+SCENARIO_DIR = os.path.realpath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), '../../../scenarios'))
+
+# The extension of a scenario which is a capture of recorded requests
+CAPTURE_EXT = '.jsonl'
+
+# The scenario file which replays a capture
+REPLAY_SCENARIO_FILE = 'loadgen/replay_scenario.py'
+
+# The extension of a scenario which is a declarative spec
+SPEC_EXT = '.json'
+
+# The scenario file which runs a spec
+SPEC_SCENARIO_FILE = 'loadgen/spec_scenario.py'
+
+# The scenario file which runs each kind of scenario which is not a
+# Python file, and the environment variable which names the scenario
+RUNNERS = {
+    CAPTURE_EXT: (REPLAY_SCENARIO_FILE, REPLAY_ENV),
+    SPEC_EXT: (SPEC_SCENARIO_FILE, SPEC_ENV),
+}
+
+# The control socket of the engine which runs jobs started with
+# `"mode": "engine"`. See `loadgen.engine`.
+ENGINE_SOCKET = os.path.join(RUNTIME_DIR, 'engine.sock')
+
+# Seconds to wait for a newly started engine to answer
+ENGINE_START_TIMEOUT = 10.0
+
+# The control socket of the zygote which forks jobs started with
+# `"mode": "warm"`. See `loadgen.zygote`.
+ZYGOTE_SOCKET = os.path.join(RUNTIME_DIR, 'zygote.sock')
+
+# Where jobs send their metrics
+STATSD_ADDRESS = 'udp://stats-d:8125'
+
+# Configuration keys for the shared connection pool and the stats-d sink,
+# with the environment variables they are passed to the job in. Changing
+# any of them restarts the job.
+ENV_KEYS = dict(POOL_ENV)
+ENV_KEYS['statsd_interval'] = STATSD_ENV['statsd_interval']
+ENV_KEYS['statsd_sample_rate'] = STATSD_ENV['statsd_sample_rate']
+ENV_KEYS.update(PAYLOAD_ENV)
+ENV_KEYS.update(SEED_ENV)
+
+# Status keys which are not part of the configuration of a job
+STATUS_ONLY_KEYS = (
+    'running', 'counters', 'exit_code', 'runtime', 'restarts',
+    'target_rate', 'phase',
+)
+
+# Configuration keys which only take effect when a job is (re)started
+RESTART_KEYS = tuple(ENV_KEYS) + ('mode', 'processes', 'pin', 'restart')
+
+# The actions of /api/jobs/batch
+BATCH_ACTIONS = ('start', 'update', 'stop')
+
+# The most jobs of a batch which are handled at the same time
+BATCH_WORKERS = 16
+
+# The file in the directory of a job which holds its autotune curve
+AUTOTUNE_FILE = 'autotune.json'
+
 """ Public HTTP methods """
 
 
@@ -35,7 +176,9 @@ def start_job() -> dict:
         The port number to target
 
     scenario : str
-        The scenario to launch. Defaults to `molotov_scenarios`
+        The scenario to launch. Defaults to `molotov_scenarios`. A
+        scenario which does not exist or cannot be run is refused with
+        a 400 which says why.
 
     duration : str
         The duration for the test to run in seconds. Default is 365 *days*.
@@ -79,12 +222,137 @@ def start_job() -> dict:
         The upper bound of latency which should be applied to requests which
         hit the delayed endpoint
 
+    max_workers : str
+        The number of Molotov workers to start. Only `workers` of them
+        generate load and the rest wait, so `workers` can later be raised
+        up to this value through /api/update without restarting the job.
+        Defaults to 32 or `workers`, whichever is higher.
+
+    rate : float
+        Run the job open-loop at this many requests per second instead
+        of using `delay` and `workers`. Requests are sent on schedule no
+        matter how long earlier responses take.
+
+    arrival : str
+        The arrival process for an open-loop job. Either `fixed` for
+        evenly spaced requests or `poisson`. Defaults to `fixed`.
+
+    max_in_flight : int
+        The cap on concurrent requests for an open-loop job. Sends which
+        would exceed it are skipped and counted as missed. Defaults
+        to 1000.
+
+    pool_size : int
+        The cap on open connections shared by all workers of the job.
+        Defaults to 0, for no cap.
+
+    pool_per_host : int
+        The cap on open connections to the target. Defaults to 0,
+        for no cap.
+
+    keepalive_timeout : float
+        How many seconds an idle connection is kept open for reuse.
+        Defaults to 60.
+
+    dns_ttl : float
+        How many seconds a resolved address is cached. Defaults to 0,
+        which caches it for the life of the job.
+
+    statsd_interval : float
+        How many seconds metrics are gathered before they are sent to
+        stats-d. Defaults to 1.
+
+    statsd_sample_rate : float
+        The fraction of request timings sent to stats-d. Request counts
+        are always exact. Defaults to 1.
+
+    mode : str
+        `process` to run the job in a Molotov process of its own, or
+        `engine` to run it alongside other jobs in the shared load engine,
+        which uses far less memory per job and starts faster. `warm` runs
+        the job in a Molotov process of its own which is forked from a
+        process with everything already imported, so it starts in a
+        fraction of the time. Defaults to `process`.
+
+    processes : int
+        Shard the job across this many Molotov processes to use more
+        than one core. The workers and rate are split evenly between
+        them. Not for the `engine` mode. Defaults to 1.
+
+    pin : bool
+        Pin each process of a sharded job to a core of its own.
+
+    start_at : float
+        A time, in seconds since the epoch, before which the job sends
+        no requests. Its processes are still started right away.
+
+    restart : bool
+        Start the job again, after a growing backoff, whenever it exits
+        with an error. /api/list shows the `exit_code`, `runtime` and
+        number of `restarts` in a row of the last run of a job.
+
+    shape : list
+        Run the job open-loop at a rate which follows these phases,
+        such as a ramp, steps, a sine wave or spikes, instead of a
+        constant `rate`. See `loadgen.shape`. The shape starts at
+        `start_at`, or right away.
+
+    replay_speed : float
+        For a `scenario` which is a JSONL capture, how many times faster
+        than recorded its requests are replayed. Defaults to 1, the
+        recorded timing.
+
+    replay_loop : bool
+        Start a capture over once it is replayed. Defaults to true.
+
+    payload_pool : int
+        How many different order bodies the job builds ahead of time
+        and sends in turn. Defaults to 1024.
+
+    payload_seed : int
+        Build the order bodies from this seed, so that two jobs send
+        the same orders. Can be changed while the job is running.
+        Defaults to a random seed.
+
+    seed : int
+        Make every random choice of the job, such as the scenarios its
+        workers pick and the IDs they request, from this seed, so that
+        two runs with the same seed send the same requests. Also seeds
+        the order bodies unless `payload_seed` is given. See
+        `loadgen.seed`. Defaults to no seed.
+
+    ids : dict
+        How the IDs of products, customers, orders and types are drawn:
+        a `distribution`, one of `uniform`, `zipf` with an `exponent`,
+        `hotspot`, where a fraction `keys` of the IDs takes a `share` of
+        the requests, or `sequential`, along with its parameters. A map
+        of `scenarios` gives some scenarios distributions of their own.
+        Can be changed while the job is running. See `loadgen.sampler`.
+        Defaults to uniform.
+
+    autotune : dict
+        Find the highest rate at which the job meets an SLO. The job
+        runs open-loop from `start_rate`, which is raised by `factor`
+        every `step_duration` seconds, up to `max_rate`, until a step
+        breaks the SLO. The rate is then bisected `refine` times
+        between the last step which met the SLO and the first which did
+        not. The SLO is made of `p50` and `p99`, in milliseconds, and
+        `error_rate`, which defaults to 0.01. Once the search is over,
+        the job holds the highest rate which met the SLO, or is stopped
+        if `then` is `stop`. See /api/autotune for the curve.
+
     Examples
     --------
     Sample JSON payload to send to this endpoint:
     > {"job":"opbeans-python","port":"8000"}
     """
-    r = request.get_json() or {}
+    return _start(request.get_json() or {})
+
+
+def _start(r: dict):
+    """
+    Start a job from the parameters of /api/start
+    """
     job = r.get('job')
     config = {
             'port': r.get('port'),
@@ -99,13 +367,62 @@ def start_job() -> dict:
             'app_latency_upper_bound': r.get('app_latency_upper_bound', 1000),  # noqa
             }
 
-    job = job.replace('opbeans-', '')
-
-    if config['scenario']:
-        config['scenario'] = "scenarios/" + config['scenario'] + ".py"
+    if 'max_workers' in r:
+        config['max_workers'] = r['max_workers']
+    for key in ARRIVAL_KEYS + SYNC_KEYS + REPLAY_KEYS + PAYLOAD_KEYS + \
+            ID_KEYS + RESTART_KEYS:
+        if key in r:
+            config[key] = r[key]
+    if 'replay_loop' in r:
+        config['replay_loop'] = _flag(r['replay_loop'])
+    if 'seed' in r:
+        error = _check_seed(r['seed'])
+        if error:
+            return error, 400
+    if r.get('ids'):
+        error = _check_ids(r['ids'])
+        if error:
+            return error, 400
+    if r.get('shape'):
+        error = _check_shape(r['shape'])
+        if error:
+            return error, 400
+        config['shape'] = r['shape']
+        config['shape_start'] = float(r.get('start_at') or time.time())
+        if 'shape_scale' in r:
+            config['shape_scale'] = r['shape_scale']
+    tune = None
+    if r.get('autotune') is not None:
+        if r.get('shape'):
+            return "Cannot autotune a job with a shape", 400
+        try:
+            tune = autotune.parse(r['autotune'])
+        except ValueError as exc:
+            return 'Invalid autotune: {}'.format(exc), 400
+        config['rate'] = tune['start_rate']
+    if config.get('mode') == 'engine' and int(config.get('processes') or 1) > 1:  # noqa
+        return "Cannot shard a job in engine mode", 400
 
-    _launch_job(job, config)
+    job = job.replace('opbeans-', '')
 
+    scenario = REGISTRY.get(config['scenario'])
+    if scenario is None:
+        return "Unknown scenario: {}".format(config['scenario']), 400
+    if not scenario['valid']:
+        return "Invalid scenario {}: {}".format(
+            config['scenario'], scenario['error']), 400
+    config['scenario'] = scenario['file']
+
+    if JOB_MANAGER.get(job) is not None:
+        # Starting a job again replaces the process it already has
+        _stop_job(job)
+    try:
+        _launch_job(job, config)
+    except EngineError as exc:
+        return str(exc), 503
+
+    if tune is not None:
+        _start_autotune(job, tune)
     return {}
 
 
@@ -144,7 +461,20 @@ def get_list() -> dict:
         "workers": "3"
       }
     }
+
+    Note
+    ----
+    A job which has reported stats also has a `counters` key holding the
+    counters of all of its processes added together. A sharded job is
+    listed once. A running job with a load shape also has the
+    `target_rate` it is sending at and the `phase` of the shape it is
+    in: its `index`, `type` and the seconds `elapsed` in it.
     """
+    for job, status in JOB_STATUS.items():
+        counters = _read_job_counters(job)
+        if counters:
+            status['counters'] = counters
+        _add_shape_status(status)
     return JOB_STATUS
 
 
@@ -155,8 +485,11 @@ def update_job() -> dict:
 
     We try to reconstruct the existing job by querying
     the status dictionary and then we update as necessary.
-    Then we kill the job and start it again with the new
-    values.
+    If the job is running and the new number of workers fits
+    within the workers it was started with, the new values are
+    handed to the running job, which applies them on its next
+    scenario pick. Otherwise we kill the job and start it again
+    with the new values.
 
     Exposed via HTTP at /api/update
 
@@ -198,6 +531,36 @@ def update_job() -> dict:
         The upper bound of latency which should be applied to requests which
         hit the delayed endpoint
 
+    rate : float
+        The open-loop request rate, in requests per second. Setting this
+        on a job which was started closed-loop restarts it. (Optional)
+
+    arrival : str
+        The open-loop arrival process, `fixed` or `poisson`. (Optional)
+
+    max_in_flight : int
+        The cap on concurrent open-loop requests. (Optional)
+
+    start_at : float
+        The time, in seconds since the epoch, before which the job
+        sends no requests. (Optional)
+
+    pool_size, pool_per_host, keepalive_timeout, dns_ttl
+        Connection pool settings, as for /api/start. Changing any of
+        them restarts the job. (Optional)
+
+    statsd_interval, statsd_sample_rate
+        stats-d settings, as for /api/start. Changing either of them
+        restarts the job. (Optional)
+
+    mode, processes, pin, restart
+        As for /api/start. Changing any of them restarts the job.
+        (Optional)
+
+    shape : list
+        A new load shape, which starts over from its first phase, or
+        null to go back to the constant `rate`. (Optional)
+
     Returns
     -------
     An empty dictionary on success
@@ -212,7 +575,13 @@ def update_job() -> dict:
     Paramaters are received via JSON in a Flask request object. They
     may not be passed directly to this function.
     """
-    r = request.get_json() or {}
+    return _update(request.get_json() or {})
+
+
+def _update(r: dict):
+    """
+    Update a job from the parameters of /api/update
+    """
     job = r.get('job')
 
     if job is None:
@@ -234,6 +603,26 @@ def update_job() -> dict:
 
     config = JOB_STATUS[job]
 
+    if 'seed' in r:
+        error = _check_seed(r['seed'])
+        if error:
+            return error, 400
+    if r.get('ids'):
+        error = _check_ids(r['ids'])
+        if error:
+            return error, 400
+    if r.get('shape'):
+        error = _check_shape(r['shape'])
+        if error:
+            return error, 400
+        config['shape_start'] = time.time()
+    if 'rate' in r or r.get('shape'):
+        # The rate is set by hand from now on
+        _cancel_autotune(job)
+    if 'shape' in r:
+        config['shape'] = r['shape']
+    if 'shape_scale' in r:
+        config['shape_scale'] = r['shape_scale']
     if 'workers' in r:
         config['workers'] = r['workers']
     if 'error_weight' in r:
@@ -246,12 +635,32 @@ def update_job() -> dict:
         config['app_latency_lower_bound'] = r['app_latency_lower_bound']
     if 'app_latency_upper_bound' in r:
         config['app_latency_upper_bound'] = r['app_latency_upper_bound']
-    _stop_job(job)
-
-    if DEBUG:
-        print('Relaunching job: ', config)
-    _launch_job(job, config)
+    for key in ARRIVAL_KEYS + SYNC_KEYS + REPLAY_KEYS + PAYLOAD_KEYS + \
+            ID_KEYS:
+        if key in r:
+            config[key] = r[key]
+    if 'replay_loop' in r:
+        config['replay_loop'] = _flag(r['replay_loop'])
+    restart = False
+    for key in RESTART_KEYS:
+        if key in r and r[key] != config.get(key):
+            config[key] = r[key]
+            restart = True
+
+    if not restart and _can_reload(job, config):
+        if DEBUG:
+            print('Reloading job: ', config)
+        _write_job_config(job, config)
+    else:
+        _stop_job(job)
+        if DEBUG:
+            print('Relaunching job: ', config)
+        try:
+            _launch_job(job, config)
+        except EngineError as exc:
+            return str(exc), 503
     _update_status(job, config)
+    _save_job(job, RUNNING)
     return {}
 
 
@@ -284,6 +693,164 @@ def stop_job() -> dict:
     return {}
 
 
+@bp.route('/jobs/batch', methods=['POST'])
+def batch_jobs():
+    """
+    Start, update and stop several jobs in one request
+
+    The jobs are handled at the same time, so a whole suite of services
+    starts in about the time it takes to start one of them.
+
+    Exposed via HTTP at /api/jobs/batch
+
+    Supported HTTP methods: POST
+
+    Parameters
+    ----------
+    jobs : list
+        One dictionary per job, holding the parameters /api/start,
+        /api/update or /api/stop take for it and an `action` of
+        `start`, `update` or `stop`. The action defaults to `start`.
+        A job may only appear once.
+
+    Returns
+    -------
+    dict
+        The outcome for each job, keyed by job as given: a `status`
+        with the HTTP status the single-job endpoint would have
+        answered with and, if it failed, an `error`. The response has
+        status 200 if every job succeeded, otherwise 207.
+
+    Examples
+    --------
+    Sample JSON payload to send to this endpoint:
+    > {"jobs": [{"job":"opbeans-python","port":"8000"},
+    >           {"job":"opbeans-go","port":"8000","rate":50},
+    >           {"job":"opbeans-ruby","action":"stop"}]}
+
+    Note
+    ----
+    Paramaters are received via JSON in a Flask request object. They
+    may not be passed directly to this function.
+    """
+    r = request.get_json() or {}
+    specs = r.get('jobs')
+    if not isinstance(specs, list) or not specs:
+        return "Must supply a list of jobs", 400
+    names = []
+    for spec in specs:
+        if not isinstance(spec, dict) or not spec.get('job'):
+            return "Must supply job", 400
+        if spec.get('action', 'start') not in BATCH_ACTIONS:
+            return "Unknown action: {}".format(spec['action']), 400
+        names.append(spec['job'].replace('opbeans-', ''))
+    if len(set(names)) < len(names):
+        return "A job may only appear once", 400
+
+    workers = min(len(specs), BATCH_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_apply_spec, specs))
+    ret = {}
+    for spec, result in zip(specs, results):
+        ret[spec['job']] = result
+    ok = all(result['status'] == 200 for result in results)
+    return ret, 200 if ok else 207
+
+
+def _apply_spec(spec: dict) -> dict:
+    """
+    Carry out the action of one job of a batch and return its outcome
+    """
+    spec = dict(spec)
+    action = spec.pop('action', 'start')
+    try:
+        if action == 'start':
+            ret = _start(spec)
+        elif action == 'update':
+            ret = _update(spec)
+        else:
+            _stop_job(spec['job'].replace('opbeans-', ''))
+            ret = {}
+    except Exception as exc:
+        traceback.print_exc()
+        return {'status': 500, 'error': str(exc)}
+    if isinstance(ret, tuple):
+        return {'status': ret[1], 'error': ret[0]}
+    return {'status': 200}
+
+
+@bp.route('/stats', methods=['GET'])
+def get_stats() -> dict:
+    """
+    Fetch the counters reported by running jobs
+
+    Exposed via HTTP at /api/stats
+
+    Supported HTTP methods: GET
+
+    Parameters
+    ----------
+    job : str
+        Only return the stats for this job. (Optional)
+
+    raw : str
+        If set, return the merged latency histograms rather than their
+        percentiles, so that the stats of several hosts can be merged
+        again. (Optional)
+
+    Returns
+    -------
+    dict
+        The merged counters of all processes of each job, keyed by job.
+        `connections` counts the connections which were `created` and
+        the requests which `reused` an open connection. `latency` holds
+        the request count, throughput in requests per second and the
+        mean, maximum and percentile latencies in milliseconds for each
+        scenario and response status. `requests` holds the number of
+        requests `in_flight`.
+
+    Examples
+    --------
+    ❯ curl -s http://localhost:8999/api/stats?job=opbeans-python|jq
+    {
+      "python": {
+        "arrival": {...},
+        "connections": {
+          "created": 12,
+          "dns_cache_hits": 11,
+          "dns_cache_misses": 1,
+          "reused": 4410
+        },
+        "latency": {
+          "scenario_products": {
+            "200": {
+              "count": 2014,
+              "max": 96.768,
+              "mean": 12.205,
+              "p50": 10.624,
+              "p90": 21.76,
+              "p99": 48.64,
+              "p99.9": 80.384,
+              "throughput": 47.952
+            }
+          }
+        },
+        "processes": 1,
+        "requests": {"in_flight": 3},
+        "started": 1600000000.0,
+        "ts": 1600000042.0
+      }
+    }
+    """
+    job = request.args.get('job')
+    if job:
+        jobs = [job.replace('opbeans-', '')]
+    else:
+        jobs = list(JOB_STATUS)
+    raw = bool(request.args.get('raw'))
+    return {j: _read_job_stats(j, raw=raw) for j in jobs}
+
+
 @bp.route('/splays', methods=['GET'])
 def get_splays() -> dict:
     """
@@ -313,6 +880,46 @@ def get_splays() -> dict:
     return ret
 
 
+@bp.route('/autotune', methods=['GET'])
+def get_autotune() -> dict:
+    """
+    Fetch the progress and curve of the autotune search of a job
+
+    Exposed via HTTP at /api/autotune
+
+    Supported HTTP methods: GET
+
+    Parameters
+    ----------
+    job : str
+        The job which was started with `autotune`
+
+    Returns
+    -------
+    dict
+        The `state` of the search, which is `climbing`, `refining`,
+        `done` or `cancelled`, the current `rate`, the highest rate
+        which met the SLO so far as `knee`, the `slo` and the `curve`:
+        one point per step with the `rate`, measured `rps`,
+        `error_rate`, `p50`, `p99` and `missed` fraction, whether the
+        step was `ok` and which limits it `failed`. The curve of a
+        finished search is kept until the job is started again.
+
+    Examples
+    --------
+    > curl http://localhost:8999/api/autotune?job=opbeans-python
+    """
+    job = (request.args.get('job') or '').replace('opbeans-', '')
+    tuner = AUTOTUNE.get(job)
+    if tuner is not None:
+        return tuner.report()
+    path = os.path.join(RUNTIME_DIR, job, AUTOTUNE_FILE)
+    if job and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return "No autotune for job {}".format(job), 404
+
+
 @bp.route('/scenarios', methods=['GET'])
 def get_scenarios() -> dict:
     """
@@ -324,13 +931,18 @@ def get_scenarios() -> dict:
     Returns
     -------
     dict
-        A dictionary containing a list of scenarios under the `scenarios` key.
-        HTTP clients will receive the return as JSON.
+        A dictionary containing a list of scenarios under the `scenarios` key
+        and the description of each scenario, keyed by name, under the
+        `metadata` key. HTTP clients will receive the return as JSON.
 
     Note
     ----
     To add a new scenario to the application, it must be added to the
-    scenarios/ folder before it appears in this list.
+    scenarios/ folder before it appears in this list. A JSONL capture
+    of recorded requests in the folder is a scenario which replays the
+    capture, see `loadgen.replay`, and a JSON file is a declarative
+    scenario spec, see `loadgen.spec`. Scenarios are only read again
+    once their file changes. See `dyno.app.registry`.
 
     Examples
     --------
@@ -340,22 +952,21 @@ def get_scenarios() -> dict:
             "dyno",
             "molotov_scenarios",
             "high_error_rates"
-        ]
+        ],
+        "metadata": {
+            "dyno": {
+                "name": "dyno",
+                "kind": "python",
+                "file": "scenarios/dyno.py",
+                "valid": true,
+                ...
+            },
+            ...
+        }
     }
     """
-    cur_dir = os.path.dirname(os.path.realpath(__file__))
-    scenario_dir = os.path.join(cur_dir, "../../../scenarios")
-
-    files = os.listdir(scenario_dir)
-
-    ret = {'scenarios': []}
-
-    for file in files:
-        if file.startswith('__'):
-            continue
-        base_name = Path(file).stem
-        ret['scenarios'].append(base_name)
-    return ret
+    metadata = REGISTRY.scenarios()
+    return {'scenarios': list(metadata), 'metadata': metadata}
 
 
 """ Private helper functions """
@@ -517,9 +1128,239 @@ def _update_status(job: str, config: dict) -> None:
     status['app_latency_label'] = config.get('app_latency_label')
     status['app_latency_lower_bound'] = config.get('app_latency_lower_bound')
     status['app_latency_upper_bound'] = config.get('app_latency_upper_bound')
+    status['max_workers'] = config.get('max_workers')
+    status['launched'] = config.get('launched')
+    for key in ARRIVAL_KEYS + SYNC_KEYS + SHAPE_KEYS + REPLAY_KEYS + \
+            PAYLOAD_KEYS + ID_KEYS + RESTART_KEYS:
+        if config.get(key) is not None:
+            status[key] = config[key]
     status['name'] = job
 
 
+def _job_config_path(job: str) -> str:
+    """
+    Return the path of the live configuration file for a job
+    """
+    return os.path.join(RUNTIME_DIR, job, 'config.json')
+
+
+def _write_job_config(job: str, config: dict) -> None:
+    """
+    Write the parts of a job configuration which can change while
+    the job is running to the file the job watches.
+
+    Parameters
+    ----------
+    job : str
+        The name of the job
+
+    config : dict
+        A configuration dictionary for the job. Keys which are
+        not in `LIVE_KEYS` are ignored.
+
+    Returns
+    -------
+    None
+    """
+    values = {k: config[k] for k in LIVE_KEYS if config.get(k) is not None}
+    if 'shape' in config:
+        # A job whose shape was removed goes back to its constant rate
+        values['shape'] = config['shape']
+    live.write(_job_config_path(job), values)
+
+
+def _read_job_stats(job: str, raw=False) -> dict:
+    """
+    Merge the stats snapshots written by the processes of a job and,
+    unless `raw` is set, summarize their latency histograms
+    """
+    job_dir = os.path.dirname(_job_config_path(job))
+    ret = report.merge(report.read(job_dir))
+    if raw:
+        return ret
+    _add_time_to_first_request(job, ret)
+    return report.summarize(ret)
+
+
+def _add_time_to_first_request(job: str, stats: dict) -> None:
+    """
+    Add the seconds from launching a job to its first request
+    """
+    launched = JOB_STATUS.get(job, {}).get('launched')
+    if launched and 'first_request' in stats:
+        stats['time_to_first_request'] = round(
+            stats['first_request'] - launched, 3
+        )
+
+
+def _running_jobs() -> dict:
+    """
+    Return the status of every running job, keyed by job
+    """
+    return {j: s for j, s in JOB_STATUS.items() if s.get('running')}
+
+
+def _read_raw_stats(job: str) -> dict:
+    return _read_job_stats(job, raw=True)
+
+
+def _read_job_counters(job: str) -> dict:
+    """
+    Merge the counters written by the processes of a job, leaving
+    out the latency histograms
+    """
+    job_dir = os.path.dirname(_job_config_path(job))
+    ret = report.merge(report.read(job_dir))
+    if not ret['processes']:
+        return {}
+    ret.pop('latency', None)
+    _add_time_to_first_request(job, ret)
+    return ret
+
+
+def _open_loop(config: dict) -> bool:
+    """
+    Check whether a job is paced by the arrival scheduler
+    """
+    return bool(config.get('rate') or config.get('shape'))
+
+
+def _check_shape(spec) -> str:
+    """
+    Return what is wrong with a load shape, or None if it is valid
+    """
+    try:
+        Shape(spec)
+    except ValueError as exc:
+        return 'Invalid shape: {}'.format(exc)
+    return None
+
+
+def _check_seed(seed) -> str:
+    """
+    Return what is wrong with the seed of a job, or None if it is valid
+    """
+    if seed is None or isinstance(seed, bool):
+        return 'seed must be an integer'
+    try:
+        int(str(seed))
+    except ValueError:
+        return 'seed must be an integer'
+    return None
+
+
+def _check_ids(ids) -> str:
+    """
+    Return what is wrong with the ID distributions of a job, or None if
+    they are valid
+    """
+    try:
+        sampler.check(ids)
+    except ValueError as exc:
+        return 'Invalid ids: {}'.format(exc)
+    return None
+
+
+def _add_shape_status(status: dict) -> None:
+    """
+    Add the current `target_rate` and `phase` of a running job with a
+    load shape to its status
+    """
+    status.pop('target_rate', None)
+    status.pop('phase', None)
+    if not status.get('shape') or not status.get('running'):
+        return
+    shape = Shape(status['shape'])
+    elapsed = time.time() - float(status.get('shape_start') or 0)
+    scale = float(status.get('shape_scale') or 1)
+    status['target_rate'] = round(shape.rate(elapsed) * scale, 3)
+    status['phase'] = shape.describe(elapsed)
+
+
+def _start_autotune(job: str, settings: dict) -> None:
+    """
+    Search for the highest rate at which a running job meets an SLO
+    """
+    _cancel_autotune(job)
+
+    def set_rate(rate):
+        if tuner.cancelled:
+            return
+        status = JOB_STATUS.get(job)
+        if status is None or not status.get('running'):
+            tuner.cancel()
+            return
+        status['rate'] = round(rate, 3)
+        _write_job_config(job, status)
+        _save_job(job, RUNNING)
+
+    def save(report):
+        live.write(os.path.join(RUNTIME_DIR, job, AUTOTUNE_FILE), report)
+
+    def finish(knee):
+        if knee is not None and settings['then'] == autotune.HOLD:
+            set_rate(knee)
+        else:
+            _stop_job(job)
+
+    tuner = autotune.Autotuner(
+        job, settings, set_rate, lambda: _read_raw_stats(job),
+        finish=finish, save=save,
+    )
+    AUTOTUNE[job] = tuner
+    tuner.start()
+
+
+def _cancel_autotune(job: str) -> None:
+    """
+    Cancel the autotune search of a job, if it has one. Its curve so far
+    is kept, marked as cancelled.
+    """
+    tuner = AUTOTUNE.pop(job, None)
+    if tuner is not None:
+        tuner.cancel()
+
+
+def _is_running(job: str) -> bool:
+    """
+    Check whether the process for a job is still alive
+    """
+    p = JOB_MANAGER.get(job)
+    return p is not None and p.poll() is None
+
+
+def _can_reload(job: str, config: dict) -> bool:
+    """
+    Decide whether a new configuration can be applied to a job
+    without restarting it.
+
+    Parameters
+    ----------
+    job : str
+        The name of the job
+
+    config : dict
+        The new configuration for the job
+
+    Returns
+    -------
+    bool
+        True if the job is running and was started with enough
+        workers to satisfy the new configuration.
+    """
+    status = JOB_STATUS.get(job, {})
+    if not status.get('running') or not _is_running(job):
+        return False
+    max_workers = status.get('max_workers')
+    if max_workers is None:
+        return False
+    if _open_loop(config) and float(status.get('delay') or 0) > 0:
+        # Molotov would pause the open-loop scheduler between slices
+        return False
+    processes = int(status.get('processes') or 1)
+    return int(float(config['workers'])) <= int(max_workers) * processes
+
+
 def _launch_job(job: str, config: dict) -> None:
     """
     Spawn a new load-generation job
@@ -551,27 +1392,35 @@ def _launch_job(job: str, config: dict) -> None:
             'Job launch received: ', config
         )
 
+    config['max_workers'] = max(
+        int(float(config['workers'])),
+        int(float(config.get('max_workers', MAX_WORKERS)))
+        )
+    if _open_loop(config):
+        # Open-loop jobs are paced by the scheduler, not by Molotov
+        config['delay'] = '0'
+
+    scenario = config['scenario']
+    runner = RUNNERS.get(os.path.splitext(scenario)[1])
+    if runner is not None:
+        # Captures and specs are run by scenario files of their own
+        scenario = runner[0]
+    args = [
+        "-v",
+        "--duration",
+        str(config['duration']),
+        "--delay",
+        str(config['delay']),
+        "--uvloop",
+        "--workers",
+        str(config['max_workers']),
+        scenario
+        ]
     if DEBUG:
         cmd = ['sleep', '10']
     else:
-        cmd = [
-            "/app/venv/bin/python",
-            "/app/venv/bin/molotov",
-            "-v",
-            "--duration",
-            str(config['duration']),
-            "--delay",
-            str(config['delay']),
-            "--uvloop",
-            "--workers",
-            str(int(config['workers'])),
-            "--statsd",
-            "--statsd-address",
-            "udp://stats-d:8125",
-            config['scenario']
-            ]
-    s = socketio.Client()
-    s.emit('service_state', {'data': {job: 'start'}})
+        cmd = ["/app/venv/bin/python", "/app/venv/bin/molotov"] + args
+    BUS.publish('service_state', {'data': {job: 'start'}}, key=job)
     if DEBUG:
         print('Launching with: ', cmd)
 
@@ -589,13 +1438,248 @@ def _launch_job(job: str, config: dict) -> None:
             config.get('app_latency_upper_bound'),
             )
 
+    toxi_env[STATSD_ENV['statsd_address']] = STATSD_ADDRESS
+    if runner is not None:
+        toxi_env[runner[1]] = config['scenario']
+    for key, env in ENV_KEYS.items():
+        if config.get(key) is not None:
+            toxi_env[env] = str(config[key])
+
+    toxi_env[live.CONFIG_ENV] = _job_config_path(job)
+    report.clear(os.path.dirname(_job_config_path(job)))
+    config['launched'] = time.time()
+    _write_job_config(job, config)
     _update_status(job, config)
 
+    if config.get('mode') == 'engine':
+        client = _engine_client()
+        client.start(
+            job,
+            scenario=scenario,
+            env=toxi_env,
+            workers=config['max_workers'],
+            delay=float(config['delay']),
+            duration=float(config['duration']),
+            )
+        JOB_MANAGER[job] = RemoteJob(client, job)
+        _watch_job(job, JOB_MANAGER[job], config)
+        _save_job(job, RUNNING)
+        return
+
     # “I may not have gone where I intended to go, but I think I have ended up
     # where I needed to be.”
     # ― Douglas Adams, The Long Dark Tea-Time of the Soul
-    p = subprocess.Popen(cmd, cwd="../", preexec_fn=os.setsid, env=toxi_env)
+    processes = int(config.get('processes') or 1)
+    if config.get('mode') == 'warm':
+        p = _fork_warm(args, processes, toxi_env)
+    elif processes > 1:
+        p = ShardGroup(
+            cmd,
+            processes,
+            toxi_env,
+            pin=_flag(config.get('pin')),
+            cwd="../"
+            )
+    else:
+        p = subprocess.Popen(
+            cmd,
+            cwd="../",
+            preexec_fn=os.setsid,
+            env=toxi_env
+            )
     JOB_MANAGER[job] = p
+    _watch_job(job, p, config)
+    _save_job(job, RUNNING)
+
+
+def _engine_client() -> EngineClient:
+    """
+    Return a client for the load engine, starting the engine
+    if it is not running yet.
+
+    Raises
+    ------
+    EngineError
+        If the engine does not answer in time
+    """
+    return _control_client(EngineClient(ENGINE_SOCKET), 'loadgen.engine')
+
+
+def _zygote_client() -> ZygoteClient:
+    """
+    Return a client for the zygote, starting the zygote
+    if it is not running yet.
+
+    Raises
+    ------
+    EngineError
+        If the zygote does not answer in time
+    """
+    return _control_client(ZygoteClient(ZYGOTE_SOCKET), 'loadgen.zygote')
+
+
+def _control_client(client, module: str):
+    """
+    Start the helper process `module` unless it is already answering
+    on the socket of `client`, and return `client`
+    """
+    if client.ping():
+        # Possibly started by an earlier Dyno
+        return client
+    with HELPER_LOCK:
+        # The jobs of a batch may need the helper at the same time
+        if client.ping():
+            return client
+        cmd = [
+            "/app/venv/bin/python",
+            "-m",
+            module,
+            "--socket",
+            client.path,
+            ]
+        if DEBUG:
+            print('Starting helper with: ', cmd)
+        ENGINE[module] = subprocess.Popen(
+            cmd,
+            cwd="../",
+            preexec_fn=os.setsid
+            )
+        deadline = time.time() + ENGINE_START_TIMEOUT
+        while not client.ping():
+            if time.time() > deadline:
+                raise EngineError('{} did not start'.format(module))
+            time.sleep(0.1)
+    return client
+
+
+def _fork_warm(args: list, processes: int, env: dict) -> WarmJob:
+    """
+    Have the zygote fork the processes of a job, every shard after the
+    first joining the process group of the first
+    """
+    client = _zygote_client()
+    cwd = os.path.abspath("../")
+    pids = []
+    for index in range(processes):
+        shard_env = dict(env)
+        if processes > 1:
+            shard_env[SHARD_ENV] = str(index)
+            shard_env[SHARDS_ENV] = str(processes)
+        pids.append(client.spawn(
+            args,
+            shard_env,
+            cwd=cwd,
+            leader=pids[0] if pids else None
+            ))
+    return WarmJob(client, pids)
+
+
+def warm_up() -> None:
+    """
+    Start the zygote ahead of the first warm job
+
+    Note
+    ----
+    This is called once when the web server starts. It is not
+    accessible via HTTP.
+    """
+    try:
+        _zygote_client()
+    except (EngineError, OSError) as exc:
+        print('Cannot start the zygote: {}'.format(exc))
+
+
+def _flag(value) -> bool:
+    """
+    Read a boolean job parameter which may have been given as a string
+    """
+    return value in (True, 1, '1', 'true')
+
+
+def _watch_job(job: str, p, config: dict) -> None:
+    """
+    Hand a newly launched job to the supervisor, which restarts it on
+    a crash if the job was started with `restart`. The job is restarted
+    with its configuration at the time, including any /api/update
+    applied to it since it was launched.
+    """
+    def restart():
+        status = JOB_STATUS.get(job, config)
+        current = {
+            k: v for k, v in status.items() if k not in STATUS_ONLY_KEYS
+        }
+        if DEBUG:
+            print('Restarting job: ', current)
+        _launch_job(job, current)
+    SUPERVISOR.watch(job, p, restart if _flag(config.get('restart')) else None)  # noqa
+
+
+def _on_job_exit(job: str, record: dict) -> None:
+    """
+    Record how the last run of a job ended. Called by the supervisor.
+    """
+    status = JOB_STATUS.get(job)
+    if status is None:
+        return
+    status['exit_code'] = record['exit_code']
+    status['runtime'] = record['runtime']
+    status['restarts'] = record['restarts']
+    status['running'] = False
+    if job not in SUPERVISOR.pending:
+        _save_job(job, STOPPED)
+
+
+def _save_job(job: str, desired: str) -> None:
+    """
+    Record the configuration and processes of a job in the job store
+    """
+    status = JOB_STATUS.get(job)
+    if status is None:
+        return
+    config = {k: v for k, v in status.items() if k not in STATUS_ONLY_KEYS}
+    STORE.save(job, desired, config, JOB_MANAGER.get(job))
+
+
+def recover() -> None:
+    """
+    Pick up the jobs recorded by an earlier Dyno
+
+    Jobs which should be running are adopted if their processes are
+    still alive, and launched again otherwise. Jobs which were stopped
+    are forgotten.
+
+    Note
+    ----
+    This is called once when the web server starts. It is not
+    accessible via HTTP.
+    """
+    records = {
+        job: record for job, record in STORE.load().items()
+        if record['desired'] == RUNNING
+    }
+    STORE.compact(records)
+    for job, record in records.items():
+        config = dict(record['config'])
+        if config.get('mode') == 'engine':
+            client = EngineClient(ENGINE_SOCKET)
+            p = RemoteJob(client, job)
+            if p.poll() is not None:
+                p = None
+        else:
+            p = adopt(record)
+        if p is None:
+            if DEBUG:
+                print('Relaunching recorded job: ', config)
+            try:
+                _launch_job(job, config)
+            except (EngineError, OSError) as exc:
+                print('Cannot relaunch job {}: {}'.format(job, exc))
+            continue
+        if DEBUG:
+            print('Adopting running job: ', config)
+        _update_status(job, config)
+        JOB_MANAGER[job] = p
+        _watch_job(job, p, config)
 
 
 def _stop_job(job: str) -> None:
@@ -622,15 +1706,15 @@ def _stop_job(job: str) -> None:
 
 
     """
-    s = socketio.Client()
-    s.emit('service_state', {'data': {job: 'stop'}})
-    if job in JOB_MANAGER:
-        p = JOB_MANAGER[job]
-        os.killpg(os.getpgid(p.pid), signal.SIGTERM)
+    BUS.publish('service_state', {'data': {job: 'stop'}}, key=job)
+    _cancel_autotune(job)
+    if JOB_MANAGER.get(job) is not None:
+        SUPERVISOR.stop(job, JOB_MANAGER[job])
         JOB_MANAGER[job] = None
     if job in JOB_STATUS:
         j = JOB_STATUS[job]
         j['running'] = False
+        _save_job(job, STOPPED)
 
 
 # Simple structures for tracking status which is
@@ -639,3 +1723,10 @@ def _stop_job(job: str) -> None:
 # is a private server
 JOB_STATUS = {}
 JOB_MANAGER = {}
+ENGINE = {}
+HELPER_LOCK = threading.Lock()
+AUTOTUNE = {}
+SUPERVISOR = Supervisor(on_exit=_on_job_exit)
+STREAM = StatsStream(BUS, _running_jobs, _read_raw_stats)
+STORE = JobStore(STATE_FILE)
+REGISTRY = ScenarioRegistry(SCENARIO_DIR)
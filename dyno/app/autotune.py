@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Finding the highest rate an Opbean sustains within an SLO
+
+An auto-tuned job runs open-loop. The tuner raises its rate by a factor
+every step and measures the latency percentiles, error rate and missed
+sends of the step from the stats snapshots of the job. Once a step
+breaks the SLO, the tuner bisects between the last rate which met it
+and the first which did not. The highest rate which met the SLO is the
+knee. The job then holds the knee or is stopped.
+
+Every step adds a point to the curve of the job:
+
+    {"rate": 150.0, "rps": 149.8, "error_rate": 0.0, "p50": 12.288,
+     "p99": 48.64, "missed": 0.0, "ok": true, "failed": []}
+
+where `failed` names the limits the step broke.
+"""
+import threading
+import time
+import traceback
+
+from .stream import measure
+
+CLIMBING = 'climbing'
+REFINING = 'refining'
+DONE = 'done'
+CANCELLED = 'cancelled'
+
+HOLD = 'hold'
+STOP = 'stop'
+
+# The settings of a tuner which are not part of the SLO, with defaults
+DEFAULTS = {
+    'start_rate': 10.0,
+    'max_rate': 10000.0,
+    'factor': 1.5,
+    'step_duration': 10.0,
+    'refine': 3,
+    'then': HOLD,
+}
+
+# The limits of an SLO. Latencies are in milliseconds.
+LIMITS = ('p50', 'p99', 'error_rate')
+
+# The default limit on the error rate
+ERROR_RATE = 0.01
+
+# The fraction of sends which may be missed before a step fails. More
+# means the load generator, not the Opbean, is the bottleneck.
+MAX_MISSED = 0.01
+
+# The part of a step which is left out of its measurement while the
+# Opbean settles at the new rate
+SETTLE = 0.2
+
+# The least seconds left out of a measurement, as a job takes up to two
+# reload intervals of its live configuration to pick up a new rate
+MIN_SETTLE = 2.0
+
+# Seconds to wait for the first stats snapshot of a job before giving up
+STARTUP_TIMEOUT = 30.0
+
+
+def parse(spec) -> dict:
+    """
+    Fill in the defaults of an autotune request and check it
+
+    Raises
+    ------
+    ValueError
+        If the request is not valid. The message says what is wrong.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError('autotune must be an object')
+    ret = dict(DEFAULTS, error_rate=ERROR_RATE)
+    for key, value in spec.items():
+        if key not in ret and key not in LIMITS:
+            raise ValueError('Unknown autotune setting: {}'.format(key))
+        if key == 'then':
+            if value not in (HOLD, STOP):
+                raise ValueError('then must be hold or stop')
+            ret[key] = value
+            continue
+        try:
+            ret[key] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError('{} must be a number'.format(key))
+        if ret[key] < 0 or (ret[key] == 0 and key in DEFAULTS
+                            and key != 'refine'):
+            raise ValueError('{} must be positive'.format(key))
+    if ret['factor'] <= 1:
+        raise ValueError('factor must be above 1')
+    if ret['start_rate'] > ret['max_rate']:
+        raise ValueError('start_rate must not be above max_rate')
+    ret['refine'] = int(ret['refine'])
+    return ret
+
+
+class Autotuner(object):
+    """
+    Steps the rate of a job up until it breaks an SLO.
+
+    Parameters
+    ----------
+    job : str
+        The name of the job
+
+    settings : dict
+        The result of `parse()`
+
+    set_rate : callable
+        Called with a rate to have the job send at it
+
+    read : callable
+        Returns the merged raw stats of the job, or stats without
+        `processes` once the job is gone
+
+    finish : callable
+        Called with the knee, or None if no rate met the SLO, once the
+        search is over
+
+    save : callable
+        Called with the `report()` after every step
+
+    sleep : callable
+        Waits for a number of seconds
+    """
+    def __init__(self, job, settings, set_rate, read, finish=None,
+                 save=None, sleep=time.sleep):
+        self.job = job
+        self.settings = settings
+        self.set_rate = set_rate
+        self.read = read
+        self.finish = finish
+        self.save = save
+        self.sleep = sleep
+        self.state = CLIMBING
+        self.rate = settings['start_rate']
+        self.good = None
+        self.bad = None
+        self.refined = 0
+        self.curve = []
+        self.cancelled = False
+        self._thread = None
+
+    def report(self) -> dict:
+        """
+        Return the state of the search, the SLO and the curve so far
+        """
+        return {
+            'job': self.job,
+            'state': self.state,
+            'rate': self.rate,
+            'knee': self.good,
+            'slo': {k: self.settings[k] for k in LIMITS if k in self.settings},
+            'curve': list(self.curve),
+        }
+
+    def check(self, point: dict) -> list:
+        """
+        Return the limits a measured step broke
+        """
+        failed = [
+            key for key in LIMITS
+            if key in self.settings and point[key] > self.settings[key]
+        ]
+        if point['missed'] > MAX_MISSED:
+            failed.append('missed')
+        if not point['rps']:
+            failed.append('rps')
+        return failed
+
+    def decide(self, point: dict):
+        """
+        Add a measured step to the curve and return the rate of the next
+        step, or None once the knee is found
+        """
+        point['failed'] = self.check(point)
+        point['ok'] = not point['failed']
+        self.curve.append(point)
+        rate = point['rate']
+        if point['ok']:
+            self.good = rate
+        else:
+            self.bad = rate
+        if self.state == CLIMBING:
+            if self.bad is None:
+                if rate >= self.settings['max_rate']:
+                    return None
+                return min(rate * self.settings['factor'],
+                           self.settings['max_rate'])
+            self.state = REFINING
+        if self.refined >= self.settings['refine']:
+            return None
+        self.refined += 1
+        return ((self.good or 0.0) + self.bad) / 2.0
+
+    def step(self, rate: float):
+        """
+        Run the job at `rate` for a step and return the measured point,
+        or None if the job went away
+        """
+        duration = self.settings['step_duration']
+        settle = min(max(duration * SETTLE, MIN_SETTLE), duration / 2)
+        self.set_rate(rate)
+        self.sleep(settle)
+        before = self.read()
+        self.sleep(duration - settle)
+        after = self.read()
+        if not after.get('processes'):
+            return None
+        if not before.get('processes'):
+            # Everything was recorded since the processes started
+            before = {'ts': after.get('started', 0)}
+        point = measure(after, before)
+        point.pop('in_flight', None)
+        point['rate'] = round(rate, 3)
+        sent = _arrival(after, 'sent') - _arrival(before, 'sent')
+        missed = _arrival(after, 'missed') - _arrival(before, 'missed')
+        point['missed'] = round(missed / (sent + missed), 4) \
+            if sent + missed else 0.0
+        return point
+
+    def run(self) -> None:
+        """
+        Search for the knee, stepping the job up until the search is
+        over or the job is gone
+        """
+        waited = 0.0
+        while not self.read().get('processes'):
+            if self.cancelled or waited >= STARTUP_TIMEOUT:
+                self.state = CANCELLED
+                return
+            self.sleep(1.0)
+            waited += 1.0
+        rate = self.rate
+        while rate is not None and not self.cancelled:
+            self.rate = rate
+            point = self.step(rate)
+            if point is None or self.cancelled:
+                self.state = CANCELLED
+                return
+            rate = self.decide(point)
+            if rate is None:
+                self.state = DONE
+                self.rate = self.good
+            if self.save is not None and not self.cancelled:
+                self.save(self.report())
+        if self.cancelled:
+            self.state = CANCELLED
+            return
+        if self.finish is not None:
+            self.finish(self.good)
+
+    def start(self) -> None:
+        """
+        Search in a background thread
+        """
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def cancel(self) -> None:
+        """
+        Stop searching. The search is reported as cancelled at once and
+        the rate of the job is no longer set, but the current step is
+        left to run out in the background.
+        """
+        self.cancelled = True
+        if self.state == DONE:
+            return
+        self.state = CANCELLED
+        if self.save is not None:
+            self.save(self.report())
+
+    def _run(self):
+        try:
+            self.run()
+        except Exception:
+            traceback.print_exc()
+            self.state = CANCELLED
+
+
+def _arrival(stats: dict, key: str) -> int:
+    return stats.get('arrival', {}).get(key, 0)
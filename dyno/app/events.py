@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Delivery of Dyno events to Socket.IO clients
+
+Request handlers publish events to the bus, which only stores them, so
+publishing never waits on the network. A background task of the
+Socket.IO server sends what was published. Events go to a room, which
+is a job for events about that job, or to every client when the room
+is None. Clients join the room of a job by emitting `subscribe` with
+`{"job": "<job>"}`.
+
+Only the latest event of each kind and key is kept, so a room which
+receives events faster than it is sent them gets the most recent state
+rather than a growing backlog. Events published with `merge` update
+the pending event instead, for events which only hold what changed. A
+room is sent its pending events at most once every `interval` seconds.
+"""
+import threading
+import time
+import traceback
+
+from flask_socketio import join_room, leave_room
+
+# Seconds between two sends to the same room
+INTERVAL = 0.25
+
+
+class EventBus(object):
+    """
+    Coalesces events and sends them through a Flask-SocketIO server.
+
+    Parameters
+    ----------
+    interval : float
+        The shortest time between two sends to the same room, in
+        seconds
+
+    clock : callable
+        The source of monotonic time
+    """
+    def __init__(self, interval=INTERVAL, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self.socketio = None
+        self.pending = {}
+        self.last_sent = {}
+        self.sent = 0
+        self.subscribed = []
+        self.lock = threading.Lock()
+        self._task = None
+
+    def init_app(self, app, socketio) -> None:
+        """
+        Send events through `socketio` and answer room subscriptions.
+        Only an app which serves requests starts sending.
+        """
+        self.socketio = socketio
+        socketio.on_event('subscribe', self._subscribe)
+        socketio.on_event('unsubscribe', _unsubscribe)
+        if not app.testing:
+            app.before_first_request(self.start)
+
+    def on_subscribe(self, func) -> None:
+        """
+        Call `func` with the room whenever a client joins a room
+        """
+        self.subscribed.append(func)
+
+    def listening(self, room: str) -> bool:
+        """
+        Check whether any client is in a room
+        """
+        if self.socketio is None or self.socketio.server is None:
+            return False
+        try:
+            participants = self.socketio.server.manager.get_participants(
+                '/', room)
+            return next(participants, None) is not None
+        except KeyError:
+            return False
+
+    def publish(self, event: str, data, room=None, key=None,
+                merge=False) -> None:
+        """
+        Queue an event for the clients in `room`
+
+        Parameters
+        ----------
+        event : str
+            The name of the Socket.IO event
+
+        data : dict
+            The payload of the event
+
+        room : str
+            The room to send the event to, or None for every client
+
+        key : str
+            Events of the same name and key replace each other while
+            they wait to be sent
+
+        merge : bool
+            Update a pending dictionary event of the same name and key
+            with `data` rather than replacing it
+        """
+        with self.lock:
+            pending = self.pending.setdefault(room, {})
+            if merge and (event, key) in pending:
+                data = dict(pending[(event, key)], **data)
+            pending[(event, key)] = data
+
+    def flush(self, force=False) -> int:
+        """
+        Send the pending events of every room which was not sent
+        anything within the interval, or of every room if `force` is
+        set.
+
+        Returns
+        -------
+        int
+            The number of events sent
+        """
+        now = self.clock()
+        due = []
+        with self.lock:
+            for room in list(self.pending):
+                last = self.last_sent.get(room)
+                if force or last is None or now - last >= self.interval:
+                    due.append((room, self.pending.pop(room)))
+                    self.last_sent[room] = now
+        if self.socketio is None:
+            return 0
+        count = 0
+        for room, events in due:
+            for (event, _), data in events.items():
+                self.socketio.emit(event, data, room=room)
+                count += 1
+        self.sent += count
+        return count
+
+    def start(self) -> None:
+        """
+        Start sending from a background task of the Socket.IO server.
+        Calling this more than once has no further effect.
+        """
+        if self._task is None and self.socketio is not None:
+            self._task = self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
+            self.socketio.sleep(self.interval / 2)
+
+    def _subscribe(self, message):
+        join_room(message['job'])
+        for func in self.subscribed:
+            func(message['job'])
+
+
+def _unsubscribe(message):
+    leave_room(message['job'])
+
+
+BUS = EventBus()
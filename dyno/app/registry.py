@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+What is known about the scenarios in the scenarios directory
+
+Every scenario is described once by the registry, which keeps the
+description until the file changes:
+
+    {"name": "molotov_scenarios", "kind": "python",
+     "file": "scenarios/molotov_scenarios.py", "valid": true,
+     "error": null, "services": ["opbeans-python", "opbeans-go"],
+     "env": ["ERROR_WEIGHT", "OPBEANS_BASE_URL"],
+     "endpoints": ["/api/stats", "/oopsie"],
+     "scenarios": [{"name": "scenario_oopsie", "weight": 2,
+                    "tunable": "error_weight",
+                    "services": ["opbeans-python", "opbeans-go"]}]}
+
+Python scenario files are read with `ast` rather than imported, as
+importing one registers its scenarios with Molotov. `services` lists
+the Opbeans some scenarios are limited to; a scenario with no
+`services` runs against every Opbean. `env` lists the environment
+variables the file reads. A weight which is not a number in the file is
+the default of the environment variable it is read from, if any.
+
+A scenario which cannot be run is still described, with `valid` false
+and the reason in `error`.
+"""
+import ast
+import os
+import threading
+
+from loadgen import replay, spec
+
+PYTHON = 'python'
+SPEC = 'spec'
+CAPTURE = 'capture'
+
+# The kind of scenario held in a file of each extension, in the order in
+# which a name is looked up when files of several kinds share it
+KINDS = (
+    ('.jsonl', CAPTURE),
+    ('.json', SPEC),
+    ('.py', PYTHON),
+)
+
+# The methods of `URLCatalogue` whose first argument is a path
+URL_METHODS = ('join', 'ids', 'product')
+
+
+class ScenarioRegistry(object):
+    """
+    The descriptions of the scenarios in a directory, refreshed when a
+    file is added, changed or removed.
+
+    Parameters
+    ----------
+    directory : str
+        The scenarios directory
+
+    prefix : str
+        What the `file` of a description starts with, the directory as
+        a job sees it
+    """
+    def __init__(self, directory, prefix='scenarios/'):
+        self.directory = directory
+        self.prefix = prefix
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def scenarios(self) -> dict:
+        """
+        Return the description of every scenario, keyed by name, in
+        directory order
+        """
+        with self._lock:
+            files = self._refresh()
+        ret = {}
+        for _, kind in KINDS:
+            for meta in files:
+                if meta['kind'] == kind:
+                    ret.setdefault(meta['name'], meta)
+        return {
+            meta['name']: ret[meta['name']]
+            for meta in files if ret.get(meta['name']) is meta
+        }
+
+    def get(self, name: str):
+        """
+        Return the description of a scenario, or None if there is no
+        scenario of that name
+        """
+        return self.scenarios().get(name)
+
+    def _refresh(self) -> list:
+        """
+        Describe the files which changed since the last call and return
+        the descriptions of every file
+        """
+        seen = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            entries = []
+        for entry in entries:
+            name, ext = os.path.splitext(entry.name)
+            kind = dict(KINDS).get(ext)
+            if kind is None or name.startswith('__'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            key = (stat.st_mtime_ns, stat.st_size)
+            cached = self._files.get(entry.name)
+            if cached is None or cached[0] != key:
+                cached = (key, describe(entry.path, kind, self.prefix))
+            seen[entry.name] = cached
+        self._files = seen
+        return [meta for _, meta in seen.values()]
+
+
+def describe(path: str, kind: str, prefix='scenarios/') -> dict:
+    """
+    Return the description of one scenario file
+    """
+    base = os.path.basename(path)
+    ret = {
+        'name': os.path.splitext(base)[0],
+        'kind': kind,
+        'file': prefix + base,
+        'valid': True,
+        'error': None,
+        'services': [],
+        'env': [],
+        'endpoints': [],
+        'scenarios': [],
+    }
+    try:
+        if kind == PYTHON:
+            ret.update(_describe_python(path))
+        elif kind == SPEC:
+            ret.update(_describe_spec(path))
+        else:
+            _check_capture(path)
+    except (OSError, ValueError, SyntaxError) as exc:
+        ret['valid'] = False
+        ret['error'] = str(exc)
+    return ret
+
+
+def _describe_spec(path: str) -> dict:
+    scenarios = []
+    endpoints = set()
+    for entry in spec.load(path)['scenarios']:
+        scenarios.append({
+            'name': entry['name'],
+            'weight': entry.get('weight', 1),
+            'tunable': entry.get('tunable'),
+            'services': entry.get('services', []),
+        })
+        endpoints.add('/' + entry['path'])
+    return _summary(scenarios, endpoints, set())
+
+
+def _check_capture(path: str) -> None:
+    with open(path, 'rb') as fh_:
+        for line in fh_:
+            if not line.strip():
+                continue
+            if replay.parse(line) is None:
+                raise ValueError('The first line is not a request')
+            return
+    raise ValueError('The capture is empty')
+
+
+def _describe_python(path: str) -> dict:
+    with open(path, 'rb') as fh_:
+        source = fh_.read()
+    tree = ast.parse(source, path)
+    compile(tree, path, 'exec')
+    visitor = _ScenarioVisitor()
+    visitor.visit(tree)
+    if not visitor.scenarios:
+        raise ValueError('No scenarios are registered')
+    for item in visitor.scenarios:
+        if isinstance(item['weight'], str):
+            item['weight'] = visitor.defaults.get(item['weight'])
+    return _summary(visitor.scenarios, visitor.endpoints, visitor.env)
+
+
+def _summary(scenarios: list, endpoints: set, env: set) -> dict:
+    services = set()
+    for item in scenarios:
+        services.update(item['services'])
+    return {
+        'scenarios': scenarios,
+        'services': sorted(services),
+        'endpoints': sorted(endpoints),
+        'env': sorted(env),
+    }
+
+
+class _ScenarioVisitor(ast.NodeVisitor):
+    """
+    Collects the scenarios, environment variables and endpoints of a
+    scenario file
+    """
+    def __init__(self):
+        self.scenarios = []
+        self.env = set()
+        self.endpoints = set()
+        # The default of each module level name read from the environment
+        self.defaults = {}
+        self._services = []
+
+    def visit_If(self, node):
+        services = _startswith(node.test)
+        self.visit(node.test)
+        if services:
+            self._services.append(services)
+        for child in node.body:
+            self.visit(child)
+        if services:
+            self._services.pop()
+        for child in node.orelse:
+            self.visit(child)
+
+    def visit_Assign(self, node):
+        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            default = _env_default(node.value)
+            if default is not None:
+                self.defaults[node.targets[0].id] = default
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node):
+        for decorator in node.decorator_list:
+            if _is_scenario(decorator):
+                self._add(node.name, decorator)
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Call(self, node):
+        env = _env_name(node)
+        if env is not None:
+            self.env.add(env)
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr in URL_METHODS \
+                and isinstance(func.value, ast.Name) and node.args:
+            if func.attr == 'join':
+                parts = [_string(arg) for arg in node.args]
+            else:
+                parts = [_string(node.args[0])]
+            if all(part is not None for part in parts):
+                self.endpoints.add('/' + '/'.join(parts))
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        if _is_environ(node.value):
+            key = node.slice
+            if not isinstance(key, ast.expr):
+                # `ast.Index` before Python 3.9
+                key = key.value
+            name = _string(key)
+            if name is not None:
+                self.env.add(name)
+        self.generic_visit(node)
+
+    def _add(self, name, decorator):
+        weight = 1
+        tunable = None
+        for keyword in decorator.keywords:
+            if keyword.arg == 'weight':
+                weight = _number(keyword.value)
+                if weight is None and isinstance(keyword.value, ast.Name):
+                    weight = keyword.value.id
+            elif keyword.arg == 'tunable':
+                tunable = _string(keyword.value)
+        services = []
+        for level in self._services:
+            services = level if not services else \
+                [s for s in services if s in level]
+        self.scenarios.append({
+            'name': name,
+            'weight': weight,
+            'tunable': tunable,
+            'services': services,
+        })
+
+
+def _is_scenario(node) -> bool:
+    if not isinstance(node, ast.Call):
+        return False
+    func = node.func
+    return (isinstance(func, ast.Name) and func.id == 'scenario') or \
+        (isinstance(func, ast.Attribute) and func.attr == 'scenario')
+
+
+def _is_environ(node) -> bool:
+    return isinstance(node, ast.Attribute) and node.attr == 'environ'
+
+
+def _env_name(node):
+    """
+    Return the variable read by `os.environ.get()` or `os.getenv()`
+    """
+    func = node.func
+    if not isinstance(func, ast.Attribute) or not node.args:
+        return None
+    if (func.attr == 'get' and _is_environ(func.value)) or \
+            func.attr == 'getenv':
+        return _string(node.args[0])
+    return None
+
+
+def _env_default(node):
+    """
+    Return the number an expression such as
+    `int(os.environ.get('ERROR_WEIGHT', 2))` defaults to
+    """
+    while isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+            and node.func.id in ('int', 'float') and node.args:
+        node = node.args[0]
+    if isinstance(node, ast.Call) and _env_name(node) is not None \
+            and len(node.args) > 1:
+        value = _number(node.args[1])
+        if value is None:
+            value = _string(node.args[1])
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def _startswith(node) -> list:
+    """
+    Return the prefixes of a test such as
+    `SERVICE_NAME.startswith(('opbeans-python', 'opbeans-go'))`
+    """
+    if not (isinstance(node, ast.Call) and
+            isinstance(node.func, ast.Attribute) and
+            node.func.attr == 'startswith' and node.args):
+        return []
+    arg = node.args[0]
+    if isinstance(arg, ast.Call) and isinstance(arg.func, ast.Name) \
+            and arg.func.id in ('tuple', 'list') and arg.args:
+        arg = arg.args[0]
+    if isinstance(arg, (ast.Tuple, ast.List)):
+        values = [_string(elt) for elt in arg.elts]
+    else:
+        values = [_string(arg)]
+    return [value for value in values if value is not None]
+
+
+def _string(node):
+    value = _constant(node)
+    return value if isinstance(value, str) else None
+
+
+def _number(node):
+    value = _constant(node)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def _constant(node):
+    return node.value if isinstance(node, ast.Constant) else None
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+A persistent record of the jobs Dyno has started
+
+Every change to a job appends one JSON line holding its configuration,
+the processes running it and whether it should be running. The last
+line for a job wins, so a line cut short by a crash only loses the
+latest change. The file is rewritten with one line per job when it
+grows past `COMPACT_LINES`.
+
+A restarted Dyno reads the file back and adopts the job processes which
+are still running. A process is only adopted if it started at the same
+time as the one which was recorded, so a reused process id is not
+mistaken for a job.
+"""
+import json
+import os
+import threading
+import time
+
+RUNNING = 'running'
+STOPPED = 'stopped'
+
+# The number of lines after which the file is compacted
+COMPACT_LINES = 1000
+
+
+class JobStore(object):
+    """
+    An append-only file of job records.
+
+    Parameters
+    ----------
+    path : str
+        The file to keep the records in. Parent directories are
+        created as needed.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lines = None
+        self._lock = threading.Lock()
+
+    def save(self, job: str, desired: str, config: dict, proc=None) -> None:
+        """
+        Record the state of a job
+
+        Parameters
+        ----------
+        job : str
+            The name of the job
+
+        desired : str
+            `RUNNING` if the job should be running, otherwise `STOPPED`
+
+        config : dict
+            Everything needed to launch the job again
+
+        proc : subprocess.Popen
+            The process of the job, or anything with the same `pid` and
+            a list of `pids` such as a `ShardGroup`. None if the job has
+            no process of its own.
+        """
+        record = {
+            'job': job,
+            'desired': desired,
+            'config': config,
+            'ts': time.time(),
+        }
+        if proc is not None and proc.pid is not None:
+            record['pgid'] = proc.pid
+            pids = getattr(proc, 'pids', None)
+            record['pids'] = pids if isinstance(pids, list) else [proc.pid]
+            record['started'] = process_started(proc.pid)
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            self._append(line)
+
+    def _append(self, line: str) -> None:
+        if self._lines is None:
+            lines = self._read_lines()
+            self._lines = len(lines)
+            if lines and not lines[-1].endswith('\n'):
+                # End the line an earlier Dyno was writing when it died
+                line = '\n' + line
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as fh_:
+            fh_.write(line)
+        self._lines += 1
+        if self._lines > COMPACT_LINES:
+            self.compact(self.load())
+
+    def load(self) -> dict:
+        """
+        Return the latest record of every job, keyed by job
+        """
+        ret = {}
+        for line in self._read_lines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Cut short by a crash
+                continue
+            ret[record['job']] = record
+        return ret
+
+    def compact(self, records: dict) -> None:
+        """
+        Atomically replace the file with one line for each record
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as fh_:
+            for record in records.values():
+                fh_.write(json.dumps(record, default=str) + '\n')
+        os.replace(tmp_path, self.path)
+        self._lines = len(records)
+
+    def _read_lines(self) -> list:
+        try:
+            with open(self.path, 'r') as fh_:
+                return [line for line in fh_ if line.strip()]
+        except OSError:
+            return []
+
+
+class AdoptedJob(object):
+    """
+    The processes of a job started by an earlier Dyno, with the parts
+    of the `subprocess.Popen` interface Dyno uses to track jobs.
+
+    They are not children of this process, so their exit status cannot
+    be known. An exit is reported as 0.
+    """
+    def __init__(self, pgid, pids):
+        self.pid = pgid
+        self.pids = pids
+        self.returncode = None
+
+    def poll(self):
+        """
+        Return None while any process of the job is running
+        """
+        if self.returncode is None and not _group_alive(self.pid, self.pids):
+            self.returncode = 0
+        return self.returncode
+
+
+def adopt(record: dict):
+    """
+    Return an `AdoptedJob` for the processes of a job record, or None
+    if they are no longer running
+    """
+    pgid = record.get('pgid')
+    pids = record.get('pids') or [pgid]
+    if pgid is None or not _group_alive(pgid, pids):
+        return None
+    started = record.get('started')
+    if started is not None and process_started(pgid) != started:
+        return None
+    return AdoptedJob(pgid, pids)
+
+
+def process_started(pid: int):
+    """
+    Return when a process started, in clock ticks since boot, or None
+    if this cannot be found out
+    """
+    stat = _stat(pid)
+    return int(stat[19]) if stat else None
+
+
+def _stat(pid: int) -> list:
+    """
+    Return the fields of `/proc/<pid>/stat` after the command name
+    """
+    try:
+        with open('/proc/{}/stat'.format(pid), 'r') as fh_:
+            stat = fh_.read()
+    except OSError:
+        return []
+    # The command name may hold spaces, so split after its closing paren
+    return stat.rsplit(')', 1)[1].split()
+
+
+def _group_alive(pgid: int, pids: list) -> bool:
+    """
+    Check whether any process of a job is running. Adopted processes
+    are reaped by init, if at all, so zombies do not count.
+    """
+    try:
+        os.killpg(pgid, 0)
+    except (ProcessLookupError, PermissionError):
+        return False
+    if not os.path.isdir('/proc'):
+        return True
+    return any(_stat(pid)[:1] not in ([], ['Z']) for pid in pids)
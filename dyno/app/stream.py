@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Live stats frames for Socket.IO clients
+
+Every process of a job writes a snapshot of its counters and latency
+histograms to the job directory once a second (see `loadgen.report`).
+Once per `TICK`, the stream merges the snapshots of every job which has
+subscribers, compares them with the previous merge and publishes a
+`stats` event to the job's room:
+
+    {"job": "python", "seq": 12, "ts": 1600000042.0, "full": true,
+     "rps": 48.0, "error_rate": 0.021, "p50": 10.624, "p99": 48.64,
+     "in_flight": 3, "error_weight": 2, "app_latency_weight": 0}
+
+Rates and latencies cover the time since the previous frame, and
+latencies are in milliseconds. Frames after the first hold only the
+fields which changed, besides `job`, `seq` and `ts`. A frame with all
+fields is marked `full` and is sent every `KEYFRAME_EVERY` frames and
+after a client subscribes to the job. Jobs nobody subscribed to cost
+nothing.
+"""
+import traceback
+
+from loadgen.histogram import Histogram, difference
+from loadgen.latency import ERROR_STATUS
+
+# Seconds between two frames of a job
+TICK = 1.0
+
+# Every this many frames, a frame holds every field
+KEYFRAME_EVERY = 10
+
+# The job configuration which is sent along with the stats
+WEIGHT_KEYS = ('error_weight', 'app_latency_weight')
+
+
+class StatsStream(object):
+    """
+    Turns the stats snapshots of running jobs into frames on an event
+    bus.
+
+    Parameters
+    ----------
+    bus : EventBus
+        Where to publish the frames
+
+    jobs : callable
+        Returns the configuration of every running job, keyed by job
+
+    read : callable
+        Returns the merged raw stats of a job, as `/api/stats?raw=1`
+        does
+
+    interval : float
+        Seconds between two frames of a job
+    """
+    def __init__(self, bus, jobs, read, interval=TICK):
+        self.bus = bus
+        self.jobs = jobs
+        self.read = read
+        self.interval = interval
+        self.previous = {}
+        self.sent = {}
+        self.seq = {}
+        self._task = None
+        bus.on_subscribe(self.resync)
+
+    def resync(self, job: str) -> None:
+        """
+        Send a full frame of `job` next
+        """
+        self.sent.pop(job, None)
+
+    def tick(self) -> None:
+        """
+        Publish a frame for every job with subscribers and new stats
+        """
+        jobs = self.jobs()
+        for job in list(self.previous):
+            if job not in jobs or not self.bus.listening(job):
+                self.previous.pop(job)
+                self.sent.pop(job, None)
+        for job, config in jobs.items():
+            if not self.bus.listening(job):
+                continue
+            frame = self.frame(job, self.read(job), config)
+            if frame is not None:
+                self.bus.publish('stats', frame, room=job, key=job, merge=True)
+
+    def frame(self, job: str, stats: dict, config: dict):
+        """
+        Return the next frame of a job, or None if its stats did not
+        change since the last frame
+        """
+        previous = self.previous.get(job)
+        if previous is not None and stats.get('ts') == previous.get('ts'):
+            return None
+        self.previous[job] = stats
+        if previous is None or not stats.get('processes'):
+            return None
+        if not previous.get('processes'):
+            # Everything was recorded since the processes started
+            previous = {'ts': stats.get('started', 0)}
+        fields = measure(stats, previous)
+        for key in WEIGHT_KEYS:
+            fields[key] = config.get(key)
+        seq = self.seq[job] = self.seq.get(job, 0) + 1
+        last = self.sent.get(job)
+        self.sent[job] = fields
+        if last is None or seq % KEYFRAME_EVERY == 0:
+            ret = dict(fields, full=True)
+        else:
+            ret = {k: v for k, v in fields.items() if last.get(k) != v}
+        ret.update(job=job, seq=seq, ts=stats['ts'])
+        return ret
+
+    def start(self) -> None:
+        """
+        Start publishing from a background task of the Socket.IO
+        server. Calling this more than once has no further effect.
+        """
+        if self._task is None and self.bus.socketio is not None:
+            self._task = self.bus.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                traceback.print_exc()
+            self.bus.socketio.sleep(self.interval)
+
+
+def measure(stats: dict, previous: dict) -> dict:
+    """
+    Work out the request rate, error rate, latencies and requests in
+    flight between two merges of the raw stats of a job
+    """
+    elapsed = stats.get('ts', 0) - previous.get('ts', 0)
+    earlier = previous.get('latency', {})
+    buckets = {}
+    count = 0
+    errors = 0
+    for scenario, statuses in stats.get('latency', {}).items():
+        for status, snapshot in statuses.items():
+            delta = difference(
+                snapshot,
+                earlier.get(scenario, {}).get(status, {})
+            )
+            for index, n in delta['buckets'].items():
+                buckets[index] = buckets.get(index, 0) + n
+            count += delta['count']
+            if status == ERROR_STATUS or int(status) >= 500:
+                errors += delta['count']
+    total = Histogram.from_snapshot({'count': count, 'buckets': buckets})
+    return {
+        'rps': round(count / elapsed, 3) if elapsed > 0 else 0.0,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'p50': total.percentile(50) / 1000.0,
+        'p99': total.percentile(99) / 1000.0,
+        'in_flight': stats.get('requests', {}).get('in_flight', 0),
+    }
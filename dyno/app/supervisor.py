@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Supervision of the load-generation processes started by Dyno
+
+The supervisor polls every job process once per `CHECK_INTERVAL` from a
+background thread. Polling a `subprocess.Popen` does not block, so the
+thread is safe to run under eventlet, and it reaps the process once it
+has exited. Every exit is recorded with its exit code and runtime.
+
+A job which exits with an error is restarted if it was started with a
+restart function, after a backoff which doubles with every crash in a
+row. A stopped job is sent SIGTERM and, if it is still running after
+`STOP_GRACE` seconds, SIGKILL.
+
+A job made of several processes, such as a sharded job, has crashed as
+soon as one of them exits with an error. The rest of its processes are
+then stopped the same way, and the job is restarted as a whole.
+"""
+import os
+import signal
+import threading
+import time
+import traceback
+
+# Seconds between two checks of the supervised processes
+CHECK_INTERVAL = 1.0
+
+# Seconds a stopped job has to exit before it is killed
+STOP_GRACE = 10.0
+
+# Seconds to wait before the first restart of a crashed job. The wait
+# doubles with every further crash, up to `MAX_RESTART_BACKOFF`.
+RESTART_BACKOFF = 1.0
+
+# The longest wait before a restart. A job which ran at least this long
+# before it crashed is restarted after `RESTART_BACKOFF` again.
+MAX_RESTART_BACKOFF = 60.0
+
+
+class _Child(object):
+    __slots__ = ('proc', 'started', 'restart', 'pgid', 'kill_at',
+                 'reported')
+
+    def __init__(self, proc, started, restart=None):
+        self.proc = proc
+        self.started = started
+        self.restart = restart
+        self.pgid = None
+        self.kill_at = None
+        # Whether the exit of the job was already recorded
+        self.reported = False
+
+
+class Supervisor(object):
+    """
+    Watches job processes, reaps them and restarts them on a crash.
+
+    Parameters
+    ----------
+    on_exit : callable
+        Called with the name of a job and a dictionary holding the
+        `exit_code`, `runtime` in seconds, `restarts` in a row and
+        whether the job was `stopped`, when the latest process of the
+        job exits.
+
+    grace : float
+        Seconds a stopped job has to exit before it is killed
+
+    clock : callable
+        The source of monotonic time
+    """
+    def __init__(self, on_exit=None, grace=STOP_GRACE, clock=time.monotonic):
+        self.on_exit = on_exit
+        self.grace = grace
+        self.clock = clock
+        self.children = {}
+        self.stopping = []
+        self.pending = {}
+        self.failures = {}
+        self.exits = {}
+        self.lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, job: str, proc, restart=None) -> None:
+        """
+        Supervise the process of a job
+
+        Parameters
+        ----------
+        job : str
+            The name of the job
+
+        proc : subprocess.Popen
+            The process, or anything with its `pid` and `poll()`
+
+        restart : callable
+            Called without arguments to start the job again after it
+            crashed. If None, the job is not restarted.
+        """
+        with self.lock:
+            self.pending.pop(job, None)
+            self.children[job] = _Child(proc, self.clock(), restart)
+
+    def stop(self, job: str, proc) -> None:
+        """
+        Ask a process of a job to exit, and kill it if it does not exit
+        within the grace period. A pending restart of the job is
+        cancelled.
+        """
+        with self.lock:
+            self.pending.pop(job, None)
+            self.failures.pop(job, None)
+            child = self.children.get(job)
+            if child is not None and child.proc is proc:
+                del self.children[job]
+            else:
+                child = _Child(proc, self.clock())
+            if proc.pid is None:
+                # A job in the load engine has no process of its own
+                proc.stop()
+            else:
+                # Every job process leads a process group of its own, which
+                # outlives it while the other shards of the job run
+                child.pgid = proc.pid
+                _signal(child.pgid, signal.SIGTERM)
+            child.kill_at = self.clock() + self.grace
+            self.stopping.append((job, child))
+
+    def check(self) -> None:
+        """
+        Reap the processes which have exited, kill stopped processes
+        which outlived the grace period and carry out due restarts
+        """
+        now = self.clock()
+        exited = []
+        restarts = []
+        with self.lock:
+            for job, child in list(self.children.items()):
+                code = child.proc.poll()
+                if code is None:
+                    continue
+                del self.children[job]
+                runtime = now - child.started
+                failures = 0
+                if code != 0 and child.restart is not None:
+                    if runtime < MAX_RESTART_BACKOFF:
+                        failures = self.failures.get(job, 0) + 1
+                    else:
+                        failures = 1
+                    delay = min(
+                        RESTART_BACKOFF * 2 ** (failures - 1),
+                        MAX_RESTART_BACKOFF
+                    )
+                    self.pending[job] = (now + delay, child.restart)
+                self.failures[job] = failures
+                exited.append((job, self._record(job, code, runtime, False)))
+                if _running(child.proc):
+                    self._stop_rest(job, child, now)
+            stopping = []
+            for job, child in self.stopping:
+                code = child.proc.poll()
+                if code is None or _running(child.proc):
+                    if child.kill_at is not None and now >= child.kill_at:
+                        _kill(child.pgid)
+                        child.kill_at = None
+                    stopping.append((job, child))
+                    continue
+                if child.reported:
+                    continue
+                record = self._record(job, code, now - child.started, True)
+                if job not in self.children and job not in self.pending:
+                    exited.append((job, record))
+            self.stopping = stopping
+            for job, (restart_at, restart) in list(self.pending.items()):
+                if now >= restart_at:
+                    del self.pending[job]
+                    restarts.append(restart)
+        if self.on_exit is not None:
+            for job, record in exited:
+                self.on_exit(job, record)
+        for restart in restarts:
+            try:
+                restart()
+            except Exception:
+                # The job stays stopped, as if it had no restart policy
+                traceback.print_exc()
+
+    def _stop_rest(self, job, child, now) -> None:
+        """
+        Stop the processes of a job which are left after one of them
+        crashed. Called with the lock held.
+        """
+        # The first process leads the process group of the job
+        child.pgid = child.proc.pid
+        _signal(child.pgid, signal.SIGTERM)
+        child.kill_at = now + self.grace
+        child.reported = True
+        self.stopping.append((job, child))
+
+    def _record(self, job, code, runtime, stopped) -> dict:
+        record = {
+            'exit_code': code,
+            'runtime': round(runtime, 3),
+            'restarts': self.failures.get(job, 0),
+            'stopped': stopped,
+        }
+        self.exits[job] = record
+        return record
+
+    def start(self) -> None:
+        """
+        Start checking in a background thread. Calling this more than
+        once has no further effect.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                traceback.print_exc()
+            time.sleep(CHECK_INTERVAL)
+
+
+def _running(proc) -> bool:
+    """
+    Check whether a process which has an exit code still has processes
+    of its job running, as a job of several processes may
+    """
+    pids = getattr(proc, 'pids', None)
+    if not isinstance(pids, list) or len(pids) < 2:
+        return False
+    return proc.running() is True
+
+
+def _kill(pgid) -> None:
+    _signal(pgid, signal.SIGKILL)
+
+
+def _signal(pgid, signum) -> None:
+    if not isinstance(pgid, int) or pgid <= 1:
+        # Never signal the group of init, or every group
+        return
+    try:
+        os.killpg(pgid, signum)
+    except ProcessLookupError:
+        pass
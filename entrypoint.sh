@@ -13,5 +13,5 @@ else
     # TODO This should eventually be replaced with a proper application packaging strategy
     # but it works for the time being.
     export PYTHONPATH=$PYTHONPATH:/app
-    gunicorn -b 0.0.0.0 --worker-class eventlet -w 1 app:app
+    gunicorn -c gunicorn.conf.py -b 0.0.0.0 --worker-class eventlet -w 1 app:app
 fi
@@ -3,8 +3,28 @@ import sys
 
 
 def create_procfile(service_env_string, rpm_env_string='',rls_env_string='', *args):
+    # When OPBEANS_ARRIVAL is set to `fixed` or `poisson` the RPM is sent
+    # open-loop by the scenario scheduler instead of being turned into a delay
+    arrival = os.environ.get('OPBEANS_ARRIVAL')
+    # When OPBEANS_ENGINE is set every service is loaded from a single
+    # engine process instead of a Molotov process per service
+    engine = os.environ.get('OPBEANS_ENGINE')
+    engine_cmd = 'loadgen: {0}python -m loadgen.engine --socket /tmp/loadgen.sock --scenario molotov_scenarios.py{1}\n'
+    engine_job = ' --job {0} {1} {2:.3f} {3}'
+    # The engine reads the same settings as Molotov from the environment,
+    # shared by all of its jobs or, for the arrival rate, set per job
+    engine_env = ''
     if os.environ.get('WS'):
-        cmd = '{0}: OPBEANS_BASE_URL={1} OPBEANS_NAME={2} molotov -v --duration {3} --delay {4:.3f} --uvloop --statsd --statsd-address udp://stats-d:8125 molotov_scenarios.py\n'
+        engine_env += 'LOADGEN_STATSD_ADDRESS=udp://stats-d:8125 '
+    if arrival:
+        engine_env += 'ARRIVAL_PROCESS={0} '.format(arrival)
+        engine_job = ' --job {0} {1} 0 {3} --env {0} ARRIVAL_RATE={4:.3f}'
+    if arrival and os.environ.get('WS'):
+        cmd = '{0}: OPBEANS_BASE_URL={1} OPBEANS_NAME={2} ARRIVAL_RATE={5:.3f} ARRIVAL_PROCESS={6} LOADGEN_STATSD_ADDRESS=udp://stats-d:8125 molotov -v --duration {3} --delay 0 --uvloop molotov_scenarios.py\n'
+    elif arrival:
+        cmd = '{0}: OPBEANS_BASE_URL={1} OPBEANS_NAME={2} ARRIVAL_RATE={5:.3f} ARRIVAL_PROCESS={6} molotov -v --duration {3} --delay 0 --uvloop molotov_scenarios.py\n'
+    elif os.environ.get('WS'):
+        cmd = '{0}: OPBEANS_BASE_URL={1} OPBEANS_NAME={2} LOADGEN_STATSD_ADDRESS=udp://stats-d:8125 molotov -v --duration {3} --delay {4:.3f} --uvloop molotov_scenarios.py\n'
     else:
         cmd = '{0}: OPBEANS_BASE_URL={1} OPBEANS_NAME={2} molotov -v --duration {3} --delay {4:.3f} --uvloop molotov_scenarios.py\n'
     services = service_env_string.split(',')
@@ -22,6 +42,7 @@ def create_procfile(service_env_string, rpm_env_string='',rls_env_string='', *ar
     else:
         rls = {}
 
+    engine_jobs = []
     for service in services:
         try:
             service_name, service_url = service.split(':', 1)
@@ -32,7 +53,13 @@ def create_procfile(service_env_string, rpm_env_string='',rls_env_string='', *ar
             '-', ''
         )  # we use second part of name and strip all remaining dashes
         delay = 60.0 / rpms.get(service_name, 100)
+        rate = rpms.get(service_name, 100) / 60.0
         run_length = rls.get(service_name, 365 * 24 * 60 * 60)
+        if engine:
+            engine_jobs.append(
+                engine_job.format(service_name, service_url, delay, run_length, rate)
+            )
+            continue
         sys.stdout.write(
             cmd.format(
                 process_name,
@@ -40,8 +67,12 @@ def create_procfile(service_env_string, rpm_env_string='',rls_env_string='', *ar
                 service_name,
                 run_length,
                 delay,
+                rate,
+                arrival,
             )
         )
+    if engine_jobs:
+        sys.stdout.write(engine_cmd.format(engine_env, ''.join(engine_jobs)))
     sys.stdout.flush()
 
 
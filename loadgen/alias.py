@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Constant time weighted selection using Vose's alias method
+"""
+import random
+
+
+class AliasTable(object):
+    """
+    An immutable table for drawing items with probability proportional
+    to their weight.
+
+    Building the table is O(n). Each draw takes a single random number
+    and at most one comparison, regardless of the number of items.
+
+    Parameters
+    ----------
+    items : sequence
+        The items to draw from
+
+    weights : sequence
+        A non-negative weight for each item. At least one must be positive.
+
+    Examples
+    --------
+    >>> table = AliasTable(['a', 'b'], [3, 1])
+    >>> table.pick()
+    'a'
+    """
+    __slots__ = ('items', '_n', '_prob', '_alias')
+
+    def __init__(self, items, weights):
+        items = tuple(items)
+        weights = [float(w) for w in weights]
+        n = len(items)
+        total = sum(weights)
+        if n == 0 or n != len(weights) or total <= 0:
+            raise ValueError('An alias table needs items with a positive total weight')  # noqa
+
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            g = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = g
+            scaled[g] = scaled[g] + scaled[s] - 1.0
+            if scaled[g] < 1.0:
+                small.append(g)
+            else:
+                large.append(g)
+        # Anything left over is 1.0 up to rounding error and keeps
+        # the defaults set above.
+
+        self.items = items
+        self._n = n
+        self._prob = tuple(prob)
+        self._alias = tuple(items[a] for a in alias)
+
+    def __len__(self):
+        return self._n
+
+    def pick(self, rand=random.random):
+        """
+        Draw one item.
+
+        Parameters
+        ----------
+        rand : callable
+            Returns a float in [0, 1). Pass the `random` method of a
+            seeded `random.Random` for reproducible draws.
+        """
+        x = rand() * self._n
+        i = int(x)
+        if x - i < self._prob[i]:
+            return self.items[i]
+        return self._alias[i]
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Open-loop, constant arrival rate request scheduling
+
+Molotov workers run closed-loop: a worker only sends its next request
+once the previous one has finished, so the offered load drops as the
+target slows down. The scheduler in this module starts scenarios at
+fixed or Poisson-distributed arrival times no matter how long earlier
+responses take, which keeps the offered rate at the requested value.
+
+The rate is either a constant `rate` or follows a load `shape` (see
+`loadgen.shape`) which started at the wall-clock time `shape_start`.
+"""
+import asyncio
+import math
+import random
+import time
+
+from .shape import Shape
+from .shard import Shard
+
+FIXED = 'fixed'
+POISSON = 'poisson'
+PROCESSES = (FIXED, POISSON)
+
+# The default cap on scenarios which have been started but not finished
+MAX_IN_FLIGHT = 1000
+
+# A send later than this, in seconds, is counted as late
+LATE_TOLERANCE = 0.01
+
+# The length, in seconds, of the schedule covered by one call to `run()`
+SLICE = 1.0
+
+# How often, in seconds, the rate of a shaped job is worked out afresh
+RESOLUTION = 0.05
+
+
+class ArrivalScheduler(object):
+    """
+    Fire scenarios at a target rate, independently of response times.
+
+    Parameters
+    ----------
+    config : LiveConfig
+        Provides `rate` (scenarios per second), `arrival` (`fixed` or
+        `poisson`) and `max_in_flight`, or a `shape` with its
+        `shape_start` and `shape_scale` in place of `rate`. These are
+        read at the start of each slice so they can be changed while
+        the job is running.
+
+    fire : callable
+        A coroutine function called with the session to run a single
+        scenario.
+
+    rng : random.Random
+        The source of Poisson inter-arrival times.
+
+    shard : Shard
+        This process's part of the job. The rate and `max_in_flight` are
+        split between the shards, and fixed sends of the shards are
+        interleaved on a wall-clock grid.
+
+    clock : callable
+        The source of wall-clock time, which the start of a shape and
+        the grid of the shards are set in. Sends are timed with the
+        event loop clock, but the shards of a job only share wall-clock
+        time, which is why the grid is not laid out on the loop clock.
+
+    Notes
+    -----
+    A send which cannot start because `max_in_flight` scenarios are
+    already running is skipped and counted as `missed`. A send which
+    starts more than `LATE_TOLERANCE` seconds after its scheduled time
+    is counted as `late`. Both mean the loadgen, and not the target,
+    is limiting the offered rate.
+
+    The rate of a shaped job is worked out every `RESOLUTION` seconds
+    and the time left until the next send is stretched or shrunk to
+    match, so the sends follow the shape closely even when the rate
+    changes much faster than once per send.
+    """
+    def __init__(self, config, fire, rng=None, shard=None,
+                 clock=time.time):
+        self.config = config
+        self.fire = fire
+        self.rng = rng or random
+        self.shard = shard or Shard()
+        self.clock = clock
+        self.counters = {
+            'sent': 0,
+            'completed': 0,
+            'failed': 0,
+            'late': 0,
+            'missed': 0,
+        }
+        self.in_flight = 0
+        self._next_at = None
+        self._rate = None
+        self._owed = None
+        self._owed_at = None
+        self._shape = None
+        self._shape_spec = None
+
+    def shape(self):
+        """
+        Return the `Shape` of the job, or None if it has a constant rate
+        """
+        spec = self.config.get('shape')
+        if spec is not self._shape_spec:
+            # A reloaded configuration holds new objects
+            self._shape = Shape(spec) if spec else None
+            self._shape_spec = spec
+        return self._shape
+
+    def rate(self) -> float:
+        """
+        Return this shard's target rate in scenarios per second
+        """
+        shape = self.shape()
+        if shape is None:
+            return self.shard.scale(float(self.config.get('rate') or 0))
+        elapsed = self.clock() - float(self.config.get('shape_start') or 0)
+        scale = float(self.config.get('shape_scale') or 1)
+        return self.shard.scale(shape.rate(elapsed) * scale)
+
+    def snapshot(self) -> dict:
+        """
+        Return the counters along with the number of scenarios in flight
+        """
+        ret = dict(self.counters)
+        ret['in_flight'] = self.in_flight
+        return ret
+
+    def _offset(self, rate: float) -> float:
+        """
+        Return how long to wait for this shard's next slot on the
+        wall-clock grid of fixed sends
+        """
+        if self.shard.count == 1 or \
+                self.config.get('arrival', FIXED) == POISSON:
+            return 0.0
+        interval = 1.0 / rate
+        wall = self.clock() / interval - self.shard.phase
+        return (math.ceil(wall) - wall) * interval
+
+    def _interval(self, rate: float) -> float:
+        if self.config.get('arrival', FIXED) == POISSON:
+            return self.rng.expovariate(rate)
+        return 1.0 / rate
+
+    async def run(self, session, duration=SLICE) -> None:
+        """
+        Run the schedule for `duration` seconds.
+
+        The schedule carries over between calls so that Molotov can
+        check whether the job should stop between two slices without
+        losing or bunching up sends.
+
+        Parameters
+        ----------
+        session : aiohttp.ClientSession
+            The session passed to every scenario which is fired.
+
+        duration : float
+            How many seconds of the schedule to run.
+        """
+        if self.shape() is not None:
+            await self._run_shaped(session, duration)
+            return
+        self._owed = None
+        loop = asyncio.get_event_loop()
+        rate = self.rate()
+        now = loop.time()
+        if rate <= 0:
+            self._next_at = None
+            await asyncio.sleep(duration)
+            return
+        if self._next_at is None or rate != self._rate or \
+                now - self._next_at > duration:
+            # Starting, changing rate or resuming after a pause.
+            self._next_at = now + self._offset(rate)
+            self._rate = rate
+        max_in_flight = self.shard.split(
+            self.config.get('max_in_flight') or MAX_IN_FLIGHT)
+        end = now + duration
+        while self._next_at < end:
+            now = loop.time()
+            if self._next_at > now:
+                await asyncio.sleep(self._next_at - now)
+                now = loop.time()
+            self._send(session, now - self._next_at, max_in_flight)
+            self._next_at += self._interval(rate)
+
+    async def _run_shaped(self, session, duration):
+        """
+        Run the schedule of a shaped job for `duration` seconds.
+
+        `_owed` is the part of an interval which is left until the next
+        send, in sends: 1 for a whole interval at the current rate.
+        """
+        loop = asyncio.get_event_loop()
+        self._next_at = None
+        now = loop.time()
+        end = now + duration
+        max_in_flight = self.shard.split(
+            self.config.get('max_in_flight') or MAX_IN_FLIGHT)
+        poisson = self.config.get('arrival', FIXED) == POISSON
+        if self._owed is None or now - self._owed_at > duration:
+            # Starting or resuming after a pause. Fixed sends of the
+            # shards interleave.
+            self._owed = self.rng.expovariate(1.0) if poisson \
+                else self.shard.phase
+            self._owed_at = now
+        while now < end:
+            rate = self.rate()
+            self._owed -= (now - self._owed_at) * rate
+            self._owed_at = now
+            if rate > 0 and self._owed <= 0:
+                self._send(session, -self._owed / rate, max_in_flight)
+                self._owed += self.rng.expovariate(1.0) if poisson else 1.0
+                continue
+            wait = self._owed / rate if rate > 0 else RESOLUTION
+            await asyncio.sleep(min(wait, RESOLUTION, end - now))
+            now = loop.time()
+
+    def _send(self, session, lateness: float, max_in_flight: int) -> None:
+        """
+        Fire a scenario `lateness` seconds after it was due, unless too
+        many are in flight
+        """
+        if lateness > LATE_TOLERANCE:
+            self.counters['late'] += 1
+        if self.in_flight >= max_in_flight:
+            self.counters['missed'] += 1
+        else:
+            self.in_flight += 1
+            self.counters['sent'] += 1
+            asyncio.ensure_future(self._run_one(session))
+
+    async def _run_one(self, session):
+        try:
+            await self.fire(session)
+            self.counters['completed'] += 1
+        except Exception:
+            self.counters['failed'] += 1
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Run many load-generation jobs in a single process
+
+Molotov runs one scenario file against one target per process. The
+engine loads the scenario file of every job it is given into the same
+process and event loop, each with its own environment, scenario table,
+connection pool and workers. Jobs are started and stopped at runtime
+through JSON lines on a unix socket:
+
+    {"op": "start", "job": "python", "scenario": "scenarios/dyno.py",
+     "env": {"OPBEANS_BASE_URL": "http://toxi:8000", ...},
+     "workers": 32, "delay": 0.6, "duration": 31536000}
+    {"op": "stop", "job": "python"}
+    {"op": "list"}
+
+Every request is answered with one line holding `ok` and, on failure,
+an `error`. Run the engine with
+
+    python -m loadgen.engine --socket /tmp/dyno/engine.sock
+
+or give it jobs to start right away with `--job`, and the settings of
+each with `--env`:
+
+    python -m loadgen.engine --job opbeans-python http://toxi:8000 0 600 \\
+        --env opbeans-python ARRIVAL_RATE=10
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import re
+from contextlib import contextmanager
+
+from aiohttp import ClientSession
+
+from .settings import ENGINE_ENV
+
+DEFAULT_SOCKET = '/tmp/dyno/engine.sock'
+
+DEFAULT_SCENARIO = 'molotov_scenarios.py'
+
+
+@contextmanager
+def _environ(env: dict):
+    """
+    Replace the environment while a scenario file is imported. The
+    scenario files read their settings from it at import.
+    """
+    saved = dict(os.environ)
+    os.environ.clear()
+    os.environ.update(env)
+    os.environ[ENGINE_ENV] = '1'
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+
+def load_table(job: str, path: str, env: dict):
+    """
+    Import a scenario file for a job and return its `ScenarioTable`
+
+    The module is not added to `sys.modules`, so every job gets its own
+    copy of the scenario file and its module-level state.
+
+    Parameters
+    ----------
+    job : str
+        The name of the job
+
+    path : str
+        The scenario file
+
+    env : dict
+        The environment the scenario file is imported with
+
+    Returns
+    -------
+    ScenarioTable
+        The table named `TABLE` in the scenario file
+    """
+    name = 'loadgen_job_' + re.sub(r'\W', '_', job)
+    spec = importlib.util.spec_from_file_location(name, path)
+    if spec is None:
+        raise ValueError('Cannot load scenario file: {}'.format(path))
+    module = importlib.util.module_from_spec(spec)
+    with _environ(env):
+        spec.loader.exec_module(module)
+    table = getattr(module, 'TABLE', None)
+    if table is None or not getattr(table, 'standalone', False):
+        raise ValueError('{} does not define a scenario TABLE'.format(path))
+    return table
+
+
+class EngineJob(object):
+    """
+    One job running inside the engine.
+
+    Parameters
+    ----------
+    name : str
+        The name of the job
+
+    table : ScenarioTable
+        The scenarios of the job
+
+    workers : int
+        The number of workers. As with Molotov, the table decides how
+        many of them generate load.
+
+    delay : float
+        Seconds each worker waits between two scenarios
+
+    duration : float
+        Seconds the job runs for
+    """
+    def __init__(self, name, table, workers=1, delay=0.0, duration=None):
+        self.name = name
+        self.table = table
+        self.workers = workers
+        self.delay = delay
+        self.duration = duration
+        self.counters = {'ok': 0, 'failed': 0}
+        self.task = None
+        table.reporter.add_source('steps', self.snapshot)
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def snapshot(self) -> dict:
+        return dict(self.counters)
+
+    def start(self) -> None:
+        self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self) -> None:
+        if self.running:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self) -> None:
+        """
+        Run the workers until the duration is up or the job is stopped
+        """
+        loop = asyncio.get_event_loop()
+        end = loop.time() + self.duration if self.duration else None
+        table = self.table
+        # All workers of a job share one session. The table's fixtures
+        # start and stop its reporting as they do under Molotov.
+        session = ClientSession(**await table.setup(0, None))
+        await table.setup_session(0, session)
+        workers = [
+            asyncio.ensure_future(self._worker(wid, session, end))
+            for wid in range(self.workers)
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await session.close()
+            await table.teardown_session(0, session)
+
+    async def _worker(self, wid, session, end):
+        loop = asyncio.get_event_loop()
+        table = self.table
+        funcs = table.funcs
+        step = 0
+        while end is None or loop.time() < end:
+            step += 1
+            name = table.pick(wid, step)
+            try:
+                await funcs[name](session)
+                self.counters['ok'] += 1
+            except Exception:
+                self.counters['failed'] += 1
+            if self.delay > 0:
+                await asyncio.sleep(self.delay)
+            else:
+                # Let the other workers and jobs run
+                await asyncio.sleep(0)
+
+
+class Engine(object):
+    """
+    The set of jobs running in this process
+    """
+    def __init__(self):
+        self.jobs = {}
+
+    async def start_job(self, job, scenario=DEFAULT_SCENARIO, env=None,
+                        workers=1, delay=0.0, duration=None) -> None:
+        """
+        Start a job, replacing any job of the same name
+        """
+        await self.stop_job(job)
+        table = load_table(job, scenario, env or dict(os.environ))
+        engine_job = EngineJob(
+            job,
+            table,
+            workers=int(workers),
+            delay=float(delay),
+            duration=float(duration) if duration else None,
+        )
+        self.jobs[job] = engine_job
+        engine_job.start()
+
+    async def stop_job(self, job) -> None:
+        engine_job = self.jobs.pop(job, None)
+        if engine_job is not None:
+            await engine_job.stop()
+
+    def list_jobs(self) -> dict:
+        return {
+            name: dict(job.counters, running=job.running)
+            for name, job in self.jobs.items()
+        }
+
+    async def dispatch(self, request: dict) -> dict:
+        """
+        Carry out one control request and return the response
+        """
+        try:
+            op = request.pop('op', None)
+            if op == 'start':
+                await self.start_job(**request)
+            elif op == 'stop':
+                await self.stop_job(request['job'])
+            elif op == 'list':
+                return {'ok': True, 'jobs': self.list_jobs()}
+            elif op != 'ping':
+                raise ValueError('Unknown op: {}'.format(op))
+        except Exception as exc:
+            return {'ok': False, 'error': '{}: {}'.format(type(exc).__name__, exc)}  # noqa
+        return {'ok': True}
+
+    async def handle(self, reader, writer) -> None:
+        """
+        Serve one control connection
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line.decode('utf-8'))
+                except ValueError as exc:
+                    response = {'ok': False, 'error': str(exc)}
+                else:
+                    response = await self.dispatch(request)
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, path: str) -> None:
+        """
+        Accept control connections on a unix socket until cancelled
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+        server = await asyncio.start_unix_server(self.handle, path=path)
+        try:
+            await server.serve_forever()
+        finally:
+            for job in list(self.jobs):
+                await self.stop_job(job)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='python -m loadgen.engine',
+        description='Run many load-generation jobs in one process'
+    )
+    parser.add_argument(
+        '--socket',
+        default=DEFAULT_SOCKET,
+        help='The unix socket to accept control requests on'
+    )
+    parser.add_argument(
+        '--job',
+        nargs=4,
+        action='append',
+        default=[],
+        metavar=('NAME', 'URL', 'DELAY', 'DURATION'),
+        help='Start a job for an Opbean when the engine starts'
+    )
+    parser.add_argument(
+        '--env',
+        nargs=2,
+        action='append',
+        default=[],
+        metavar=('NAME', 'KEY=VALUE'),
+        help='Set an environment variable for a job given with --job, '
+             'for example its ARRIVAL_RATE'
+    )
+    parser.add_argument(
+        '--scenario',
+        default=DEFAULT_SCENARIO,
+        help='The scenario file for jobs given with --job'
+    )
+    parser.add_argument(
+        '--no-uvloop',
+        action='store_true',
+        help='Use the default asyncio event loop'
+    )
+    args = parser.parse_args(argv)
+
+    if not args.no_uvloop:
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+
+    engine = Engine()
+
+    async def _main():
+        for name, url, delay, duration in args.job:
+            env = dict(os.environ, OPBEANS_BASE_URL=url, OPBEANS_NAME=name)
+            env.update(
+                setting.split('=', 1) for job, setting in args.env
+                if job == name and '=' in setting
+            )
+            await engine.start_job(
+                name,
+                scenario=args.scenario,
+                env=env,
+                delay=delay,
+                duration=duration
+            )
+        await engine.serve(args.socket)
+
+    asyncio.run(_main())
+
+
+if __name__ == '__main__':
+    main()
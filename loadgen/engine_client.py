@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Blocking clients for the control sockets of `loadgen.engine` and
+`loadgen.zygote`
+
+This module does not import aiohttp so that Dyno can use it.
+"""
+import json
+import os
+import socket
+
+from .shard import exit_code
+
+# Seconds to wait for the engine to answer a request
+TIMEOUT = 10.0
+
+
+class EngineError(RuntimeError):
+    """
+    Raised when the engine cannot be reached or refuses a request
+    """
+
+
+class EngineClient(object):
+    """
+    Sends control requests to an engine.
+
+    Parameters
+    ----------
+    path : str
+        The unix socket the engine listens on
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def request(self, op: str, **kw) -> dict:
+        """
+        Send one request and return the response
+
+        Raises
+        ------
+        EngineError
+            If the engine cannot be reached or the request failed
+        """
+        kw['op'] = op
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(TIMEOUT)
+                sock.connect(self.path)
+                sock.sendall(json.dumps(kw).encode('utf-8') + b'\n')
+                data = b''
+                while not data.endswith(b'\n'):
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    data += chunk
+        except OSError as exc:
+            raise EngineError('Engine unavailable: {}'.format(exc))
+        try:
+            response = json.loads(data.decode('utf-8'))
+        except ValueError:
+            raise EngineError('Bad response from engine: {!r}'.format(data))
+        if not response.get('ok'):
+            raise EngineError(response.get('error', 'Unknown error'))
+        return response
+
+    def ping(self) -> bool:
+        """
+        Check whether the engine is answering
+        """
+        try:
+            self.request('ping')
+        except EngineError:
+            return False
+        return True
+
+    def start(self, job: str, **kw) -> None:
+        self.request('start', job=job, **kw)
+
+    def stop(self, job: str) -> None:
+        self.request('stop', job=job)
+
+    def list(self) -> dict:
+        return self.request('list')['jobs']
+
+
+class RemoteJob(object):
+    """
+    A job running in an engine, with the parts of the `subprocess.Popen`
+    interface Dyno uses to track jobs.
+    """
+    pid = None
+
+    def __init__(self, client, job):
+        self.client = client
+        self.job = job
+
+    def poll(self):
+        """
+        Return None while the job is running, like `Popen.poll()`
+        """
+        try:
+            jobs = self.client.list()
+        except EngineError:
+            return 1
+        if jobs.get(self.job, {}).get('running'):
+            return None
+        return 0
+
+    def stop(self) -> None:
+        try:
+            self.client.stop(self.job)
+        except EngineError:
+            pass
+
+
+class ZygoteClient(EngineClient):
+    """
+    Sends control requests to a zygote. Failures raise `EngineError`
+    as they do for the engine.
+    """
+    def spawn(self, args, env, cwd=None, leader=None) -> int:
+        """
+        Fork a Molotov job and return its pid
+        """
+        return self.request(
+            'spawn', args=args, env=env, cwd=cwd, leader=leader
+        )['pid']
+
+    def status(self, pid: int) -> dict:
+        return self.request('status', pid=pid)
+
+
+class WarmJob(object):
+    """
+    The processes of a job forked by a zygote, with the parts of the
+    `subprocess.Popen` interface Dyno uses to track jobs. The first
+    process leads the process group of the job.
+
+    Parameters
+    ----------
+    client : ZygoteClient
+        The zygote which forked the job
+
+    pids : list
+        The pid of every process of the job
+    """
+    def __init__(self, client, pids):
+        self.client = client
+        self.pids = list(pids)
+
+    @property
+    def pid(self) -> int:
+        return self.pids[0]
+
+    def poll(self):
+        """
+        Return the exit code of the job like `Popen.poll()`, see
+        `loadgen.shard.exit_code()`
+        """
+        return exit_code(self._codes())
+
+    def running(self) -> bool:
+        """
+        Check whether any process is still running, as the others do
+        after one of them crashed
+        """
+        return any(code is None for code in self._codes())
+
+    def _codes(self) -> list:
+        """
+        Return the exit code of every process, or None for those still
+        running
+        """
+        codes = []
+        for pid in self.pids:
+            try:
+                status = self.client.status(pid)
+            except EngineError:
+                # The processes outlive the zygote but cannot be reaped
+                try:
+                    os.kill(pid, 0)
+                except ProcessLookupError:
+                    codes.append(1)
+                    continue
+                codes.append(None)
+                continue
+            if status['running']:
+                codes.append(None)
+            else:
+                codes.append(status.get('exit_code') or 0)
+        return codes
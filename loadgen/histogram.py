@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Fixed-size log-linear latency histograms
+
+Values are recorded in microseconds into buckets which are linear within
+each power of two, in the manner of an HDR histogram. With `SUB_BITS`
+of 7 every value is kept to within 1/64 (about 1.6%) of its true value,
+from 1 microsecond up to `MAX_VALUE`, in a table of `SIZE` counters
+which never grows. Recording a value allocates nothing.
+
+Snapshots are sparse dictionaries of plain numbers, so snapshots from
+several processes are merged by adding them key by key.
+"""
+from array import array
+
+# Bits of precision kept for every value
+SUB_BITS = 7
+SUB_COUNT = 1 << SUB_BITS
+HALF_COUNT = SUB_COUNT >> 1
+
+# The largest value which can be told apart, about 19 hours in microseconds.
+# Larger values are recorded as this value.
+MAX_BITS = 36
+MAX_VALUE = (1 << MAX_BITS) - 1
+
+SIZE = HALF_COUNT * (MAX_BITS - SUB_BITS + 2)
+
+# The percentiles reported by `summarize`
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+def index_of(value: int) -> int:
+    """
+    Return the bucket for a value in microseconds
+    """
+    if value < SUB_COUNT:
+        return value if value > 0 else 0
+    if value > MAX_VALUE:
+        value = MAX_VALUE
+    shift = value.bit_length() - SUB_BITS
+    return HALF_COUNT * shift + (value >> shift)
+
+
+def value_of(index: int) -> int:
+    """
+    Return the value in the middle of a bucket
+    """
+    if index < SUB_COUNT:
+        return index
+    shift = index // HALF_COUNT - 1
+    low = (index - HALF_COUNT * shift) << shift
+    return low + ((1 << shift) >> 1)
+
+
+class Histogram(object):
+    """
+    A latency histogram of constant size.
+
+    Examples
+    --------
+    >>> hist = Histogram()
+    >>> hist.record(1500)
+    >>> hist.percentile(50)
+    1500
+    """
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = array('q', bytes(8 * SIZE))
+        self.count = 0
+        self.total = 0
+
+    def record(self, value: int) -> None:
+        """
+        Record one value, in microseconds
+        """
+        self.counts[index_of(value)] += 1
+        self.count += 1
+        self.total += value
+
+    def percentile(self, q: float) -> int:
+        """
+        Return the value below which `q` percent of the values fall,
+        in microseconds
+        """
+        if not self.count:
+            return 0
+        rank = max(int(self.count * q / 100.0 + 0.5), 1)
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return value_of(index)
+        return value_of(SIZE - 1)
+
+    def max(self) -> int:
+        for index in range(SIZE - 1, -1, -1):
+            if self.counts[index]:
+                return value_of(index)
+        return 0
+
+    def snapshot(self) -> dict:
+        """
+        Return the histogram as a sparse dictionary
+        """
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'buckets': {str(i): n for i, n in enumerate(self.counts) if n},
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict) -> 'Histogram':
+        """
+        Rebuild a histogram from `snapshot()`, or from a merge of them
+        """
+        ret = cls()
+        for index, n in snapshot.get('buckets', {}).items():
+            ret.counts[int(index)] += n
+        ret.count = snapshot.get('count', 0)
+        ret.total = snapshot.get('sum', 0)
+        return ret
+
+
+def difference(snapshot: dict, earlier: dict) -> dict:
+    """
+    Return a snapshot of the values recorded between two snapshots of
+    the same histogram
+
+    Parameters
+    ----------
+    snapshot : dict
+        A histogram snapshot, possibly merged from several processes
+
+    earlier : dict
+        An earlier snapshot of the same histogram. Buckets which went
+        down, because a process started over, are taken as empty.
+
+    Returns
+    -------
+    dict
+        A snapshot holding only the newer values
+    """
+    before = earlier.get('buckets', {})
+    buckets = {}
+    for index, n in snapshot.get('buckets', {}).items():
+        n -= before.get(index, 0)
+        if n > 0:
+            buckets[index] = n
+    return {
+        'count': sum(buckets.values()),
+        'sum': max(snapshot.get('sum', 0) - earlier.get('sum', 0), 0),
+        'buckets': buckets,
+    }
+
+
+def summarize(snapshot: dict, elapsed: float) -> dict:
+    """
+    Turn a histogram snapshot into the numbers people want to read
+
+    Parameters
+    ----------
+    snapshot : dict
+        A histogram snapshot, possibly merged from several processes
+
+    elapsed : float
+        The time in seconds over which the values were recorded
+
+    Returns
+    -------
+    dict
+        The count, throughput in requests per second and the mean,
+        maximum and percentile latencies in milliseconds
+    """
+    hist = Histogram.from_snapshot(snapshot)
+    ret = {
+        'count': hist.count,
+        'throughput': round(hist.count / elapsed, 3) if elapsed > 0 else 0.0,
+        'mean': round(hist.total / hist.count / 1000.0, 3) if hist.count else 0.0,  # noqa
+        'max': hist.max() / 1000.0,
+    }
+    for q in PERCENTILES:
+        ret['p{:g}'.format(q)] = hist.percentile(q) / 1000.0
+    return ret
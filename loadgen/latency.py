@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Per-scenario request latencies recorded from aiohttp tracing
+
+The scenario a request belongs to is taken from `CURRENT_SCENARIO`,
+which the scenario table sets before each scenario runs. Molotov calls
+the picker and the scenario from the same worker task, so the value is
+seen by every request the scenario makes.
+"""
+import contextvars
+import time
+
+from aiohttp import TraceConfig
+
+from .histogram import Histogram
+
+CURRENT_SCENARIO = contextvars.ContextVar('scenario', default='unknown')
+
+# The status recorded for a request which did not get a response
+ERROR_STATUS = 'error'
+
+
+class LatencyRecorder(object):
+    """
+    Keeps one histogram per scenario and response status, the
+    wall-clock time of the first request and the number of requests
+    waiting for a response
+    """
+    def __init__(self):
+        self.histograms = {}
+        self.first_request = None
+        self.in_flight = 0
+
+    def record(self, scenario: str, status, value: int) -> None:
+        """
+        Record a latency in microseconds
+        """
+        key = (scenario, status)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = Histogram()
+        hist.record(value)
+
+    def trace_config(self) -> TraceConfig:
+        """
+        Return a `TraceConfig` which records every request of a session
+        """
+        trace = TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_request_end.append(self._on_request_end)
+        trace.on_request_exception.append(self._on_request_exception)
+        return trace
+
+    def snapshot(self) -> dict:
+        """
+        Return the histograms keyed by scenario and then status
+        """
+        ret = {}
+        for (scenario, status), hist in self.histograms.items():
+            ret.setdefault(scenario, {})[str(status)] = hist.snapshot()
+        return ret
+
+    def requests(self) -> dict:
+        """
+        Return the number of requests waiting for a response
+        """
+        return {'in_flight': self.in_flight}
+
+    async def _on_request_start(self, session, ctx, params):
+        if self.first_request is None:
+            self.first_request = time.time()
+        ctx.start = time.perf_counter()
+        self.in_flight += 1
+
+    async def _on_request_end(self, session, ctx, params):
+        self.in_flight -= 1
+        self.record(
+            CURRENT_SCENARIO.get(),
+            params.response.status,
+            int((time.perf_counter() - ctx.start) * 1e6)
+        )
+
+    async def _on_request_exception(self, session, ctx, params):
+        self.in_flight -= 1
+        self.record(
+            CURRENT_SCENARIO.get(),
+            ERROR_STATUS,
+            int((time.perf_counter() - ctx.start) * 1e6)
+        )
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Live configuration for running load-generation jobs
+
+Dyno writes the tunable parts of a job configuration to a JSON file
+and passes its location in the `DYNO_JOB_CONFIG` environment variable.
+The scenarios check the file for changes as they pick their next
+request, so a job can be re-weighted without restarting Molotov.
+"""
+import json
+import os
+import time
+
+CONFIG_ENV = 'DYNO_JOB_CONFIG'
+
+# How often, in seconds, the configuration file is checked for changes
+RELOAD_INTERVAL = 1.0
+
+
+def _env_defaults() -> dict:
+    """
+    Build the initial set of tunables from the environment variables
+    which have always been used to control the scenarios.
+    """
+    return {
+        'workers': None,
+        'error_weight': int(float(os.environ.get('ERROR_WEIGHT', 2))),
+        'app_latency_weight': int(float(os.environ.get('APP_LATENCY_WEIGHT', 0))),  # noqa
+        'app_latency_label': os.environ.get('APP_LATENCY_LABEL', 'browser_latency_delay'),  # noqa
+        'app_latency_lower_bound': int(float(os.environ.get('APP_LATENCY_LOWER_BOUND', 1))),  # noqa
+        'app_latency_upper_bound': int(float(os.environ.get('APP_LATENCY_UPPER_BOUND', 1000))),  # noqa
+        'app_latency_user_agent': os.environ.get('APP_LATENCY_USER_AGENT', 'Safari/531.21.10'),  # noqa
+        'rate': float(os.environ.get('ARRIVAL_RATE', 0)),
+        'arrival': os.environ.get('ARRIVAL_PROCESS', 'fixed'),
+        'max_in_flight': int(os.environ.get('MAX_IN_FLIGHT', 1000)),
+        'start_at': None,
+    }
+
+
+class LiveConfig(object):
+    """
+    A set of job tunables which can be reloaded from disk while the
+    job is running.
+
+    Parameters
+    ----------
+    path : str
+        The JSON file to watch. If `None`, the configuration never
+        changes after it is created.
+
+    defaults : dict
+        Values to use for keys which are missing from the file.
+
+    interval : float
+        The minimum number of seconds between two checks of the file.
+    """
+    def __init__(self, path=None, defaults=None, interval=RELOAD_INTERVAL):
+        self.path = path
+        self.values = dict(defaults or {})
+        self.interval = interval
+        self.version = 0
+        self._mtime = None
+        self._next_check = 0.0 if path else float('inf')
+
+    @classmethod
+    def from_env(cls):
+        """
+        Create a configuration from the environment of the current process.
+
+        Returns
+        -------
+        LiveConfig
+            A configuration which watches the file named by `DYNO_JOB_CONFIG`,
+            if any, and falls back to the scenario environment variables.
+        """
+        config = cls(os.environ.get(CONFIG_ENV), _env_defaults())
+        config.refresh()
+        return config
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def refresh(self) -> bool:
+        """
+        Reload the configuration if the file changed since the last check.
+
+        This is called on every scenario pick so it only touches the
+        filesystem once per `interval`.
+
+        Returns
+        -------
+        bool
+            True if new values were loaded
+        """
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.interval
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            with open(self.path, 'r') as fh_:
+                values = json.load(fh_)
+        except (OSError, ValueError):
+            # Half-written or removed. We will try again next interval.
+            return False
+        self._mtime = mtime
+        self.update(values)
+        return True
+
+    def update(self, values: dict) -> None:
+        """
+        Apply a new set of values and bump the configuration version
+        """
+        self.values.update(values)
+        self.version += 1
+
+
+def write(path: str, values: dict) -> None:
+    """
+    Atomically replace a live configuration file.
+
+    Parameters
+    ----------
+    path : str
+        The file to write. Parent directories are created as needed.
+
+    values : dict
+        The tunables to write. Must be serializable to JSON.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as fh_:
+        json.dump(values, fh_)
+    os.replace(tmp_path, path)
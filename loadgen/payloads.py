@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Pre-encoded request bodies for the scenarios
+
+Building an order and encoding it as JSON, or as a multipart form with
+a CSV file, on every request is the most expensive part of the order
+scenarios. A pool builds a fixed number of varied bodies once, as
+bytes, and hands them out in turn, so a request only has to take the
+next one. The bodies are the same on the wire as the ones the scenarios
+used to build: the JSON body keeps the content type aiohttp gave the
+string, and the multipart body has the parts and headers of the
+`FormData` it replaces, with a fixed boundary.
+"""
+import itertools
+import json
+import random
+
+from .settings import payload_settings_from_env
+
+# The boundary of the multipart bodies. It cannot appear in the parts,
+# which only hold digits, commas and newlines.
+BOUNDARY = 'loadgen-4f1ac2b8d0e6497a9b3c5e7f0a2d4c6b'
+
+# The headers of a JSON order, as aiohttp sent a string body
+JSON_HEADERS = {'Content-Type': 'text/plain; charset=utf-8'}
+
+# The headers of a multipart order
+CSV_HEADERS = {
+    'Content-Type': 'multipart/form-data; boundary={}'.format(BOUNDARY),
+}
+
+
+def order(rng=random) -> tuple:
+    """
+    Return a random order as its customer ID and a list of
+    `(product ID, amount)` lines
+    """
+    customer_id = rng.randint(1, 1000)
+    lines = [
+        (rng.randint(1, 6), rng.randint(1, 4))
+        for _ in range(rng.randint(1, 5))
+    ]
+    return customer_id, lines
+
+
+def order_json(rng=random) -> bytes:
+    """
+    Return a random order for `POST /api/orders`
+    """
+    customer_id, lines = order(rng)
+    return json.dumps({
+        'customer_id': customer_id,
+        'lines': [{'id': id_, 'amount': amount} for id_, amount in lines],
+    }).encode('utf-8')
+
+
+def order_csv(rng=random) -> bytes:
+    """
+    Return a random order for `POST /api/orders/csv`
+    """
+    customer_id, lines = order(rng)
+    customer = str(customer_id).encode('utf-8')
+    csv = '\n'.join(
+        '{},{}'.format(id_, amount) for id_, amount in lines
+    ).encode('utf-8')
+    return b''.join([
+        b'--', BOUNDARY.encode(), b'\r\n',
+        b'Content-Disposition: form-data; name="customer"\r\n',
+        b'Content-Type: text/plain; charset=utf-8\r\n',
+        b'Content-Length: %d\r\n\r\n' % len(customer),
+        customer, b'\r\n',
+        b'--', BOUNDARY.encode(), b'\r\n',
+        b'Content-Type: text/plain\r\n',
+        b'Content-Disposition: form-data; name="file"; filename="data.csv";'
+        b' filename*=utf-8\'\'data.csv\r\n',
+        b'Content-Length: %d\r\n\r\n' % len(csv),
+        csv, b'\r\n',
+        b'--', BOUNDARY.encode(), b'--\r\n',
+    ])
+
+
+class PayloadPool(object):
+    """
+    A fixed set of request bodies which are handed out in turn.
+
+    Parameters
+    ----------
+    build : callable
+        Called with a `random.Random` to build one body
+
+    headers : dict
+        The headers to send with every body of the pool
+
+    size : int
+        The number of bodies. Defaults to `LOADGEN_PAYLOAD_POOL`.
+
+    seed : int
+        The seed of the bodies. None for a random seed.
+
+    Examples
+    --------
+    >>> ORDERS = PayloadPool(order_json, JSON_HEADERS)
+    >>> session.post(ORDERS_URL, data=ORDERS.next(), headers=ORDERS.headers)
+    """
+    __slots__ = ('build', 'headers', 'size', 'bodies', 'next')
+
+    def __init__(self, build, headers=None, size=None, seed=None):
+        self.build = build
+        self.headers = headers
+        self.size = max(int(size or payload_settings_from_env()[
+            'payload_pool']), 1)
+        self.reseed(seed)
+
+    def __len__(self):
+        return self.size
+
+    def reseed(self, seed=None) -> None:
+        """
+        Build a new set of bodies from `seed`. The bodies handed out
+        next come from the new set.
+        """
+        rng = random.Random(seed)
+        self.bodies = tuple(self.build(rng) for _ in range(self.size))
+        # Taking a body is a single call which allocates nothing
+        self.next = itertools.cycle(self.bodies).__next__
+
+    def nbytes(self) -> int:
+        """
+        Return the size of all bodies of the pool, in bytes
+        """
+        return sum(len(body) for body in self.bodies)
+
+
+def json_orders(size=None, seed=None) -> PayloadPool:
+    """
+    Return a pool of bodies for `POST /api/orders`
+    """
+    return PayloadPool(order_json, JSON_HEADERS, size=size, seed=seed)
+
+
+def csv_orders(size=None, seed=None) -> PayloadPool:
+    """
+    Return a pool of bodies for `POST /api/orders/csv`
+    """
+    return PayloadPool(order_csv, CSV_HEADERS, size=size, seed=seed)
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Replay of recorded requests from a JSONL capture
+
+Each line of a capture is one request, in the order they were made:
+
+    {"ts": 12.5, "method": "POST", "path": "/api/orders",
+     "headers": {"Content-Type": "application/json"},
+     "body": "{\\"customer_id\\": 7, \\"lines\\": []}"}
+
+`ts` is the time of the request in seconds since the capture started.
+Only `path` is required: `method` defaults to GET, and `headers` and
+`body` to none. Lines which cannot be parsed are skipped.
+
+The capture is read one line at a time as the replay reaches it, so a
+capture of any size takes no more memory than the requests in flight.
+Requests are sent at their recorded times, divided by the live
+`replay_speed`, no matter how long earlier responses take. Once the
+capture is over it starts again from the top unless `replay_loop` is
+off. The processes of a sharded job each send every n-th request.
+"""
+import asyncio
+import json
+
+from .latency import CURRENT_SCENARIO
+from .shard import Shard
+
+# The name under which replayed requests are recorded
+REPLAY_SCENARIO = 'loadgen_replay'
+
+# The length, in seconds, of the replay covered by one call to `run()`
+SLICE = 1.0
+
+# The default cap on requests which have been sent but not answered
+MAX_IN_FLIGHT = 1000
+
+# A send later than this, in seconds, is counted as late
+LATE_TOLERANCE = 0.01
+
+# Bytes read from the capture at a time
+BUFFER_SIZE = 1 << 20
+
+
+def parse(line: bytes):
+    """
+    Return the request recorded on a line of a capture as a tuple of
+    `(ts, method, path, headers, body)`, or None if the line does not
+    hold a request
+    """
+    try:
+        record = json.loads(line)
+        ts = float(record.get('ts') or 0)
+        path = record['path']
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+    if not isinstance(path, str):
+        return None
+    body = record.get('body')
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    elif body is not None:
+        body = json.dumps(body).encode('utf-8')
+    return (
+        ts,
+        str(record.get('method') or 'GET').upper(),
+        path,
+        record.get('headers') or None,
+        body,
+    )
+
+
+def read(path: str, shard=None):
+    """
+    Yield the requests of a capture for one shard, reading the file a
+    line at a time. Lines which do not hold a request are yielded as
+    None so that they can be counted.
+    """
+    shard = shard or Shard()
+    with open(path, 'rb', buffering=BUFFER_SIZE) as fh_:
+        for index, line in enumerate(fh_):
+            if index % shard.count != shard.index:
+                continue
+            if not line.strip():
+                continue
+            yield parse(line)
+
+
+class Replayer(object):
+    """
+    Send the requests of a capture at the times they were recorded.
+
+    Parameters
+    ----------
+    config : LiveConfig
+        Provides `replay_speed` (default 1), `replay_loop` (default on)
+        and `max_in_flight`, which are read at the start of each slice
+        so they can be changed while the job is running.
+
+    path : str
+        The JSONL capture
+
+    base_url : str
+        The target, which the recorded paths are appended to
+
+    shard : Shard
+        This process's part of the job
+    """
+    def __init__(self, config, path, base_url, shard=None):
+        self.config = config
+        self.path = path
+        self.base_url = base_url.rstrip('/')
+        self.shard = shard or Shard()
+        self.counters = {
+            'sent': 0,
+            'completed': 0,
+            'failed': 0,
+            'late': 0,
+            'missed': 0,
+            'skipped': 0,
+            'passes': 0,
+        }
+        self.in_flight = 0
+        self._records = None
+        self._next = None
+        self._base_ts = None
+        self._base_at = None
+        self._speed = None
+        self._done = False
+
+    def speed(self) -> float:
+        """
+        Return the factor recorded times are divided by
+        """
+        speed = float(self.config.get('replay_speed') or 1)
+        return speed if speed > 0 else 1.0
+
+    def snapshot(self) -> dict:
+        """
+        Return the counters along with the number of requests in flight
+        """
+        ret = dict(self.counters)
+        ret['in_flight'] = self.in_flight
+        return ret
+
+    def due_at(self, ts: float) -> float:
+        """
+        Return the loop time at which a request recorded at `ts` is sent
+        """
+        return self._base_at + (ts - self._base_ts) / self._speed
+
+    async def run(self, session, duration=SLICE) -> None:
+        """
+        Replay the next `duration` seconds of the capture.
+
+        The position in the capture carries over between calls so that
+        Molotov can check whether the job should stop between two
+        slices.
+        """
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        end = now + duration
+        speed = self.speed()
+        if self._speed is not None and speed != self._speed \
+                and self._base_at is not None:
+            # Carry on from the same point of the capture at the new speed
+            self._base_ts += (now - self._base_at) * self._speed
+            self._base_at = now
+        self._speed = speed
+        max_in_flight = self.shard.split(
+            self.config.get('max_in_flight') or MAX_IN_FLIGHT)
+        while now < end:
+            record = self._peek(now)
+            if record is None:
+                await asyncio.sleep(end - now)
+                return
+            at = self.due_at(record[0])
+            if at > end:
+                await asyncio.sleep(end - now)
+                return
+            if at > now:
+                await asyncio.sleep(at - now)
+                now = loop.time()
+            self._next = None
+            self._send(session, record, now - at, max_in_flight)
+
+    def _peek(self, now: float):
+        """
+        Return the next request of the capture, opening the capture
+        again at its end, or None once it is over
+        """
+        while self._next is None:
+            if self._done:
+                return None
+            if self._records is None:
+                self._records = read(self.path, self.shard)
+                self._base_ts = None
+            record = next(self._records, False)
+            if record is False:
+                self._records = None
+                self.counters['passes'] += 1
+                if self._base_ts is None or \
+                        not self.config.get('replay_loop', True):
+                    # Over, or a capture without a request to replay
+                    self._done = True
+                continue
+            if record is None:
+                self.counters['skipped'] += 1
+                continue
+            if self._base_ts is None:
+                # The first request of a pass is sent right away
+                self._base_ts = record[0]
+                self._base_at = now
+            self._next = record
+        return self._next
+
+    def _send(self, session, record, lateness, max_in_flight) -> None:
+        if lateness > LATE_TOLERANCE:
+            self.counters['late'] += 1
+        if self.in_flight >= max_in_flight:
+            self.counters['missed'] += 1
+            return
+        self.in_flight += 1
+        self.counters['sent'] += 1
+        asyncio.ensure_future(self._run_one(session, record))
+
+    async def _run_one(self, session, record):
+        _, method, path, headers, body = record
+        CURRENT_SCENARIO.set(REPLAY_SCENARIO)
+        try:
+            async with session.request(method, self.base_url + path,
+                                       headers=headers, data=body) as resp:
+                await resp.read()
+            self.counters['completed'] += 1
+        except Exception:
+            self.counters['failed'] += 1
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+The scenario file Molotov runs to replay a JSONL capture
+
+Dyno runs this file for a scenario which is a `.jsonl` capture in the
+scenarios directory, and names the capture in `LOADGEN_REPLAY_FILE`.
+See `loadgen.replay`.
+"""
+import os
+
+from loadgen.live import LiveConfig
+from loadgen.settings import REPLAY_ENV
+from loadgen.table import ScenarioTable
+
+SERVER_URL = os.environ.get('OPBEANS_BASE_URL', 'http://localhost:8000')
+
+CONFIG = LiveConfig.from_env()
+TABLE = ScenarioTable(CONFIG)
+TABLE.replay(os.environ[REPLAY_ENV], SERVER_URL)
+
+TABLE.install()
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Periodic stats snapshots from a load-generation process
+
+Every Molotov process writes a small JSON snapshot of its counters to
+the job directory (the directory holding the live configuration file)
+once per `REPORT_INTERVAL`. Dyno merges the snapshots of all processes
+of a job when it is asked for stats, so no stats-d is needed for them.
+"""
+import asyncio
+import glob
+import json
+import os
+import time
+
+from . import histogram, live
+
+# How often, in seconds, a snapshot is written
+REPORT_INTERVAL = 1.0
+
+SNAPSHOT_PATTERN = 'stats-*.json'
+
+# Timestamps of which the earliest is kept when snapshots are merged
+EARLIEST = ('started', 'first_request')
+
+
+def job_dir():
+    """
+    Return the directory of the current job, or None outside of Dyno
+    """
+    path = os.environ.get(live.CONFIG_ENV)
+    return os.path.dirname(path) if path else None
+
+
+class Reporter(object):
+    """
+    Collects snapshots from a set of sources and writes them to disk.
+
+    Parameters
+    ----------
+    directory : str
+        Where to write the snapshot. If `None`, nothing is written.
+
+    interval : float
+        Seconds between two snapshots
+    """
+    def __init__(self, directory=None, interval=REPORT_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.sources = {}
+        self.timestamps = {}
+        self.started = time.time()
+        self._timer = None
+
+    @property
+    def path(self):
+        return os.path.join(
+            self.directory,
+            SNAPSHOT_PATTERN.replace('*', str(os.getpid()))
+        )
+
+    def add_source(self, name: str, func) -> None:
+        """
+        Include the dictionary returned by `func()` under `name`
+        in every snapshot.
+        """
+        self.sources[name] = func
+
+    def add_timestamp(self, name: str, func) -> None:
+        """
+        Include the time returned by `func()` under `name` in every
+        snapshot, once it is not None. When snapshots are merged, the
+        earliest time is kept.
+        """
+        self.timestamps[name] = func
+
+    def snapshot(self) -> dict:
+        """
+        Return the current snapshot without writing it
+        """
+        ret = {
+            'pid': os.getpid(),
+            'started': self.started,
+            'ts': time.time(),
+        }
+        for name, func in self.timestamps.items():
+            value = func()
+            if value is not None:
+                ret[name] = value
+        for name, func in self.sources.items():
+            ret[name] = func()
+        return ret
+
+    def write(self) -> None:
+        """
+        Atomically replace the snapshot file of this process
+        """
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as fh_:
+            json.dump(self.snapshot(), fh_)
+        os.replace(tmp_path, self.path)
+
+    def start(self) -> None:
+        """
+        Start writing snapshots from the running event loop. Calling
+        this more than once in a process has no further effect.
+        """
+        if self._timer is None and self.directory is not None:
+            self.started = time.time()
+            self._schedule()
+
+    def stop(self) -> None:
+        """
+        Stop the periodic snapshots and write a final one
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.write()
+
+    def _schedule(self):
+        # A timer rather than a task, so that Molotov closing the loop
+        # on SIGTERM does not leave a pending task behind.
+        loop = asyncio.get_event_loop()
+        self._timer = loop.call_later(self.interval, self._tick)
+
+    def _tick(self):
+        self.write()
+        self._schedule()
+
+
+def _merge_into(target: dict, source: dict) -> None:
+    for key, value in source.items():
+        if isinstance(value, dict):
+            _merge_into(target.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            target[key] = target.get(key, 0) + value
+        else:
+            target.setdefault(key, value)
+
+
+def merge(snapshots) -> dict:
+    """
+    Merge the snapshots of several processes of the same job.
+
+    Numbers are summed, except for timestamps: `started` and the other
+    `EARLIEST` times become the earliest of them and `ts`, the time of
+    the last update, becomes the latest.
+
+    Parameters
+    ----------
+    snapshots : iterable
+        Snapshot dictionaries as written by `Reporter`
+
+    Returns
+    -------
+    dict
+        The merged snapshot with a `processes` count in place of `pid`
+    """
+    ret = {}
+    earliest = {}
+    updated = []
+    count = 0
+    for snapshot in snapshots:
+        snapshot = dict(snapshot)
+        for key in EARLIEST:
+            if key in snapshot:
+                earliest.setdefault(key, []).append(snapshot.pop(key))
+        if 'ts' in snapshot:
+            updated.append(snapshot.pop('ts'))
+        snapshot.pop('pid', None)
+        _merge_into(ret, snapshot)
+        count += 1
+    ret['processes'] = count
+    for key, values in earliest.items():
+        ret[key] = min(values)
+    if updated:
+        ret['ts'] = max(updated)
+    return ret
+
+
+def summarize(stats: dict) -> dict:
+    """
+    Replace the latency histograms of merged stats with their
+    throughput and percentiles, in place, and return the stats
+    """
+    elapsed = stats.get('ts', 0) - stats.get('started', 0)
+    for statuses in stats.get('latency', {}).values():
+        for status, snapshot in statuses.items():
+            statuses[status] = histogram.summarize(snapshot, elapsed)
+    return stats
+
+
+def read(directory: str) -> list:
+    """
+    Load every snapshot in a job directory
+
+    Parameters
+    ----------
+    directory : str
+        The job directory
+
+    Returns
+    -------
+    list
+        The snapshot dictionaries. Files which cannot be read are skipped.
+    """
+    ret = []
+    for path in glob.glob(os.path.join(directory, SNAPSHOT_PATTERN)):
+        try:
+            with open(path, 'r') as fh_:
+                ret.append(json.load(fh_))
+        except (OSError, ValueError):
+            continue
+    return ret
+
+
+def clear(directory: str) -> None:
+    """
+    Remove the snapshots left behind by an earlier run of a job
+    """
+    for path in glob.glob(os.path.join(directory, SNAPSHOT_PATTERN)):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Random IDs drawn ahead of time, in blocks
+
+Drawing a skewed ID, such as one which follows a Zipf law, costs a few
+random numbers and some arithmetic per request. A `Sampler` draws its
+IDs in blocks of `BLOCK` and hands them out from the block in turn, so
+a request only takes the next one. While a block is handed out, the
+next one is drawn by a background thread, and the request path only
+draws a block itself if the thread fell behind, which is counted as a
+stall.
+
+IDs are indices from 0 to `n - 1`, as `URLTable` takes them. Blocks are
+drawn with NumPy when it is installed, and with `random` otherwise; the
+same seed gives the same IDs each way, but not across the two.
+
+The `ids` of a job configuration name the distribution of its IDs, and
+of some of its scenarios, as checked by `check()`. The scenario table
+gives the ID tables of its scenarios samplers of them.
+"""
+import concurrent.futures
+import itertools
+import os
+import random
+import threading
+from bisect import bisect
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# IDs drawn at a time. A block takes about a millisecond to draw without
+# NumPy, during which the background thread holds the GIL.
+BLOCK = 4096
+
+UNIFORM = 'uniform'
+ZIPF = 'zipf'
+HOTSPOT = 'hotspot'
+SEQUENTIAL = 'sequential'
+
+# The parameters of each distribution, with their defaults
+DISTRIBUTIONS = {
+    UNIFORM: {},
+    ZIPF: {'exponent': 1.0},
+    HOTSPOT: {'keys': 0.2, 'share': 0.8},
+    SEQUENTIAL: {},
+}
+
+
+class Distribution(object):
+    """
+    How the IDs from 0 to `n - 1` are drawn.
+
+    Parameters
+    ----------
+    n : int
+        The number of IDs
+
+    weights : sequence
+        The relative weight of each ID. None for a uniform draw.
+
+    name : str
+        What the distribution is called in the configuration
+    """
+    def __init__(self, n, weights=None, name=UNIFORM):
+        if n < 1:
+            raise ValueError('A distribution needs at least one ID')
+        if weights is not None and len(weights) != n:
+            raise ValueError('A distribution needs a weight for each ID')
+        self.n = n
+        self.name = name
+        self.weights = weights
+        self._cdf = None
+        if weights is not None:
+            total = float(sum(weights))
+            if total <= 0:
+                raise ValueError('A distribution needs a positive weight')
+            cdf = [w / total for w in itertools.accumulate(weights)]
+            # A draw below 1 then always lands on an ID
+            cdf[-1] = 1.0
+            self._cdf = numpy.asarray(cdf) if numpy is not None else cdf
+
+    def draw(self, rng, size: int) -> list:
+        """
+        Return `size` IDs drawn with `rng`, a `random.Random` or a NumPy
+        `Generator`
+        """
+        if numpy is not None and not isinstance(rng, random.Random):
+            if self._cdf is None:
+                ids = rng.integers(0, self.n, size)
+            else:
+                ids = numpy.searchsorted(self._cdf, rng.random(size),
+                                         side='right')
+            return ids.tolist()
+        rand = rng.random
+        if self._cdf is None:
+            n = self.n
+            return [int(rand() * n) for _ in range(size)]
+        cdf = self._cdf
+        return [bisect(cdf, rand()) for _ in range(size)]
+
+
+class Sequential(Distribution):
+    """
+    Every ID in turn, starting over after the last one
+    """
+    def __init__(self, n):
+        super(Sequential, self).__init__(n, name=SEQUENTIAL)
+        self._position = 0
+
+    def draw(self, rng, size: int) -> list:
+        start = self._position
+        n = self.n
+        self._position = (start + size) % n
+        return [(start + i) % n for i in range(size)]
+
+
+def uniform(n: int) -> Distribution:
+    """
+    Every ID is as likely
+    """
+    return Distribution(n)
+
+
+def zipf(n: int, exponent=1.0) -> Distribution:
+    """
+    The k-th ID, counting from 1, is drawn in proportion to
+    `1 / k ** exponent`, so the first IDs are the hottest
+    """
+    if exponent < 0:
+        raise ValueError('The exponent of a Zipf law must not be negative')
+    return Distribution(
+        n, [1.0 / (k ** exponent) for k in range(1, n + 1)], name=ZIPF)
+
+
+def hotspot(n: int, keys=0.2, share=0.8) -> Distribution:
+    """
+    The first `keys` of the IDs, as a fraction, take `share` of the draws
+    """
+    if not 0 < keys <= 1 or not 0 <= share <= 1:
+        raise ValueError('keys must be in (0, 1] and share in [0, 1]')
+    hot = max(int(round(n * keys)), 1)
+    if hot >= n:
+        return Distribution(n, name=HOTSPOT)
+    hot_weight = share / hot
+    cold_weight = (1.0 - share) / (n - hot)
+    return Distribution(
+        n, [hot_weight] * hot + [cold_weight] * (n - hot), name=HOTSPOT)
+
+
+def sequential(n: int) -> Distribution:
+    """
+    Every ID in turn
+    """
+    return Sequential(n)
+
+
+def check(spec) -> dict:
+    """
+    Fill in the defaults of the ID distributions of a job and check them
+
+    A job has a distribution, with its parameters, and may give some of
+    its scenarios distributions of their own:
+
+        {"distribution": "zipf", "exponent": 1.2,
+         "scenarios": {"scenario_products_id": {"distribution": "uniform"}}}
+
+    A distribution may also be given by name alone, as in `"zipf"`.
+
+    Raises
+    ------
+    ValueError
+        If the distributions are not valid. The message says what is
+        wrong.
+    """
+    ret = _check_one(spec, 'ids')
+    scenarios = spec.get('scenarios', {}) if isinstance(spec, dict) else {}
+    if not isinstance(scenarios, dict):
+        raise ValueError('scenarios must map scenario names to distributions')
+    ret['scenarios'] = {
+        name: _check_one(value, name) for name, value in scenarios.items()
+    }
+    return ret
+
+
+def _check_one(spec, where: str) -> dict:
+    if isinstance(spec, str):
+        spec = {'distribution': spec}
+    if not isinstance(spec, dict):
+        raise ValueError('The distribution of {} must be an object'.format(
+            where))
+    name = spec.get('distribution', UNIFORM)
+    if name not in DISTRIBUTIONS:
+        raise ValueError('Unknown distribution for {}: {}'.format(
+            where, name))
+    ret = dict(DISTRIBUTIONS[name], distribution=name)
+    for key, value in spec.items():
+        if key in ('distribution', 'scenarios'):
+            continue
+        if key not in DISTRIBUTIONS[name]:
+            raise ValueError('Unknown parameter of {} for {}: {}'.format(
+                name, where, key))
+        try:
+            ret[key] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError('{} of {} must be a number'.format(key, where))
+    build(ret, 1)
+    return ret
+
+
+def build(spec: dict, n: int) -> Distribution:
+    """
+    Return the distribution over `n` IDs described by a checked `spec`
+    """
+    name = spec['distribution']
+    if name == ZIPF:
+        return zipf(n, spec['exponent'])
+    if name == HOTSPOT:
+        return hotspot(n, spec['keys'], spec['share'])
+    if name == SEQUENTIAL:
+        return sequential(n)
+    return uniform(n)
+
+
+class Sampler(object):
+    """
+    Hands out IDs of a distribution which were drawn ahead of time.
+
+    Parameters
+    ----------
+    distribution : Distribution
+        What to draw
+
+    block : int
+        How many IDs are drawn at a time
+
+    seed : int or str
+        The seed of the draws. None for a random seed.
+
+    background : bool
+        Draw the next block in a background thread. Otherwise it is
+        drawn when the current one runs out.
+
+    Examples
+    --------
+    >>> CUSTOMERS = Sampler(zipf(1000, 1.1))
+    >>> CUSTOMER_URLS.sampler = CUSTOMERS
+    """
+    def __init__(self, distribution, block=BLOCK, seed=None,
+                 background=True):
+        self.distribution = distribution
+        self.block = max(int(block), 1)
+        self.background = background
+        self.counters = {'blocks': 0, 'stalls': 0}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self.reseed(seed)
+
+    def reseed(self, seed=None) -> None:
+        """
+        Start drawing afresh from `seed`
+        """
+        rng = random.Random(seed)
+        if numpy is not None:
+            rng = numpy.random.default_rng(rng.getrandbits(64))
+        with self._lock:
+            self._rng = rng
+            self._spare = None
+        self._take = iter(self._draw(rng)).__next__
+        self._refill()
+
+    def next(self) -> int:
+        """
+        Return the next ID
+        """
+        try:
+            return self._take()
+        except StopIteration:
+            return self._swap()
+
+    def _swap(self) -> int:
+        if not self._ready.is_set():
+            self.counters['stalls'] += 1
+            self._ready.wait()
+        with self._lock:
+            block = self._spare
+            self._spare = None
+        if block is None:
+            # Reseeded while the block was drawn
+            block = self._draw(self._rng)
+        self._take = iter(block).__next__
+        self._refill()
+        return self._take()
+
+    def _refill(self) -> None:
+        self._ready.clear()
+        if self.background:
+            _executor().submit(self._fill, self._rng)
+        else:
+            self._fill(self._rng)
+
+    def _fill(self, rng) -> None:
+        block = self._draw(rng)
+        with self._lock:
+            if rng is self._rng:
+                self._spare = block
+        self._ready.set()
+
+    def _draw(self, rng) -> list:
+        with self._lock:
+            # A generator must not be used by two threads at once
+            block = self.distribution.draw(rng, self.block)
+            self.counters['blocks'] += 1
+        return block
+
+
+_EXECUTOR = None
+
+
+def _executor() -> concurrent.futures.ThreadPoolExecutor:
+    """
+    Return the thread which draws blocks, starting it in the process
+    which first needs it
+    """
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='loadgen-sampler')
+    return _EXECUTOR
+
+
+def _forget_executor():
+    # The thread does not survive a fork, as for jobs forked by the zygote
+    global _EXECUTOR
+    _EXECUTOR = None
+
+
+os.register_at_fork(after_in_child=_forget_executor)
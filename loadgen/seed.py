@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Reproducible random choices
+
+A job started with a `seed` (`OPBEANS_SEED`) makes every random choice
+from streams derived from it: each Molotov worker of each shard has a
+stream of its own, which picks its scenarios and the IDs they request,
+and the open-loop scheduler has another. Two runs with the same seed,
+shards and workers therefore send the same requests in the same order,
+as long as the Opbean answers every request.
+
+The stream of the running worker is kept in `CURRENT_RANDOM`, which
+`URLTable.pick()` and the scenarios draw from. Without a seed it holds
+the `random` module, so unseeded jobs make their choices as before.
+"""
+import contextvars
+import random
+
+CURRENT_RANDOM = contextvars.ContextVar('random', default=random)
+
+
+def stream(seed, *keys) -> random.Random:
+    """
+    Return the random stream of `seed` named by `keys`.
+
+    The streams of different keys are independent, and the stream of
+    the same seed and keys is the same in every process and on every
+    host.
+
+    Examples
+    --------
+    >>> stream(42, 'worker', 0, 3).random() == \\
+    ...     stream(42, 'worker', 0, 3).random()
+    True
+    """
+    # A string seed is hashed with SHA-512, unlike `hash()` which
+    # differs between processes
+    return random.Random(':'.join(str(key) for key in (seed,) + keys))
+
+
+def current():
+    """
+    Return the random stream of the running worker, or the `random`
+    module if the job is not seeded
+    """
+    return CURRENT_RANDOM.get()
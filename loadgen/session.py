@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Session setup shared by every Molotov worker of a job
+
+By default every Molotov worker gets its own connector, so connections
+are not shared between workers and are re-established whenever a
+worker's pool runs dry. `SessionSetup` hands all workers in a process a
+single, tuned `TCPConnector` for the target and counts how often
+connections are created versus reused.
+
+aiohttp already sets TCP_NODELAY on every connection it hands out, so
+there is no setting for it here.
+"""
+from aiohttp import TCPConnector, TraceConfig
+
+from .settings import POOL_DEFAULTS
+
+
+class SessionSetup(object):
+    """
+    Provides the session options and tracing for Molotov workers.
+
+    Parameters
+    ----------
+    settings : dict
+        Connector settings. See `POOL_DEFAULTS` for the keys.
+    """
+    def __init__(self, settings=None):
+        self.settings = dict(POOL_DEFAULTS)
+        self.settings.update(settings or {})
+        self.trace_configs = []
+        self.counters = {
+            'created': 0,
+            'reused': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0,
+        }
+        self._connector = None
+        trace = TraceConfig()
+        trace.on_connection_create_end.append(self._on_create)
+        trace.on_connection_reuseconn.append(self._on_reuse)
+        trace.on_dns_cache_hit.append(self._on_dns_hit)
+        trace.on_dns_cache_miss.append(self._on_dns_miss)
+        self.add_trace_config(trace)
+
+    def add_trace_config(self, trace_config) -> None:
+        """
+        Attach an aiohttp `TraceConfig` to every worker session
+        """
+        self.trace_configs.append(trace_config)
+
+    def connector(self) -> TCPConnector:
+        """
+        Return the shared connector, creating it on first use. Must be
+        called from the event loop which will use it.
+        """
+        if self._connector is None or self._connector.closed:
+            dns_ttl = self.settings['dns_ttl']
+            self._connector = TCPConnector(
+                limit=int(self.settings['pool_size']),
+                limit_per_host=int(self.settings['pool_per_host']),
+                keepalive_timeout=float(self.settings['keepalive_timeout']),
+                use_dns_cache=True,
+                ttl_dns_cache=float(dns_ttl) if dns_ttl else None,
+            )
+        return self._connector
+
+    def close(self) -> None:
+        """
+        Close the shared connector and every connection it holds
+        """
+        if self._connector is not None:
+            self._connector.close()
+            self._connector = None
+
+    async def options(self, worker_id=0, args=None) -> dict:
+        """
+        The options for a worker session. Installed as Molotov's
+        `setup` fixture.
+        """
+        return {'connector': self.connector(), 'connector_owner': False}
+
+    async def setup_session(self, worker_id, session) -> None:
+        """
+        Attach the trace configs to a worker session. Installed as
+        Molotov's `setup_session` fixture.
+        """
+        for trace_config in self.trace_configs:
+            trace_config.freeze()
+            session._trace_configs.append(trace_config)
+
+    def snapshot(self) -> dict:
+        return dict(self.counters)
+
+    async def _on_create(self, session, ctx, params):
+        self.counters['created'] += 1
+
+    async def _on_reuse(self, session, ctx, params):
+        self.counters['reused'] += 1
+
+    async def _on_dns_hit(self, session, ctx, params):
+        self.counters['dns_cache_hits'] += 1
+
+    async def _on_dns_miss(self, session, ctx, params):
+        self.counters['dns_cache_misses'] += 1
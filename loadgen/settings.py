@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Job settings handed to Molotov processes through the environment
+
+Unlike the values in `loadgen.live`, these are read once when the
+process starts, so Dyno restarts a job to change them. This module must
+not import aiohttp so that Dyno can use it.
+"""
+import os
+
+# Set for scenario files which are run by `loadgen.engine` rather than
+# by Molotov
+ENGINE_ENV = 'LOADGEN_ENGINE'
+
+# The JSONL capture replayed by `loadgen/replay_scenario.py`
+REPLAY_ENV = 'LOADGEN_REPLAY_FILE'
+
+# The scenario spec run by `loadgen/spec_scenario.py`
+SPEC_ENV = 'LOADGEN_SPEC_FILE'
+
+# Environment variables which tune the shared connector
+POOL_ENV = {
+    'pool_size': 'LOADGEN_POOL_SIZE',
+    'pool_per_host': 'LOADGEN_POOL_PER_HOST',
+    'keepalive_timeout': 'LOADGEN_KEEPALIVE_TIMEOUT',
+    'dns_ttl': 'LOADGEN_DNS_TTL',
+}
+
+POOL_DEFAULTS = {
+    # Total connections, 0 means no limit
+    'pool_size': 0,
+    # Connections per host, 0 means no limit
+    'pool_per_host': 0,
+    # Seconds an idle connection is kept open
+    'keepalive_timeout': 60.0,
+    # Seconds a DNS lookup is cached, 0 means forever. The toxiproxy
+    # hostnames Dyno targets never change.
+    'dns_ttl': 0,
+}
+
+
+def pool_settings_from_env() -> dict:
+    """
+    Read the connector settings from the environment
+    """
+    ret = dict(POOL_DEFAULTS)
+    for key, env in POOL_ENV.items():
+        if os.environ.get(env):
+            ret[key] = float(os.environ[env])
+    return ret
+
+
+# Environment variables which configure the aggregating stats-d sink
+STATSD_ENV = {
+    'statsd_address': 'LOADGEN_STATSD_ADDRESS',
+    'statsd_interval': 'LOADGEN_STATSD_INTERVAL',
+    'statsd_sample_rate': 'LOADGEN_STATSD_SAMPLE_RATE',
+    'statsd_mtu': 'LOADGEN_STATSD_MTU',
+}
+
+STATSD_DEFAULTS = {
+    # For example `udp://stats-d:8125`. Nothing is sent if unset.
+    'statsd_address': None,
+    # Seconds between two flushes
+    'statsd_interval': 1.0,
+    # The fraction of request timings which are sent
+    'statsd_sample_rate': 1.0,
+    # The largest packet sent, chosen to fit an Ethernet frame
+    'statsd_mtu': 1432,
+}
+
+
+def statsd_settings_from_env() -> dict:
+    """
+    Read the stats-d settings from the environment
+    """
+    ret = dict(STATSD_DEFAULTS)
+    for key, env in STATSD_ENV.items():
+        if os.environ.get(env):
+            ret[key] = os.environ[env]
+    ret['statsd_interval'] = float(ret['statsd_interval'])
+    ret['statsd_sample_rate'] = float(ret['statsd_sample_rate'])
+    ret['statsd_mtu'] = int(ret['statsd_mtu'])
+    return ret
+
+
+# Environment variables which size the pools of pre-encoded request bodies
+PAYLOAD_ENV = {
+    'payload_pool': 'LOADGEN_PAYLOAD_POOL',
+}
+
+PAYLOAD_DEFAULTS = {
+    # Bodies per pool. A few thousand varied orders look no different to
+    # an Opbean than an endless stream of them.
+    'payload_pool': 1024,
+}
+
+
+def payload_settings_from_env() -> dict:
+    """
+    Read the payload pool settings from the environment
+    """
+    ret = dict(PAYLOAD_DEFAULTS)
+    for key, env in PAYLOAD_ENV.items():
+        if os.environ.get(env):
+            ret[key] = int(float(os.environ[env]))
+    return ret
+
+
+# The environment variable which seeds every random choice of a job
+SEED_ENV = {
+    'seed': 'OPBEANS_SEED',
+}
+
+
+def seed_from_env():
+    """
+    Read the seed of the job from the environment. None if the job is
+    not seeded.
+    """
+    value = os.environ.get(SEED_ENV['seed'])
+    return int(value) if value else None
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Load shapes: target rates which change over time
+
+A shape is a list of phases which run one after the other. Each phase
+is a dictionary with a `type` and the parameters of that type, with
+rates in requests per second and times in seconds:
+
+    constant  `rate`, optionally `duration`
+    ramp      `from` (default 0) and `to` over `duration`
+    steps     one plateau of `hold` seconds for each rate in `rates`
+    sine      `mean` plus `amplitude` times a sine wave of `period`,
+              optionally for `duration`
+    spike     `rate`, rising to `peak` for the last `length` seconds
+              of every `every` seconds, optionally for `duration`
+
+Only the last phase may go on without a `duration`. Once a shape with
+an end is over, its last rate is kept. For example, a one minute
+warm-up followed by a daily cycle:
+
+    [{"type": "ramp", "to": 200, "duration": 60},
+     {"type": "sine", "mean": 200, "amplitude": 150, "period": 86400}]
+"""
+import math
+
+RAMP = 'ramp'
+STEPS = 'steps'
+SINE = 'sine'
+SPIKE = 'spike'
+CONSTANT = 'constant'
+DONE = 'done'
+
+
+def _number(spec: dict, key: str, default=None, positive=False) -> float:
+    value = spec.get(key, default)
+    if value is None:
+        raise ValueError('A {} phase needs `{}`'.format(spec['type'], key))
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('`{}` must be a number'.format(key))
+    if math.isnan(value) or value < 0 or (positive and value == 0) or \
+            math.isinf(value):
+        raise ValueError('`{}` must be {}'.format(
+            key, 'positive' if positive else 'at least 0'))
+    return value
+
+
+def _constant(spec):
+    rate = _number(spec, 'rate')
+    return lambda t: rate
+
+
+def _ramp(spec):
+    start = _number(spec, 'from', 0)
+    end = _number(spec, 'to')
+    duration = _number(spec, 'duration', positive=True)
+    return lambda t: start + (end - start) * min(t / duration, 1.0)
+
+
+def _steps(spec):
+    rates = spec.get('rates')
+    if not isinstance(rates, list) or not rates:
+        raise ValueError('A steps phase needs a list of `rates`')
+    rates = [_number({'rate': r, 'type': STEPS}, 'rate') for r in rates]
+    hold = _number(spec, 'hold', positive=True)
+    return lambda t: rates[min(int(t // hold), len(rates) - 1)]
+
+
+def _sine(spec):
+    mean = _number(spec, 'mean')
+    amplitude = _number(spec, 'amplitude', 0)
+    period = _number(spec, 'period', positive=True)
+    return lambda t: max(
+        mean + amplitude * math.sin(2 * math.pi * t / period), 0.0)
+
+
+def _spike(spec):
+    rate = _number(spec, 'rate')
+    peak = _number(spec, 'peak')
+    every = _number(spec, 'every', positive=True)
+    length = _number(spec, 'length', positive=True)
+    if length > every:
+        raise ValueError('A spike cannot be longer than `every`')
+    return lambda t: peak if t % every >= every - length else rate
+
+
+PHASES = {
+    CONSTANT: _constant,
+    RAMP: _ramp,
+    STEPS: _steps,
+    SINE: _sine,
+    SPIKE: _spike,
+}
+
+
+def _duration(spec: dict):
+    if spec['type'] == STEPS:
+        return len(spec['rates']) * float(spec['hold'])
+    if spec['type'] == RAMP or spec.get('duration') is not None:
+        return _number(spec, 'duration', positive=True)
+    return None
+
+
+class Shape(object):
+    """
+    The target rate of a job over time.
+
+    Parameters
+    ----------
+    spec : list
+        The phases of the shape, as described above
+
+    Raises
+    ------
+    ValueError
+        If the shape is not valid. The message says what is wrong.
+
+    Examples
+    --------
+    >>> shape = Shape([{'type': 'ramp', 'to': 100, 'duration': 10}])
+    >>> shape.rate(2.5)
+    25.0
+    """
+    def __init__(self, spec):
+        if not isinstance(spec, list) or not spec:
+            raise ValueError('A shape must be a list of phases')
+        self.phases = []
+        start = 0.0
+        for index, phase in enumerate(spec):
+            if not isinstance(phase, dict) or phase.get('type') not in PHASES:
+                raise ValueError('Phase {} must have a type of {}'.format(
+                    index, ', '.join(sorted(PHASES))))
+            if start is None:
+                raise ValueError('Only the last phase may have no duration')
+            func = PHASES[phase['type']](phase)
+            duration = _duration(phase)
+            self.phases.append((phase['type'], start, duration, func))
+            start = None if duration is None else start + duration
+        self.end = start
+
+    def at(self, elapsed: float) -> tuple:
+        """
+        Return the target rate `elapsed` seconds into the shape, along
+        with the index of the phase and the seconds into the phase
+        """
+        if elapsed < 0:
+            return 0.0, None, elapsed
+        if self.end is not None and elapsed >= self.end:
+            kind, start, duration, func = self.phases[-1]
+            return func(duration), len(self.phases), elapsed - self.end
+        for index, (kind, start, duration, func) in enumerate(self.phases):
+            if duration is None or elapsed < start + duration:
+                return func(elapsed - start), index, elapsed - start
+        # Not reached: the last phase either has no end or ends the shape
+        raise AssertionError(elapsed)
+
+    def rate(self, elapsed: float) -> float:
+        """
+        Return the target rate `elapsed` seconds into the shape
+        """
+        return self.at(elapsed)[0]
+
+    def describe(self, elapsed: float) -> dict:
+        """
+        Return the phase `elapsed` seconds into the shape: its `index`,
+        `type` and the seconds `elapsed` in it, or a `type` of `done`
+        once the shape is over. Before the shape starts the index is
+        None and `elapsed` is negative.
+        """
+        rate, index, phase_elapsed = self.at(elapsed)
+        if index is None:
+            kind = None
+        elif index == len(self.phases):
+            kind = DONE
+        else:
+            kind = self.phases[index][0]
+        return {
+            'index': index,
+            'type': kind,
+            'elapsed': round(phase_elapsed, 3),
+        }
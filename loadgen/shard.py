@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Sharding a single job across several processes
+
+A Molotov process uses one core. To go beyond that, Dyno starts one
+process per shard with `ShardGroup`, and each process finds its share of
+the job with `Shard.from_env()`. All shards read the same live
+configuration and each takes a fixed part of it, so the split does not
+depend on timing and needs no coordination between the shards.
+
+This module does not import aiohttp so that Dyno can use it.
+"""
+import os
+import subprocess
+
+SHARD_ENV = 'LOADGEN_SHARD'
+SHARDS_ENV = 'LOADGEN_SHARDS'
+
+
+class Shard(object):
+    """
+    The part of a job which one process runs.
+
+    Parameters
+    ----------
+    index : int
+        The number of this shard, from 0
+
+    count : int
+        The number of shards in the job
+    """
+    __slots__ = ('index', 'count')
+
+    def __init__(self, index=0, count=1):
+        if not 0 <= index < count:
+            raise ValueError('Shard {} of {} does not exist'.format(index, count))  # noqa
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def from_env(cls) -> 'Shard':
+        return cls(
+            int(os.environ.get(SHARD_ENV, 0)),
+            int(os.environ.get(SHARDS_ENV, 1))
+        )
+
+    def split(self, total: int) -> int:
+        """
+        Return this shard's part of a whole number, such as a worker
+        count. The parts of all shards add up to `total`.
+        """
+        part, rest = divmod(int(total), self.count)
+        return part + (1 if self.index < rest else 0)
+
+    def scale(self, rate: float) -> float:
+        """
+        Return this shard's part of a rate
+        """
+        return rate / self.count
+
+    @property
+    def phase(self) -> float:
+        """
+        Where this shard's sends fall within one send interval, so that
+        the evenly spaced sends of all shards interleave
+        """
+        return self.index / float(self.count)
+
+
+class ShardGroup(object):
+    """
+    The processes of a sharded job, with the parts of the
+    `subprocess.Popen` interface Dyno uses to track jobs.
+
+    Every shard joins the process group of the first, so the whole job
+    is stopped by signalling the group of `pid`.
+
+    Parameters
+    ----------
+    cmd : list
+        The command for every shard
+
+    count : int
+        The number of shards
+
+    env : dict
+        The environment for every shard. The shard variables are
+        added to it.
+
+    pin : bool
+        Pin every shard to a core of its own, in turn, among the cores
+        this process may run on
+
+    kw
+        Passed to `subprocess.Popen`
+    """
+    def __init__(self, cmd, count, env, pin=False, **kw):
+        cores = sorted(os.sched_getaffinity(0)) if pin else None
+        self.processes = []
+        for index in range(count):
+            shard_env = dict(env)
+            shard_env[SHARD_ENV] = str(index)
+            shard_env[SHARDS_ENV] = str(count)
+            core = cores[index % len(cores)] if cores else None
+            leader = self.processes[0].pid if self.processes else None
+            self.processes.append(subprocess.Popen(
+                cmd,
+                env=shard_env,
+                preexec_fn=_shard_preexec(leader, core),
+                **kw
+            ))
+
+    @property
+    def pid(self) -> int:
+        return self.processes[0].pid
+
+    @property
+    def pids(self) -> list:
+        return [p.pid for p in self.processes]
+
+    def poll(self):
+        """
+        Return the exit code of the job like `Popen.poll()`, see
+        `exit_code()`
+        """
+        return exit_code([p.poll() for p in self.processes])
+
+    def running(self) -> bool:
+        """
+        Check whether any shard is still running, as the others do
+        after one of them crashed
+        """
+        return any(p.poll() is None for p in self.processes)
+
+
+def exit_code(codes):
+    """
+    Return the exit code of a job made of several processes, from the
+    exit code of each, or None for those still running.
+
+    A job which lost a process to a crash has failed, even if its other
+    processes are still running, so the first non-zero exit code is
+    returned as soon as there is one. Otherwise the job is running
+    while any process is, and has exited with 0 once all have.
+    """
+    failed = next((code for code in codes if code), None)
+    if failed is not None:
+        return failed
+    if any(code is None for code in codes):
+        return None
+    return 0
+
+
+def _shard_preexec(leader, core):
+    def _preexec():
+        # A process can only join a group in its own session, so the
+        # first shard starts a new group rather than a new session.
+        os.setpgid(0, leader or 0)
+        if core is not None:
+            os.sched_setaffinity(0, {core})
+    return _preexec
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Declarative scenarios
+
+A scenario spec is a JSON file which lists the requests of a scenario
+file rather than coding them:
+
+    {"description": "Products and errors",
+     "scenarios": [
+        {"name": "scenario_products_id", "path": "api/products/{}",
+         "params": [[1, 6]], "weight": 6},
+        {"name": "scenario_orders_post", "method": "POST",
+         "path": "api/orders", "body": "json_orders"},
+        {"name": "scenario_oopsie", "path": "oopsie", "status": 500,
+         "weight": 2, "tunable": "error_weight",
+         "services": ["opbeans-python", "opbeans-go"]}]}
+
+Each scenario sends one request to `path`, resolved against the target
+as `URLCatalogue.join` does, and checks its response `status`, which
+defaults to 200 and may be a list. `params` fills the `{}` of the path
+from inclusive `[low, high]` or `[low, high, step]` ranges; a request
+goes to a random combination, and a single `[low, high]` range draws its
+IDs as the configured `ids` say. `method` defaults to GET. `body` names
+a pool of pre-encoded bodies from `loadgen.payloads` and `headers` are
+sent as given. `weight` defaults to 1 and `tunable` names the
+configuration key which overrides it. A scenario with `services` only
+exists for the Opbeans whose names start with one of them.
+
+The spec is compiled once into scenarios whose URLs, bodies and headers
+are all built ahead of time.
+"""
+import json
+import math
+
+from .payloads import csv_orders, json_orders
+from .urls import URLCatalogue, URLTable
+
+# The pools a scenario can take its `body` from
+BODIES = {
+    'json_orders': json_orders,
+    'csv_orders': csv_orders,
+}
+
+# The keys a scenario of a spec may have
+KEYS = (
+    'name', 'path', 'params', 'method', 'status', 'body', 'headers',
+    'weight', 'tunable', 'services',
+)
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS')
+
+
+def _integer(value) -> bool:
+    # A bool is an int too, but `true` is not a number in a spec
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def load(path: str) -> dict:
+    """
+    Read a spec file and check it
+
+    Raises
+    ------
+    ValueError
+        If the file does not hold a valid spec. The message says what is
+        wrong.
+    """
+    with open(path) as fh_:
+        try:
+            spec = json.load(fh_)
+        except ValueError as exc:
+            raise ValueError('Not a JSON file: {}'.format(exc))
+    check(spec)
+    return spec
+
+
+def check(spec) -> None:
+    """
+    Check a spec, raising ValueError with what is wrong with it
+    """
+    if not isinstance(spec, dict) or \
+            not isinstance(spec.get('scenarios'), list):
+        raise ValueError('A spec must be an object with a list of scenarios')
+    names = set()
+    for index, entry in enumerate(spec['scenarios']):
+        if not isinstance(entry, dict):
+            raise ValueError('Scenario {} must be an object'.format(index))
+        name = entry.get('name')
+        if not isinstance(name, str) or not name:
+            raise ValueError('Scenario {} needs a name'.format(index))
+        unknown = set(entry) - set(KEYS)
+        if unknown:
+            raise ValueError('Unknown keys in {}: {}'.format(
+                name, ', '.join(sorted(unknown))))
+        if name in names:
+            raise ValueError('Scenario {} appears twice'.format(name))
+        names.add(name)
+        if not isinstance(entry.get('path'), str):
+            raise ValueError('Scenario {} needs a path'.format(name))
+        params = entry.get('params', [])
+        if not isinstance(params, list) or not all(
+                isinstance(r, list) and len(r) in (2, 3) and
+                all(_integer(n) for n in r) for r in params):
+            raise ValueError(
+                'The params of {} must be [low, high] ranges'.format(name))
+        for r in params:
+            if r[0] > r[1]:
+                raise ValueError(
+                    'The params of {} must not have a low above the '
+                    'high'.format(name))
+            if len(r) > 2 and r[2] <= 0:
+                raise ValueError(
+                    'The steps of the params of {} must be positive'.format(
+                        name))
+        if entry['path'].count('{}') != len(params):
+            raise ValueError(
+                'The path of {} needs one {{}} per param'.format(name))
+        if str(entry.get('method', 'GET')).upper() not in METHODS:
+            raise ValueError('Unknown method for {}'.format(name))
+        if entry.get('body') is not None and entry['body'] not in BODIES:
+            raise ValueError('The body of {} must be one of {}'.format(
+                name, ', '.join(sorted(BODIES))))
+        headers = entry.get('headers') or {}
+        if not isinstance(headers, dict) or not all(
+                isinstance(k, str) and isinstance(v, str)
+                for k, v in headers.items()):
+            raise ValueError(
+                'The headers of {} must map names to strings'.format(name))
+        statuses = entry.get('status', 200)
+        if not isinstance(statuses, list):
+            statuses = [statuses]
+        if not statuses or not all(_integer(s) for s in statuses):
+            raise ValueError('The status of {} must be a number'.format(name))
+        weight = entry.get('weight', 1)
+        if not isinstance(weight, (int, float)) or \
+                isinstance(weight, bool) or not math.isfinite(weight) or \
+                weight < 0:
+            raise ValueError('The weight of {} must be positive'.format(name))
+        services = entry.get('services', [])
+        if not isinstance(services, list) or \
+                not all(isinstance(s, str) for s in services):
+            raise ValueError(
+                'The services of {} must be a list of names'.format(name))
+
+
+def available(entry: dict, service: str) -> bool:
+    """
+    Check whether a scenario of a spec exists for an Opbean
+    """
+    services = entry.get('services')
+    return not services or service.startswith(tuple(services))
+
+
+def urls(entry: dict, catalogue: URLCatalogue):
+    """
+    Return the URL of a scenario, or a `URLTable` of its URLs if it has
+    params
+    """
+    params = entry.get('params')
+    if not params:
+        return catalogue.join(entry['path'])
+    ranges = [range(r[0], r[1] + 1, r[2] if len(r) > 2 else 1)
+              for r in params]
+    if len(ranges) == 1:
+        return catalogue.ids(entry['path'], params[0][0], params[0][1]) \
+            if len(params[0]) == 2 else \
+            catalogue.product(entry['path'], ranges[0])
+    return catalogue.product(entry['path'], *ranges)
+
+
+def build(entry: dict, catalogue: URLCatalogue, add_pool=None,
+          add_urls=None):
+    """
+    Return the coroutine function of a scenario of a spec
+
+    Parameters
+    ----------
+    entry : dict
+        The scenario
+
+    catalogue : URLCatalogue
+        Builds the URLs of the target
+
+    add_pool : callable
+        Called with the body pool of the scenario, if it has one, and
+        returns the pool to use
+
+    add_urls : callable
+        Called with the ID table of the scenario and its name, if its
+        params are a single `[low, high]` range of IDs
+    """
+    method = str(entry.get('method', 'GET')).upper()
+    target = urls(entry, catalogue)
+    pick = target.pick if isinstance(target, URLTable) else None
+    params = entry.get('params')
+    if add_urls is not None and params and len(params) == 1 and \
+            len(params[0]) == 2:
+        add_urls(target, entry['name'])
+    statuses = entry.get('status', 200)
+    statuses = tuple(statuses) if isinstance(statuses, list) \
+        else (statuses,)
+    headers = dict(entry.get('headers') or {}) or None
+    pool = None
+    if entry.get('body'):
+        pool = BODIES[entry['body']]()
+        if add_pool is not None:
+            pool = add_pool(pool)
+        headers = dict(pool.headers, **(headers or {}))
+    next_body = pool.next if pool is not None else None
+
+    async def scenario(session):
+        url = pick() if pick is not None else target
+        data = next_body() if next_body is not None else None
+        async with session.request(method, url, data=data,
+                                   headers=headers) as resp:
+            assert resp.status in statuses, resp.status
+
+    scenario.__name__ = scenario.__qualname__ = entry['name']
+    return scenario
+
+
+def install(spec: dict, table, base_url: str, service: str) -> list:
+    """
+    Compile the scenarios of a spec which exist for `service` and
+    register them with a scenario table
+
+    Returns
+    -------
+    list
+        The names of the scenarios which were registered
+    """
+    catalogue = URLCatalogue(base_url)
+    ret = []
+    for entry in spec['scenarios']:
+        if not available(entry, service):
+            continue
+        func = build(entry, catalogue, table.add_pool, table.add_urls)
+        table.scenario(
+            weight=entry.get('weight', 1),
+            tunable=entry.get('tunable'),
+        )(func)
+        ret.append(entry['name'])
+    return ret
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+The scenario file Molotov runs for a declarative scenario spec
+
+Dyno runs this file for a scenario which is a `.json` spec in the
+scenarios directory, and names the spec in `LOADGEN_SPEC_FILE`. See
+`loadgen.spec`.
+"""
+import os
+
+from loadgen import spec
+from loadgen.live import LiveConfig
+from loadgen.settings import SPEC_ENV
+from loadgen.table import ScenarioTable
+
+SERVER_URL = os.environ.get('OPBEANS_BASE_URL', 'http://localhost:8000')
+SERVICE_NAME = os.environ.get('OPBEANS_NAME', 'default')
+
+CONFIG = LiveConfig.from_env()
+TABLE = ScenarioTable(CONFIG)
+spec.install(spec.load(os.environ[SPEC_ENV]), TABLE, SERVER_URL, SERVICE_NAME)
+
+TABLE.install()
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+An aggregating stats-d sink
+
+Molotov's `--statsd` option sends a timer and a counter datagram for
+every request. `StatsdSink` gathers them in memory instead and sends
+them every `interval` seconds as multi-metric packets of up to `mtu`
+bytes. Counters are summed before they are sent, so their totals are
+exact. Timers cannot be summed, so `sample_rate` controls how many of
+them are kept, and stats-d is told the rate so that its counts come out
+right.
+
+The metric names are the same as Molotov's, so existing dashboards keep
+working.
+"""
+import asyncio
+import random
+import socket
+import time
+from urllib.parse import urlsplit
+
+from aiohttp import TraceConfig
+
+_HOST = socket.gethostname()
+
+# The same naming as Molotov's own stats-d support
+PREFIX = 'molotov.{hostname}.{method}.{host}.{path}'
+
+
+def parse_address(address: str) -> tuple:
+    """
+    Split an address like `udp://stats-d:8125` into a host and a port
+    """
+    parts = urlsplit(address)
+    if parts.scheme != 'udp' or not parts.hostname:
+        raise ValueError('Unsupported stats-d address: {}'.format(address))
+    return parts.hostname, parts.port or 8125
+
+
+def pack(lines, mtu: int) -> list:
+    """
+    Join metric lines into as few packets of at most `mtu` bytes as
+    possible. A line longer than `mtu` is sent in a packet of its own.
+    """
+    packets = []
+    current = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        if current and size + 1 + len(data) > mtu:
+            packets.append(b'\n'.join(current))
+            current = []
+            size = 0
+        size += len(data) + (1 if current else 0)
+        current.append(data)
+    if current:
+        packets.append(b'\n'.join(current))
+    return packets
+
+
+class StatsdSink(object):
+    """
+    Collects counters and timers and sends them in batches.
+
+    Parameters
+    ----------
+    address : str
+        Where to send the metrics, for example `udp://stats-d:8125`
+
+    interval : float
+        Seconds between two flushes
+
+    sample_rate : float
+        The fraction of timings which are kept, between 0 and 1
+
+    mtu : int
+        The largest packet to send, in bytes
+
+    rng : random.Random
+        The source of sampling decisions
+    """
+    def __init__(self, address, interval=1.0, sample_rate=1.0, mtu=1432,
+                 rng=None):
+        self.address = parse_address(address)
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.mtu = mtu
+        self.rng = rng or random
+        self.counters = {}
+        self.timers = {}
+        self.sent = 0
+        self.dropped = 0
+        self._sock = None
+        self._timer = None
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Add to a counter
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def timing(self, name: str, value: int) -> None:
+        """
+        Record a timing in milliseconds, subject to the sample rate
+        """
+        if self.sample_rate < 1.0 and self.rng.random() >= self.sample_rate:
+            return
+        timers = self.timers.get(name)
+        if timers is None:
+            timers = self.timers[name] = []
+        timers.append(value)
+
+    def lines(self) -> list:
+        """
+        Return the metric lines gathered since the last call and start
+        gathering afresh
+        """
+        counters, self.counters = self.counters, {}
+        timers, self.timers = self.timers, {}
+        ret = ['{}:{}|c'.format(k, v) for k, v in counters.items()]
+        suffix = '|ms'
+        if self.sample_rate < 1.0:
+            suffix += '|@{:g}'.format(self.sample_rate)
+        for name, values in timers.items():
+            ret.extend('{}:{}{}'.format(name, v, suffix) for v in values)
+        return ret
+
+    def flush(self) -> None:
+        """
+        Send everything gathered so far
+        """
+        packets = pack(self.lines(), self.mtu)
+        if not packets:
+            return
+        for index, packet in enumerate(packets):
+            try:
+                if self._sock is None:
+                    self._sock = self._connect()
+                self._sock.send(packet)
+                self.sent += 1
+            except OSError:
+                # stats-d is best effort, like Molotov's own client. The
+                # address is looked up again on the next flush, in case
+                # stats-d moved.
+                self.dropped += len(packets) - index
+                self._close()
+                return
+
+    def _connect(self) -> socket.socket:
+        """
+        Look stats-d up and return a UDP socket connected to it, so that
+        sending does not resolve its name every time
+        """
+        family, kind, proto, _, address = socket.getaddrinfo(
+            self.address[0], self.address[1], type=socket.SOCK_DGRAM)[0]
+        sock = socket.socket(family, kind, proto)
+        try:
+            sock.setblocking(False)
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def start(self) -> None:
+        """
+        Start flushing from the running event loop. Calling this more
+        than once has no further effect.
+        """
+        if self._timer is None:
+            self._schedule()
+
+    def stop(self) -> None:
+        """
+        Stop the periodic flushes and send what is left
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.flush()
+        self._close()
+
+    def _schedule(self):
+        loop = asyncio.get_event_loop()
+        self._timer = loop.call_later(self.interval, self._tick)
+
+    def _tick(self):
+        self.flush()
+        self._schedule()
+
+    def trace_config(self) -> TraceConfig:
+        """
+        Return a `TraceConfig` which records every request of a session
+        """
+        trace = TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_request_end.append(self._on_request_end)
+        return trace
+
+    async def _on_request_start(self, session, ctx, params):
+        ctx.start = time.perf_counter()
+        ctx.label = PREFIX.format(
+            hostname=_HOST,
+            method=params.method,
+            host=params.url.host,
+            path=params.url.path,
+        )
+
+    async def _on_request_end(self, session, ctx, params):
+        self.timing(ctx.label, int((time.perf_counter() - ctx.start) * 1000))
+        self.increment(ctx.label + '.' + str(params.response.status))
@@ -0,0 +1,506 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Weighted scenario selection driven by a live configuration
+
+Molotov only knows the weights which were passed to `@scenario` at import
+time and drops anything registered with a weight of zero. Scenarios
+registered through a `ScenarioTable` are always known to Molotov, and the
+table is installed as the `scenario_picker` so the weights it uses can
+follow the job configuration while the job is running.
+
+When the configuration sets a `rate`, the first worker runs an
+`ArrivalScheduler` which starts scenarios on an open-loop schedule and
+every other worker stays idle.
+
+A table which replays a capture (see `loadgen.replay`) has its first
+worker send the recorded requests instead of picking scenarios, and
+every other worker stays idle.
+
+When the configuration sets `start_at`, a wall-clock time in seconds
+since the epoch, every worker waits until then before it starts any
+scenario. The processes of a job spread over several hosts are launched
+ahead of time this way and still start sending together.
+
+Installing the table also installs the session fixtures from
+`loadgen.session`, and a `Reporter` which writes the table's counters
+and per-scenario latency histograms to the job directory. When
+`LOADGEN_STATSD_ADDRESS` is set, request metrics are also sent to stats-d
+through a `StatsdSink`.
+
+Pools of pre-encoded request bodies (see `loadgen.payloads`) which are
+added to the table are built afresh whenever the configured
+`payload_seed` changes.
+
+When the job has a seed (`OPBEANS_SEED`), every worker picks its
+scenarios, and the scenarios their IDs, from a random stream of its
+own, and the pools are built from the seed unless a `payload_seed` is
+configured. See `loadgen.seed`.
+
+Samplers of pre-drawn IDs (see `loadgen.sampler`) which are added to the
+table are seeded from the seed of the job and report how many blocks
+they drew and how often a request had to wait for one.
+
+The ID tables (`URLTable`) which are added to the table along with the
+scenarios requesting from them draw their IDs as the configured `ids`
+say: uniformly, which is the default, or from a sampler of the
+distribution the job, or the scenario, is given. The samplers are
+built afresh whenever `ids` changes.
+
+When `LOADGEN_ENGINE` is set, as it is for scenario files loaded by
+`loadgen.engine`, nothing is registered with Molotov and the engine runs
+the table's scenarios itself.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+import molotov
+
+from .alias import AliasTable
+from .arrival import ArrivalScheduler
+from .latency import CURRENT_SCENARIO, LatencyRecorder
+from .replay import REPLAY_SCENARIO, Replayer
+from .report import Reporter, job_dir
+from .sampler import UNIFORM, Sampler
+from .sampler import build as build_distribution
+from .sampler import check as check_ids
+from .seed import CURRENT_RANDOM, stream
+from .session import SessionSetup
+from .shard import Shard
+from .settings import (
+    ENGINE_ENV,
+    pool_settings_from_env,
+    seed_from_env,
+    statsd_settings_from_env,
+)
+from .statsd import StatsdSink
+
+# The scenario picked for workers above the configured worker count
+IDLE_SCENARIO = 'loadgen_idle'
+
+# The scenario which drives an open-loop job
+ARRIVAL_SCENARIO = 'loadgen_arrival'
+
+# The scenario picked by every worker until the configured `start_at`
+WAIT_SCENARIO = 'loadgen_wait'
+
+# How long, in seconds, an idle worker waits before picking again
+IDLE_INTERVAL = 0.5
+
+
+async def _idle(session):
+    await asyncio.sleep(IDLE_INTERVAL)
+
+
+def _always_idle(rand=None):
+    return IDLE_SCENARIO
+
+
+class ScenarioTable(object):
+    """
+    The set of scenarios in a scenario file along with their weights.
+
+    Parameters
+    ----------
+    config : LiveConfig
+        The configuration which provides tunable weights and
+        the number of active workers.
+
+    session : SessionSetup
+        Provides the worker sessions. Defaults to one configured
+        from the environment.
+
+    shard : Shard
+        This process's part of the job. The configured workers and rate
+        are split between the shards. Defaults to the shard given in
+        the environment.
+
+    Examples
+    --------
+    >>> TABLE = ScenarioTable(LiveConfig.from_env())
+    >>> @TABLE.scenario(weight=2, tunable='error_weight')
+    ... async def scenario_oopsie(session):
+    ...     pass
+    >>> TABLE.install()
+    """
+    def __init__(self, config, session=None, shard=None):
+        self.config = config
+        self.shard = shard or Shard.from_env()
+        self.standalone = bool(os.environ.get(ENGINE_ENV))
+        self.session = session or SessionSetup(pool_settings_from_env())
+        self.reporter = Reporter(job_dir())
+        self.reporter.add_source('connections', self.session.snapshot)
+        self.latency = LatencyRecorder()
+        self.session.add_trace_config(self.latency.trace_config())
+        self.reporter.add_source('latency', self.latency.snapshot)
+        self.reporter.add_source('requests', self.latency.requests)
+        self.reporter.add_timestamp(
+            'first_request',
+            lambda: self.latency.first_request
+        )
+        self.statsd = None
+        statsd = statsd_settings_from_env()
+        if statsd['statsd_address']:
+            self.statsd = StatsdSink(
+                statsd['statsd_address'],
+                interval=statsd['statsd_interval'],
+                sample_rate=statsd['statsd_sample_rate'],
+                mtu=statsd['statsd_mtu'],
+            )
+            self.session.add_trace_config(self.statsd.trace_config())
+        self.seed = seed_from_env()
+        self._randoms = {}
+        self.entries = []
+        self._version = None
+        self._alias = None
+        self._workers = 0
+        self._rate = None
+        self._start_at = None
+        self._fire_random = None
+        arrival_random = None
+        if self.seed is not None:
+            self._fire_random = stream(self.seed, 'fire', self.shard.index)
+            arrival_random = stream(self.seed, 'arrival', self.shard.index)
+        self.scheduler = ArrivalScheduler(config, self.fire,
+                                          rng=arrival_random, shard=self.shard)
+        self.reporter.add_source('arrival', self.scheduler.snapshot)
+        self.replayer = None
+        self.pools = []
+        self.samplers = []
+        self._payload_seed = None
+        # The scenarios requesting from each ID table, by id() of the table
+        self._urls = {}
+        self._ids = None
+        self._id_samplers = {}
+        self.funcs = {
+            IDLE_SCENARIO: _idle,
+            WAIT_SCENARIO: self.wait,
+            ARRIVAL_SCENARIO: self.scheduler.run,
+        }
+        self._sessions = 0
+
+    def scenario(self, weight=1, tunable=None):
+        """
+        Decorator which registers a scenario with the table and with Molotov.
+
+        Parameters
+        ----------
+        weight : int
+            The weight used when the configuration does not supply one.
+
+        tunable : str
+            The name of a configuration key which overrides `weight`,
+            for example `error_weight`.
+        """
+        def _scenario(func):
+            self.entries.append((func.__name__, weight, tunable))
+            self.funcs[func.__name__] = func
+            self._version = None
+            if self.standalone:
+                return func
+            # The weight given to Molotov is ignored once the picker
+            # is installed, but must be positive for it to be registered.
+            return molotov.scenario(weight=1)(func)
+        return _scenario
+
+    def add_pool(self, pool):
+        """
+        Reseed `pool` along with the configured `payload_seed` and
+        return it
+        """
+        if self._payload_seed is not None:
+            pool.reseed(self._payload_seed)
+        self.pools.append(pool)
+        return pool
+
+    def add_sampler(self, sampler):
+        """
+        Seed `sampler` from the seed of the job, if it has one, report
+        its counters under `sampler` and return it
+        """
+        if self.seed is not None:
+            sampler.reseed('{}:sampler:{}:{}'.format(
+                self.seed, self.shard.index, len(self.samplers)))
+        self._report_samplers()
+        self.samplers.append(sampler)
+        return sampler
+
+    def add_urls(self, urls, *scenarios):
+        """
+        Have the IDs of `urls` drawn as the configured `ids` say for the
+        named scenarios and return it.
+
+        Only the tables added here are ever skewed, so tables which are
+        not a range of IDs, or whose IDs must not be skewed, such as the
+        IDs of missing customers, are simply left out.
+        """
+        entry = self._urls.setdefault(id(urls), (urls, []))
+        entry[1].extend(name for name in scenarios if name not in entry[1])
+        self._ids = None
+        self._version = None
+        return urls
+
+    def _report_samplers(self) -> None:
+        if not self.samplers and not self._id_samplers:
+            self.reporter.add_source('sampler', self._sampler_counters)
+
+    def _sampler_counters(self) -> dict:
+        ret = {'blocks': 0, 'stalls': 0}
+        samplers = self.samplers + \
+            [sampler for _, sampler in self._id_samplers.values()]
+        for sampler in samplers:
+            for key, value in sampler.counters.items():
+                ret[key] += value
+        return ret
+
+    def _build_ids(self, ids) -> None:
+        """
+        Give every ID table the sampler of its configured distribution,
+        or none for a uniform one
+        """
+        spec = check_ids(ids) if ids else None
+        overrides = spec['scenarios'] if spec else {}
+        for key, (urls, scenarios) in self._urls.items():
+            dist = spec
+            for name in scenarios:
+                if name in overrides:
+                    dist = overrides[name]
+                    break
+            if dist is None or dist['distribution'] == UNIFORM:
+                urls.sampler = None
+                self._id_samplers.pop(key, None)
+                continue
+            dist = {k: v for k, v in dist.items() if k != 'scenarios'}
+            described = json.dumps(dist, sort_keys=True)
+            current = self._id_samplers.get(key)
+            if current is None or current[0] != described:
+                seed = None
+                if self.seed is not None:
+                    seed = '{}:ids:{}:{}'.format(
+                        self.seed, self.shard.index, scenarios[0])
+                self._report_samplers()
+                current = self._id_samplers[key] = (described, Sampler(
+                    build_distribution(dist, len(urls)), seed=seed))
+            urls.sampler = current[1]
+
+    def replay(self, path: str, base_url: str) -> Replayer:
+        """
+        Replay the capture at `path` against `base_url` rather than
+        picking the registered scenarios
+        """
+        self.replayer = Replayer(self.config, path, base_url,
+                                 shard=self.shard)
+        self.reporter.add_source('replay', self.replayer.snapshot)
+        self.funcs[REPLAY_SCENARIO] = self.replayer.run
+        return self.replayer
+
+    def install(self) -> None:
+        """
+        Register the idle scenario, make this table the picker Molotov
+        uses for every step and install the session fixtures.
+        Does nothing for a standalone table.
+        """
+        if self.standalone:
+            return
+        molotov.scenario(weight=1, name=IDLE_SCENARIO)(_idle)
+        molotov.scenario(weight=1, name=WAIT_SCENARIO)(self.wait)
+        molotov.scenario(weight=1, name=ARRIVAL_SCENARIO)(self.scheduler.run)
+        if self.replayer is not None:
+            molotov.scenario(weight=1, name=REPLAY_SCENARIO)(self.replayer.run)
+        molotov.scenario_picker()(self.pick)
+        molotov.setup()(self.setup)
+        molotov.setup_session()(self.setup_session)
+        molotov.teardown_session()(self.teardown_session)
+        molotov.global_teardown()(self.global_teardown)
+
+    async def setup(self, worker_id, args) -> dict:
+        """
+        Return the session options for a worker and start reporting.
+        Installed as Molotov's `setup` fixture.
+        """
+        self.reporter.start()
+        if self.statsd is not None:
+            self.statsd.start()
+        return await self.session.options(worker_id, args)
+
+    async def setup_session(self, worker_id, session) -> None:
+        """
+        Installed as Molotov's `setup_session` fixture
+        """
+        self._sessions += 1
+        await self.session.setup_session(worker_id, session)
+
+    async def teardown_session(self, worker_id, session) -> None:
+        """
+        Close the shared connector once the last worker is done with it.
+        Installed as Molotov's `teardown_session` fixture.
+        """
+        self._sessions -= 1
+        if self._sessions <= 0:
+            self.session.close()
+            self.global_teardown()
+
+    def global_teardown(self) -> None:
+        """
+        Write the final stats. Installed as Molotov's `global_teardown`
+        fixture, which still runs when the job is stopped with SIGTERM.
+        """
+        self.reporter.stop()
+        if self.statsd is not None:
+            self.statsd.stop()
+
+    def weights(self) -> dict:
+        """
+        Return the effective weight of every registered scenario
+        """
+        ret = {}
+        for name, weight, tunable in self.entries:
+            if tunable is not None:
+                weight = self.config.get(tunable, weight)
+            ret[name] = max(int(float(weight or 0)), 0)
+        return ret
+
+    def rebuild(self) -> None:
+        """
+        Recompute the selection table from the current configuration.
+
+        The new alias table is built aside and swapped in with a single
+        assignment, so a pick never sees a partially built table.
+        """
+        weights = {k: v for k, v in self.weights().items() if v > 0}
+        workers = self.config.get('workers')
+        if weights:
+            self._alias = AliasTable(weights.keys(), weights.values())
+            self.choose = self._alias.pick
+        else:
+            self._alias = None
+            self.choose = _always_idle
+        self._rate = float(self.config.get('rate') or 0) or \
+            bool(self.config.get('shape'))
+        if self._rate:
+            # Every worker takes the slow path in `pick()`
+            self._workers = 0
+        else:
+            self._workers = self.shard.split(float(workers)) \
+                if workers else sys.maxsize
+        start_at = self.config.get('start_at')
+        self._start_at = float(start_at) if start_at else None
+        seed = self.config.get('payload_seed')
+        if seed is None and self.seed is not None:
+            seed = '{}:payload'.format(self.seed)
+        if seed != self._payload_seed:
+            for pool in self.pools:
+                pool.reseed(seed)
+            self._payload_seed = seed
+        ids = json.dumps(self.config.get('ids'), sort_keys=True)
+        if ids != self._ids:
+            try:
+                self._build_ids(self.config.get('ids'))
+            except ValueError as exc:
+                # The API refuses such a job, but the file may be edited
+                print('Ignoring the ids: {}'.format(exc), file=sys.stderr)
+                self._build_ids(None)
+            self._ids = ids
+        self._version = self.config.version
+
+    def pick(self, worker_id=0, step_id=0) -> str:
+        """
+        Choose the name of the next scenario to run.
+
+        This has the signature Molotov expects from a `scenario_picker`.
+        """
+        config = self.config
+        config.refresh()
+        if self._version != config.version:
+            self.rebuild()
+        if self._start_at is not None:
+            if time.time() < self._start_at:
+                return WAIT_SCENARIO
+            self._start_at = None
+        if self.replayer is not None:
+            return REPLAY_SCENARIO if worker_id == 0 else IDLE_SCENARIO
+        if worker_id >= self._workers:
+            if self._rate and worker_id == 0:
+                return ARRIVAL_SCENARIO
+            return IDLE_SCENARIO
+        if self.seed is None:
+            name = self.choose()
+        else:
+            rng = self._randoms.get(worker_id) or self._random(worker_id)
+            CURRENT_RANDOM.set(rng)
+            name = self.choose(rng.random)
+        CURRENT_SCENARIO.set(name)
+        return name
+
+    def _random(self, worker_id: int):
+        """
+        Return the random stream of a worker of this shard
+        """
+        rng = self._randoms[worker_id] = stream(
+            self.seed, 'worker', self.shard.index, worker_id)
+        return rng
+
+    async def wait(self, session) -> None:
+        """
+        Sleep until the configured `start_at`, waking up at least every
+        `IDLE_INTERVAL` seconds so that a changed configuration is seen
+        """
+        if self._start_at is not None:
+            delay = self._start_at - time.time()
+            await asyncio.sleep(min(max(delay, 0), IDLE_INTERVAL))
+
+    def choose(self, rand=None) -> str:
+        """
+        Make a weighted choice among the registered scenarios.
+
+        This is replaced by the `pick` method of the alias table
+        when the table is built.
+
+        Parameters
+        ----------
+        rand : callable
+            Returns a float in [0, 1). Defaults to `random.random`.
+
+        Returns
+        -------
+        str
+            The name of a scenario, or the idle scenario if every
+            weight is zero.
+        """
+        self.rebuild()
+        return self.choose() if rand is None else self.choose(rand)
+
+    async def fire(self, session) -> None:
+        """
+        Run one weighted choice of scenario. Used by the open-loop scheduler.
+        """
+        if self._version != self.config.version:
+            self.rebuild()
+        if self._fire_random is None:
+            name = self.choose()
+        else:
+            CURRENT_RANDOM.set(self._fire_random)
+            name = self.choose(self._fire_random.random)
+        if name == IDLE_SCENARIO:
+            return
+        # Each scheduled scenario runs in a task of its own
+        CURRENT_SCENARIO.set(name)
+        await self.funcs[name](session)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+Pre-built request URLs for the scenarios
+
+Joining a base URL with `urllib.parse.urljoin` and formatting random IDs
+on every request is a noticeable part of the CPU spent per request. The
+catalogue resolves every URL a scenario can request once, at import, so
+that the request path only has to index into a tuple.
+"""
+import itertools
+from urllib.parse import urljoin
+
+from .seed import CURRENT_RANDOM
+
+
+class URLTable(object):
+    """
+    A fixed set of URLs, optionally indexed by a numeric ID.
+
+    Parameters
+    ----------
+    urls : sequence
+        The URLs, in ID order
+
+    low : int
+        The ID of the first URL
+
+    Attributes
+    ----------
+    sampler : Sampler
+        If set, `pick()` takes the index of its URL from this
+        `loadgen.sampler.Sampler` instead of choosing uniformly
+    """
+    __slots__ = ('urls', 'low', 'high', 'sampler', '_n')
+
+    def __init__(self, urls, low=0):
+        self.urls = tuple(urls)
+        self.low = low
+        self.high = low + len(self.urls) - 1
+        self.sampler = None
+        self._n = len(self.urls)
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, id_):
+        return self.urls[id_ - self.low]
+
+    def pick(self, rand=None) -> str:
+        """
+        Return one of the URLs, chosen uniformly or by the `sampler`.
+
+        Parameters
+        ----------
+        rand : callable
+            Returns a float in [0, 1). Defaults to the stream of the
+            running worker, see `loadgen.seed`. Not used with a sampler.
+        """
+        if self.sampler is not None:
+            return self.urls[self.sampler.next()]
+        if rand is None:
+            rand = CURRENT_RANDOM.get().random
+        return self.urls[int(rand() * self._n)]
+
+
+class URLCatalogue(object):
+    """
+    Builds the URLs for a single target.
+
+    Parameters
+    ----------
+    base_url : str
+        The URL of the Opbean, usually `OPBEANS_BASE_URL`
+
+    Examples
+    --------
+    >>> URLS = URLCatalogue('http://opbeans-python:3000')
+    >>> URLS.join('api', 'stats')
+    'http://opbeans-python:3000/api/stats'
+    >>> URLS.ids('api/products/{}', 1, 6)[2]
+    'http://opbeans-python:3000/api/products/2'
+    """
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def join(self, *fragments) -> str:
+        """
+        Resolve a path against the base URL the same way the scenarios
+        always have, by joining the fragments with `/` and calling
+        `urljoin`.
+        """
+        return urljoin(self.base_url, '/'.join(fragments))
+
+    def ids(self, template: str, low: int, high: int) -> URLTable:
+        """
+        Build the URL for every ID in an inclusive range.
+
+        Parameters
+        ----------
+        template : str
+            A path containing a single `{}` to be replaced by the ID
+
+        low : int
+            The first ID
+
+        high : int
+            The last ID
+        """
+        return URLTable(
+            (self.join(template.format(i)) for i in range(low, high + 1)),
+            low
+        )
+
+    def product(self, template: str, *ranges) -> URLTable:
+        """
+        Build the URL for every combination of several parameters.
+
+        Parameters
+        ----------
+        template : str
+            A path containing one `{}` for each range
+
+        ranges : iterable
+            The possible values of each parameter
+
+        Returns
+        -------
+        URLTable
+            A table which is only meant to be used with `pick()`
+        """
+        return URLTable(
+            self.join(template.format(*values))
+            for values in itertools.product(*ranges)
+        )
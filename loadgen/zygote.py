@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+"""
+A warm template process which forks Molotov jobs
+
+Starting Molotov from scratch means booting an interpreter and importing
+aiohttp, uvloop, Molotov and this package before the first request can
+be sent. The zygote imports all of them once and then waits on a unix
+socket. Each job it is asked for is a fork of the zygote, which runs
+Molotov's command line with the job's arguments and environment, so it
+starts with everything already imported. Requests are JSON lines:
+
+    {"op": "spawn", "args": ["--workers", "32", "scenarios/dyno.py"],
+     "env": {"OPBEANS_BASE_URL": "http://toxi:8000", ...}, "cwd": "/app"}
+    {"op": "status", "pid": 1234}
+
+`spawn` answers with the `pid` of the new job. Giving a `leader` pid
+puts the job in the process group of that job, as for the shards of a
+`ShardGroup`; otherwise the job leads a group of its own. The zygote
+reaps its jobs and `status` answers whether a job is `running` and,
+once it is not, its `exit_code`. Run the zygote with
+
+    python -m loadgen.zygote --socket /tmp/dyno/zygote.sock
+
+The zygote itself never runs an event loop or a thread, so forking it
+is safe.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import traceback
+
+# Imported for the jobs, which inherit them when they are forked
+import aiohttp  # noqa: F401
+import molotov.run
+
+from . import table  # noqa: F401
+
+try:
+    import uvloop  # noqa: F401
+except ImportError:
+    pass
+
+DEFAULT_SOCKET = '/tmp/dyno/zygote.sock'
+
+# Seconds between two checks for exited jobs while no request comes in
+REAP_INTERVAL = 0.5
+
+# Seconds a control connection may stay silent
+CONNECTION_TIMEOUT = 10.0
+
+# How many exit codes are kept for jobs nobody asked about yet
+MAX_EXITS = 1000
+
+
+class Zygote(object):
+    """
+    Forks jobs and keeps track of them
+    """
+    def __init__(self):
+        self.children = set()
+        self.exits = {}
+        self._closing = []
+
+    def spawn(self, args, env=None, cwd=None, leader=None) -> int:
+        """
+        Fork a job which runs Molotov with `args`
+
+        Returns
+        -------
+        int
+            The pid of the job
+        """
+        pid = os.fork()
+        if pid == 0:
+            self._run_child(list(args), env, cwd, leader)
+        try:
+            # Also set from this side so that the group is in place by
+            # the time the caller signals it
+            os.setpgid(pid, leader or pid)
+        except OSError:
+            # The child already exited
+            pass
+        self.children.add(pid)
+        return pid
+
+    def _run_child(self, args, env, cwd, leader):
+        code = 1
+        try:
+            for sock in self._closing:
+                # Closes the descriptor even while a reader holds the socket
+                os.close(sock.fileno())
+            os.setpgid(0, leader or 0)
+            if cwd:
+                os.chdir(cwd)
+            if env is not None:
+                os.environ.clear()
+                os.environ.update(env)
+            sys.argv = ['molotov'] + args
+            code = molotov.run.main()
+        except SystemExit as exc:
+            if exc.code is None or isinstance(exc.code, int):
+                code = exc.code or 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code or 0)
+
+    def reap(self) -> None:
+        """
+        Collect the exit codes of the jobs which have exited
+        """
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            self.children.discard(pid)
+            if os.WIFSIGNALED(status):
+                self.exits[pid] = -os.WTERMSIG(status)
+            else:
+                self.exits[pid] = os.WEXITSTATUS(status)
+            while len(self.exits) > MAX_EXITS:
+                del self.exits[next(iter(self.exits))]
+
+    def status(self, pid: int) -> dict:
+        self.reap()
+        if pid in self.children:
+            return {'running': True}
+        return {'running': False, 'exit_code': self.exits.get(pid)}
+
+    def dispatch(self, request: dict) -> dict:
+        """
+        Carry out one control request and return the response
+        """
+        try:
+            op = request.pop('op', None)
+            if op == 'spawn':
+                return {'ok': True, 'pid': self.spawn(**request)}
+            elif op == 'status':
+                return dict(self.status(int(request['pid'])), ok=True)
+            elif op != 'ping':
+                raise ValueError('Unknown op: {}'.format(op))
+        except Exception as exc:
+            return {'ok': False, 'error': '{}: {}'.format(type(exc).__name__, exc)}  # noqa
+        return {'ok': True}
+
+    def serve(self, path: str) -> None:
+        """
+        Answer control connections on a unix socket, one at a time
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(path)
+        listener.listen(16)
+        listener.settimeout(REAP_INTERVAL)
+        while True:
+            self.reap()
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                continue
+            self._closing = [listener, conn]
+            with conn:
+                conn.settimeout(CONNECTION_TIMEOUT)
+                try:
+                    self._handle(conn)
+                except OSError:
+                    pass
+
+    def _handle(self, conn) -> None:
+        reader = conn.makefile('rb')
+        for line in reader:
+            try:
+                request = json.loads(line.decode('utf-8'))
+            except ValueError as exc:
+                response = {'ok': False, 'error': str(exc)}
+            else:
+                response = self.dispatch(request)
+            conn.sendall(json.dumps(response).encode('utf-8') + b'\n')
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='python -m loadgen.zygote',
+        description='Fork warm Molotov jobs on request'
+    )
+    parser.add_argument(
+        '--socket',
+        default=DEFAULT_SOCKET,
+        help='The unix socket to accept control requests on'
+    )
+    args = parser.parse_args(argv)
+    Zygote().serve(args.socket)
+
+
+if __name__ == '__main__':
+    main()
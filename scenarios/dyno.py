@@ -1,17 +1,52 @@
-import io
 import os
-import random
-import json
-from urllib.parse import urljoin
 
-from aiohttp import FormData
-from molotov import scenario
+from loadgen.live import LiveConfig
+from loadgen.payloads import csv_orders, json_orders
+from loadgen.seed import current as current_random
+from loadgen.table import ScenarioTable
+from loadgen.urls import URLCatalogue
 
 SERVER_URL = os.environ.get('OPBEANS_BASE_URL', 'http://localhost:8000')
 SERVICE_NAME = os.environ.get('OPBEANS_NAME', 'default')
 ERROR_WEIGHT = int(os.environ.get('ERROR_WEIGHT', 2))
 APP_LATENCY_WEIGHT = int(os.environ.get('APP_LATENCY_WEIGHT', 0))
 
+CONFIG = LiveConfig.from_env()
+TABLE = ScenarioTable(CONFIG)
+scenario = TABLE.scenario
+
+URLS = URLCatalogue(SERVER_URL)
+STATS_URL = URLS.join('api', 'stats')
+PRODUCTS_URL = URLS.join('api', 'products')
+PRODUCTS_TOP_URL = URLS.join('api', 'products', 'top')
+PRODUCT_URLS = URLS.ids('api/products/{}', 1, 6)
+PRODUCT_CUSTOMERS_URLS = URLS.ids('api/products/{}/customers', 1, 6)
+PRODUCT_CUSTOMERS_LIMIT_URLS = URLS.product(
+    'api/products/{}/customers?limit={}', range(1, 7), range(50, 120, 10))
+TYPES_URL = URLS.join('api', 'types')
+TYPE_URLS = URLS.ids('api/types/{}', 1, 3)
+CUSTOMERS_URL = URLS.join('api', 'customers')
+CUSTOMER_URLS = URLS.ids('api/customers/{}', 1, 1000)
+WRONG_CUSTOMER_URLS = URLS.ids('api/customers/{}', 5000, 10000)
+ORDERS_URL = URLS.join('api', 'orders')
+ORDER_URLS = URLS.ids('api/orders/{}', 1, 1000)
+ORDERS_CSV_URL = URLS.join('api', 'orders', 'csv')
+OOPSIE_URL = URLS.join('oopsie')
+LOG_ERROR_URL = URLS.join('log-error')
+LOG_MESSAGE_URL = URLS.join('log-message')
+COFFEE_TIME_URL = URLS.join('is-it-coffee-time')
+THROW_ERROR_URL = URLS.join('throw-error')
+THROW_ASYNC_ERROR_URL = URLS.join('throw-async-error')
+LATENCY_URL = URLS.join('labeldelay') + '?delay={}&label={}'
+
+ORDER_BODIES = TABLE.add_pool(json_orders())
+ORDER_CSV_BODIES = TABLE.add_pool(csv_orders())
+
+# The scenarios which draw their IDs as the configured `ids` say
+TABLE.add_urls(PRODUCT_URLS, 'scenario_products_id')
+TABLE.add_urls(CUSTOMER_URLS, 'scenario_customers_id')
+TABLE.add_urls(ORDER_URLS, 'scenario_orders_id')
+
 
 @scenario(weight=1)
 async def scenario_root(session):
@@ -21,260 +56,164 @@ async def scenario_root(session):
 
 @scenario(weight=1)
 async def scenario_stats(session):
-    async with session.get(join(SERVER_URL, 'api', 'stats')) as resp:
+    async with session.get(STATS_URL) as resp:
         assert resp.status == 200, resp.status
 
 
 @scenario(weight=1)
 async def scenario_products(session):
-    async with session.get(join(SERVER_URL, 'api', 'products')) as resp:
+    async with session.get(PRODUCTS_URL) as resp:
         assert resp.status == 200, resp.status
 
 
 @scenario(weight=1)
 async def scenario_products_top(session):
-    async with session.get(join(SERVER_URL, 'api', 'products', 'top')) as resp:
+    async with session.get(PRODUCTS_TOP_URL) as resp:
         assert resp.status == 200, resp.status
 
 
 @scenario(weight=1)
 async def scenario_products_id(session):
-    async with session.get(
-        join(
-            SERVER_URL,
-            'api',
-            'products',
-            str(random.randint(1, 6))
-        )
-    ) as resp:
+    async with session.get(PRODUCT_URLS.pick()) as resp:
         assert resp.status == 200, resp.status
 
 
 @scenario(weight=6)
 async def scenario_products_id_customers(session):
-    async with session.get(
-        join(
-            SERVER_URL,
-            'api',
-            'products',
-            str(random.randint(1, 6)),
-            'customers'
-        )
-    ) as resp:
+    async with session.get(PRODUCT_CUSTOMERS_URLS.pick()) as resp:
         assert resp.status == 200, resp.status
 
 
 @scenario(weight=1)
 async def scenario_products_id_customers_limit(session):
-    async with session.get(
-        join(
-            SERVER_URL,
-            'api',
-            'products',
-            str(random.randint(1, 6)),
-            'customers?limit=%d' % (random.randint(5, 11) * 10))) as resp:
+    async with session.get(PRODUCT_CUSTOMERS_LIMIT_URLS.pick()) as resp:
         assert resp.status == 200, resp.status
 
 
 @scenario(weight=1)
 async def scenario_types(session):
-    async with session.get(join(SERVER_URL, 'api', 'types')) as resp:
+    async with session.get(TYPES_URL) as resp:
         assert resp.status == 200, resp.status
 
 
 @scenario(weight=8)
 async def scenario_types_id(session):
-    async with session.get(
-        join(
-            SERVER_URL,
-            'api',
-            'types',
-            str(random.randint(1, 3))
-        )
-    ) as resp:
+    async with session.get(TYPE_URLS.pick()) as resp:
         assert resp.status == 200, resp.status
 
 
 @scenario(weight=1)
 async def scenario_customers(session):
-    async with session.get(join(SERVER_URL, 'api', 'customers')) as resp:
+    async with session.get(CUSTOMERS_URL) as resp:
         assert resp.status == 200, resp.status
 
 
 @scenario(weight=1)
 async def scenario_customers_id(session):
-    async with session.get(
-        join(
-            SERVER_URL,
-            'api',
-            'customers',
-            str(random.randint(1, 1000))
-            )
-    ) as resp:
+    async with session.get(CUSTOMER_URLS.pick()) as resp:
         assert resp.status == 200, resp.status
 
 
 @scenario(weight=8)
 async def scenario_wrong_customers_id(session):
-    async with session.get(
-        join(
-            SERVER_URL,
-            'api',
-            'customers',
-            str(random.randint(5000, 10000))
-        )
-    ) as resp:
+    async with session.get(WRONG_CUSTOMER_URLS.pick()) as resp:
         assert resp.status == 404, resp.status
 
 
 @scenario(weight=1)
 async def scenario_orders(session):
-    async with session.get(join(SERVER_URL, 'api', 'orders')) as resp:
+    async with session.get(ORDERS_URL) as resp:
         assert resp.status == 200, resp.status
 
 
 @scenario(weight=1)
 async def scenario_orders_id(session):
-    async with session.get(
-        join(
-            SERVER_URL,
-            'api',
-            'orders',
-            str(random.randint(1, 1000))
-        )
-    ) as resp:
+    async with session.get(ORDER_URLS.pick()) as resp:
         assert resp.status == 200, resp.status
 
 
 @scenario(weight=1)
 async def scenario_orders_post(session):
-    data = {
-        'customer_id': random.randint(1, 1000),
-        'lines': [],
-    }
-    for i in range(0, random.randint(1, 5)):
-        data['lines'].append({
-            'id': random.randint(1, 6),
-            'amount': random.randint(1, 4)
-        })
-    async with session.post(
-        join(
-            SERVER_URL,
-            'api',
-            'orders'
-         ),
-        data=json.dumps(data)
-    ) as resp:
+    async with session.post(ORDERS_URL, data=ORDER_BODIES.next(),
+                            headers=ORDER_BODIES.headers) as resp:
         assert resp.status == 200, resp.status
 
 if SERVICE_NAME.startswith('opbeans-python'):
-    @scenario(weight=APP_LATENCY_WEIGHT)
+    @scenario(weight=APP_LATENCY_WEIGHT, tunable='app_latency_weight')
     async def scenario_brower_latency_distribution(session):
         async with session.get(
-            join(
-                SERVER_URL,
-                'labeldelay',
-                '?delay=',
-                random.randint(
-                    os.environ.get('APP_LATENCY_LOWER_BOUND', 1),
-                    os.environ.get('APP_LATENCY_UPPER_BOUND', 1000)
+            LATENCY_URL.format(
+                current_random().randint(
+                    int(float(CONFIG['app_latency_lower_bound'])),
+                    int(float(CONFIG['app_latency_upper_bound']))
                 ),
-                '&label=',
-                os.environ.get('APP_LATENCY_LABEL', 'browser_latency_delay')
+                CONFIG['app_latency_label']
             ),
-            headers={
-                'User-Agent': os.environ.get(
-                    'APP_LATENCY_USER_AGENT',
-                    'Safari/531.21.10'
-                    )
-                }
+            headers={'User-Agent': CONFIG['app_latency_user_agent']}
         ) as resp:
             assert resp.status == 200, resp.status
 
 
 if SERVICE_NAME.startswith(tuple(['opbeans-python', 'opbeans-go'])):
-    @scenario(weight=ERROR_WEIGHT)
+    @scenario(weight=ERROR_WEIGHT, tunable='error_weight')
     async def scenario_oopsie(session):
-        async with session.get(join(SERVER_URL, 'oopsie')) as resp:
+        async with session.get(OOPSIE_URL) as resp:
             assert resp.status == 500
 
     @scenario(weight=1)
     async def scenario_orders_post_csv(session):
-        customer_id = random.randint(1, 1000)
-        lines = []
-        for i in range(0, random.randint(1, 5)):
-            lines.append(','.join(map(str, [
-                random.randint(1, 6), random.randint(1, 4)
-            ])))
-        data = FormData()
-        data.add_field('customer', str(customer_id))
-        data.add_field(
-            'file',
-            io.BytesIO('\n'.join(lines).encode('utf8')),
-            filename='data.csv',
-            content_type='text/plain'
-        )
-        async with session.post(
-            join(
-                SERVER_URL,
-                'api',
-                'orders',
-                'csv'
-            ),
-            data=data
-        ) as resp:
+        async with session.post(ORDERS_CSV_URL, data=ORDER_CSV_BODIES.next(),
+                                headers=ORDER_CSV_BODIES.headers) as resp:
             assert resp.status == 200, resp.status
 
 
 if SERVICE_NAME.startswith('opbeans-node'):
-    @scenario(weight=ERROR_WEIGHT)
+    @scenario(weight=ERROR_WEIGHT, tunable='error_weight')
     async def scenario_log_error_node(session):
-        async with session.get(join(SERVER_URL, 'log-error')) as resp:
+        async with session.get(LOG_ERROR_URL) as resp:
             assert resp.status == 500
 
-    @scenario(weight=ERROR_WEIGHT)
+    @scenario(weight=ERROR_WEIGHT, tunable='error_weight')
     async def scenario_log_message_node(session):
-        async with session.get(join(SERVER_URL, 'log-message')) as resp:
+        async with session.get(LOG_MESSAGE_URL) as resp:
             assert resp.status == 500
 
-    @scenario(weight=ERROR_WEIGHT)
+    @scenario(weight=ERROR_WEIGHT, tunable='error_weight')
     async def scenario_is_it_coffee_time_typo_node(session):
-        async with session.get(join(SERVER_URL, 'is-it-coffee-time')) as resp:
+        async with session.get(COFFEE_TIME_URL) as resp:
             assert resp.status == 500
 
-    @scenario(weight=ERROR_WEIGHT)
+    @scenario(weight=ERROR_WEIGHT, tunable='error_weight')
     async def scenario_throw_error_node(session):
-        async with session.get(join(SERVER_URL, 'throw-error')) as resp:
+        async with session.get(THROW_ERROR_URL) as resp:
             assert resp.status == 500
 
-    @scenario(weight=os.environ['ERROR_WEIGHT'])
+    @scenario(weight=ERROR_WEIGHT, tunable='error_weight')
     async def scenario_throw_error_async_node(session):
-        async with session.get(join(SERVER_URL, 'throw-async-error')) as resp:
+        async with session.get(THROW_ASYNC_ERROR_URL) as resp:
             assert resp.status == 200
 
 
 if SERVICE_NAME.startswith('opbeans-ruby'):
-    @scenario(weight=ERROR_WEIGHT)
+    @scenario(weight=ERROR_WEIGHT, tunable='error_weight')
     async def scenario_log_error_ruby(session):
-        async with session.get(join(SERVER_URL, 'log-error')) as resp:
+        async with session.get(LOG_ERROR_URL) as resp:
             assert resp.status == 500
 
-    @scenario(weight=ERROR_WEIGHT)
+    @scenario(weight=ERROR_WEIGHT, tunable='error_weight')
     async def scenario_log_message_ruby(session):
-        async with session.get(join(SERVER_URL, 'log-message')) as resp:
+        async with session.get(LOG_MESSAGE_URL) as resp:
             assert resp.status == 500
 
-    @scenario(weight=ERROR_WEIGHT)
+    @scenario(weight=ERROR_WEIGHT, tunable='error_weight')
     async def scenario_is_it_coffee_time_typo_ruby(session):
-        async with session.get(join(SERVER_URL, 'is-it-coffee-time')) as resp:
+        async with session.get(COFFEE_TIME_URL) as resp:
             assert resp.status == 500
 
-    @scenario(weight=ERROR_WEIGHT)
+    @scenario(weight=ERROR_WEIGHT, tunable='error_weight')
     async def scenario_throw_error_ruby(session):
-        async with session.get(join(SERVER_URL, 'throw-error')) as resp:
+        async with session.get(THROW_ERROR_URL) as resp:
             assert resp.status == 500
 
 
-def join(base_url, *fragments):
-    path = '/'.join(fragments)
-    return urljoin(base_url, path)
+TABLE.install()
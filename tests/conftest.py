@@ -22,6 +22,8 @@ Tests for the Openbeans Load Generator
 import os
 import pytest
 import dyno.app
+import dyno.app.api.control
+from dyno.app.store import JobStore
 
 
 @pytest.fixture
@@ -35,6 +37,16 @@ def default_environment(monkeypatch):
     monkeypatch.setenv("OPBEANS_RLS", "opbeans-python:500")
 
 
+@pytest.fixture(autouse=True)
+def job_store(tmp_path, monkeypatch):
+    """
+    Keep the jobs started by tests out of the job store of a real Dyno
+    """
+    store = JobStore(os.path.join(str(tmp_path), 'jobs.jsonl'))
+    monkeypatch.setattr(dyno.app.api.control, 'STORE', store)
+    return store
+
+
 @pytest.fixture(scope="session")
 def app():
     """
@@ -57,7 +69,10 @@ def scenarios():
     cur_dir = os.path.dirname(os.path.abspath(__file__))
     fixture_path = os.path.join(cur_dir, "../scenarios")
     scenario_files = os.listdir(fixture_path)
-    scenarios = [scenario.replace('.py', '') for scenario in scenario_files]
+    scenarios = [
+        os.path.splitext(scenario)[0] for scenario in scenario_files
+        if scenario.endswith(('.py', '.jsonl', '.json'))
+    ]
     return scenarios
 
 
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the alias table used for weighted selection
+"""
+import random
+import pytest
+from loadgen.alias import AliasTable
+
+
+def test_distribution():
+    """
+    GIVEN an alias table built from a set of weights
+    WHEN many items are drawn from it
+    THEN each item is drawn in proportion to its weight
+    """
+    weights = {'a': 1, 'b': 0, 'c': 3, 'd': 6}
+    table = AliasTable(weights.keys(), weights.values())
+    rand = random.Random(42).random
+    draws = [table.pick(rand) for _ in range(100000)]
+    assert draws.count('b') == 0
+    for item in ('a', 'c', 'd'):
+        assert abs(draws.count(item) / 100000 - weights[item] / 10) < 0.01
+
+
+def test_no_weight():
+    """
+    GIVEN a set of weights which are all zero
+    WHEN an alias table is built from them
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        AliasTable(['a'], [0])
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the open-loop arrival scheduler
+"""
+import asyncio
+import time
+from loadgen.arrival import ArrivalScheduler
+from loadgen.live import LiveConfig
+
+
+def _run(scheduler, duration):
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(scheduler.run(None, duration=duration))
+        loop.run_until_complete(asyncio.sleep(0.3))
+    finally:
+        loop.close()
+
+
+def test_rate_independent_of_latency():
+    """
+    GIVEN a scheduler whose scenarios take longer than the send interval
+    WHEN it runs for a fixed time
+    THEN it still sends at the requested rate
+    """
+    async def slow(session):
+        await asyncio.sleep(0.2)
+
+    config = LiveConfig(defaults={'rate': 100, 'max_in_flight': 1000})
+    scheduler = ArrivalScheduler(config, slow)
+    _run(scheduler, 0.5)
+    assert 45 <= scheduler.counters['sent'] <= 51
+    assert scheduler.counters['completed'] == scheduler.counters['sent']
+    assert scheduler.counters['missed'] == 0
+
+
+def test_in_flight_cap():
+    """
+    GIVEN a scheduler with a low cap on concurrent scenarios
+    WHEN the scenarios are too slow to stay under the cap
+    THEN sends over the cap are skipped and counted as missed
+    """
+    async def slow(session):
+        await asyncio.sleep(1)
+
+    config = LiveConfig(defaults={'rate': 100, 'max_in_flight': 10})
+    scheduler = ArrivalScheduler(config, slow)
+    _run(scheduler, 0.5)
+    assert scheduler.counters['sent'] == 10
+    assert scheduler.counters['missed'] >= 35
+
+
+def test_shape():
+    """
+    GIVEN a scheduler whose rate ramps up within a single slice
+    WHEN it runs through the ramp
+    THEN the sends follow the ramp rather than the rate at the start
+         of the slice
+    """
+    async def fast(session):
+        pass
+
+    start = time.time()
+    config = LiveConfig(defaults={
+        'shape': [{'type': 'ramp', 'from': 0, 'to': 400, 'duration': 1}],
+        'shape_start': start,
+    })
+    sends = []
+    scheduler = ArrivalScheduler(config, fast)
+    scheduler._send = lambda *args: sends.append(time.time() - start)
+    _run(scheduler, 1.0)
+    # The integral of the ramp over the first second is 200
+    assert 185 <= len(sends) <= 210
+    assert 40 <= len([t for t in sends if t < 0.5]) <= 55
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the search for the highest rate within an SLO
+"""
+import pytest
+
+from dyno.app import autotune
+from loadgen.histogram import Histogram
+
+
+class FakeOpbean(object):
+    """
+    Produces the merged raw stats of a job whose latency climbs once
+    the rate goes above its capacity
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.rate = 0
+        self.ts = 0.0
+        self.ok = Histogram()
+        self.sent = 0
+
+    def set_rate(self, rate):
+        self.rate = rate
+
+    def sleep(self, seconds):
+        latency = 10000 if self.rate <= self.capacity else 500000
+        for _ in range(int(self.rate * seconds)):
+            self.ok.record(latency)
+        self.sent += int(self.rate * seconds)
+        self.ts += seconds
+
+    def read(self):
+        return {
+            'processes': 1,
+            'ts': self.ts,
+            'latency': {'scenario_products': {'200': self.ok.snapshot()}},
+            'arrival': {'sent': self.sent, 'missed': 0},
+        }
+
+
+def _tuner(capacity, **spec):
+    opbean = FakeOpbean(capacity)
+    settings = autotune.parse(dict({'p99': 100}, **spec))
+    finished = []
+    tuner = autotune.Autotuner(
+        'python', settings, opbean.set_rate, opbean.read,
+        finish=finished.append, sleep=opbean.sleep,
+    )
+    return tuner, finished
+
+
+def test_parse():
+    """
+    GIVEN an autotune request with only an SLO
+    WHEN it is parsed
+    THEN the defaults are filled in, and requests which are not valid
+         are refused
+    """
+    settings = autotune.parse({'p99': 250})
+    assert settings['p99'] == 250.0
+    assert settings['error_rate'] == autotune.ERROR_RATE
+    assert settings['start_rate'] == 10.0
+    assert settings['then'] == autotune.HOLD
+    for spec in ([], {'p99': 'fast'}, {'factor': 1}, {'then': 'wait'},
+                 {'start_rate': 100, 'max_rate': 10}, {'p95': 100},
+                 {'step_duration': 0}):
+        with pytest.raises(ValueError):
+            autotune.parse(spec)
+
+
+def test_find_knee():
+    """
+    GIVEN an Opbean whose p99 breaks the SLO above 100 requests per second
+    WHEN the tuner runs
+    THEN it climbs past the knee, bisects back below it and finishes
+         with the highest rate which met the SLO
+    """
+    tuner, finished = _tuner(100, start_rate=10, factor=2, refine=3,
+                             step_duration=5)
+    tuner.run()
+    rates = [point['rate'] for point in tuner.curve]
+    assert rates == [10, 20, 40, 80, 160, 120, 100, 110]
+    assert [p['ok'] for p in tuner.curve][-4:] == [False, False, True, False]
+    assert tuner.curve[4]['failed'] == ['p99']
+    assert tuner.state == autotune.DONE
+    assert finished == [100]
+    report = tuner.report()
+    assert report['knee'] == 100
+    assert report['slo'] == {'p99': 100.0, 'error_rate': 0.01}
+
+
+def test_max_rate():
+    """
+    GIVEN an Opbean which meets the SLO at every rate
+    WHEN the tuner reaches the maximum rate
+    THEN it stops there
+    """
+    tuner, finished = _tuner(1000, start_rate=10, factor=3, max_rate=50,
+                             step_duration=1)
+    tuner.run()
+    assert [point['rate'] for point in tuner.curve] == [10, 30, 50]
+    assert finished == [50]
+
+
+def test_cancel():
+    """
+    GIVEN a running search
+    WHEN the job goes away
+    THEN the search is cancelled without finishing
+    """
+    tuner, finished = _tuner(100, step_duration=1)
+    tuner.read = lambda: {'processes': 0}
+    tuner.run()
+    assert tuner.state == autotune.CANCELLED
+    assert finished == []
+
+
+def test_cancel_midway():
+    """
+    GIVEN a search which is part way through a step
+    WHEN it is cancelled
+    THEN it is reported and saved as cancelled at once, and neither
+         sets the rate again nor finishes
+    """
+    tuner, finished = _tuner(100, step_duration=1)
+    saved = []
+    tuner.save = saved.append
+    rates = []
+    set_rate = tuner.set_rate
+    tuner.set_rate = lambda rate: (rates.append(rate), set_rate(rate))
+    sleep = tuner.sleep
+
+    def cancel_in_step(seconds):
+        sleep(seconds)
+        if len(rates) == 2:
+            tuner.cancel()
+    tuner.sleep = cancel_in_step
+    tuner.run()
+    assert tuner.state == autotune.CANCELLED
+    assert saved[-1]['state'] == autotune.CANCELLED
+    assert len(rates) == 2
+    assert finished == []
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for running a job across several Dyno agents
+"""
+from unittest import mock
+
+import pytest
+from flask import url_for
+
+from dyno.app.api import cluster
+from loadgen.histogram import Histogram
+
+AGENT_URLS = ['http://127.0.0.1:9001', 'http://127.0.0.1:9002', 'http://127.0.0.1:9003']  # noqa
+
+
+@pytest.fixture
+def coordinator(client):
+    with mock.patch.object(cluster, 'ROLE', cluster.COORDINATOR), \
+            mock.patch.dict(cluster.AGENTS, clear=True), \
+            mock.patch.dict(cluster.CLUSTER_JOBS, clear=True):
+        for url in AGENT_URLS:
+            client.post(url_for('api.register_agent'), json={'url': url})
+        yield client
+
+
+class FakeAgents(object):
+    """
+    Answers the requests the coordinator sends to its agents
+    """
+    def __init__(self, down=()):
+        self.calls = []
+        self.attempts = []
+        self.down = set(down)
+
+    def __call__(self, url, method, path, body=None):
+        self.attempts.append((url, path))
+        if url in self.down:
+            raise OSError('Connection refused')
+        self.calls.append((url, path, body))
+        if path.startswith('/api/stats'):
+            hist = Histogram()
+            hist.record(1000 * (AGENT_URLS.index(url) + 1))
+            return {'python': {
+                'arrival': {'sent': 10},
+                'latency': {'scenario_a': {'200': hist.snapshot()}},
+                'processes': 2,
+                'started': 100.0,
+                'ts': 110.0,
+            }}
+        return {}
+
+    def bodies(self, path):
+        return {url: body for url, p, body in self.calls if p == path}
+
+
+def test_start(coordinator):
+    """
+    GIVEN a coordinator with three agents
+    WHEN a cluster job is started
+    THEN the rate and workers are split between the agents, which are
+    all given the same start time
+    """
+    agents = FakeAgents()
+    with mock.patch.object(cluster, '_call_agent', agents):
+        res = coordinator.post(
+            url_for('api.start_cluster_job'),
+            json={'job': 'opbeans-python', 'port': '8000', 'rate': 300, 'workers': 10}  # noqa
+        )
+    assert res.status_code == 200
+    bodies = agents.bodies('/api/start')
+    assert sorted(bodies) == AGENT_URLS
+    assert sum(b['rate'] for b in bodies.values()) == pytest.approx(300)
+    assert sorted(b['workers'] for b in bodies.values()) == [3, 3, 4]
+    assert {b['start_at'] for b in bodies.values()} == {res.json['start_at']}
+    assert {b['job'] for b in bodies.values()} == {'python'}
+
+
+def test_rebalance(coordinator):
+    """
+    GIVEN a cluster job running on three agents
+    WHEN one agent stops sending heartbeats
+    THEN its share of the rate is handed to the other two
+    """
+    agents = FakeAgents()
+    with mock.patch.object(cluster, '_call_agent', agents):
+        coordinator.post(
+            url_for('api.start_cluster_job'),
+            json={'job': 'python', 'rate': 300, 'workers': 6}
+        )
+        cluster.AGENTS[AGENT_URLS[0]]['last_seen'] = 0
+        cluster.rebalance()
+    bodies = agents.bodies('/api/update')
+    assert sorted(bodies) == AGENT_URLS[1:]
+    assert [b['rate'] for b in bodies.values()] == [150, 150]
+    assert cluster.CLUSTER_JOBS['python']['agents'] == AGENT_URLS[1:]
+    assert (AGENT_URLS[0], '/api/stop?job=python') in agents.attempts
+    assert cluster.CLUSTER_JOBS['python']['stopping'] == []
+
+
+def test_rebalance_agent_down(coordinator):
+    """
+    GIVEN a cluster job running on three agents
+    WHEN one agent stops sending heartbeats and cannot be reached
+    THEN it is told to stop the job once it is back, and when the
+    cluster job is stopped
+    """
+    agents = FakeAgents()
+    with mock.patch.object(cluster, '_call_agent', agents):
+        coordinator.post(
+            url_for('api.start_cluster_job'),
+            json={'job': 'python', 'rate': 300, 'workers': 6}
+        )
+        cluster.AGENTS[AGENT_URLS[0]]['last_seen'] = 0
+        agents.down.add(AGENT_URLS[0])
+        cluster.rebalance()
+        assert cluster.CLUSTER_JOBS['python']['stopping'] == AGENT_URLS[:1]
+        coordinator.get(url_for('api.stop_cluster_job', job='python'))
+    assert agents.attempts.count((AGENT_URLS[0], '/api/stop?job=python')) == 2
+
+
+def test_update_failed(coordinator):
+    """
+    GIVEN a cluster job on three live agents
+    WHEN one of them fails an update, or a stats request
+    THEN it keeps its place in the job and is sent its share again
+    """
+    agents = FakeAgents()
+    with mock.patch.object(cluster, '_call_agent', agents):
+        coordinator.post(
+            url_for('api.start_cluster_job'),
+            json={'job': 'python', 'rate': 300, 'workers': 6}
+        )
+        agents.down.add(AGENT_URLS[0])
+        coordinator.get(url_for('api.get_cluster_stats', job='python'))
+        cluster._rebalance_job('python')
+        assert cluster.CLUSTER_JOBS['python']['pending'] == AGENT_URLS[:1]
+        agents.down.clear()
+        cluster.rebalance()
+    assert AGENT_URLS[0] in cluster.AGENTS
+    assert cluster.CLUSTER_JOBS['python']['agents'] == AGENT_URLS
+    assert cluster.CLUSTER_JOBS['python']['pending'] == []
+    assert agents.bodies('/api/update')[AGENT_URLS[0]]['rate'] == 100
+    assert not any(p.startswith('/api/stop') for _, p in agents.attempts)
+
+
+def test_start_agent_down(coordinator):
+    """
+    GIVEN a coordinator with an agent which cannot be reached
+    WHEN a cluster job is started
+    THEN the job is spread over the agents which started it, and the
+    agent which did not is told to stop it but stays registered
+    """
+    agents = FakeAgents(down=[AGENT_URLS[2]])
+    with mock.patch.object(cluster, '_call_agent', agents):
+        res = coordinator.post(
+            url_for('api.start_cluster_job'),
+            json={'job': 'python', 'rate': 300}
+        )
+    assert sorted(res.json['agents']) == AGENT_URLS[:2]
+    assert [b['rate'] for b in agents.bodies('/api/update').values()] == [150, 150]  # noqa
+    assert AGENT_URLS[2] in cluster.AGENTS
+    assert (AGENT_URLS[2], '/api/stop?job=python') in agents.attempts
+    assert cluster.CLUSTER_JOBS['python']['stopping'] == AGENT_URLS[2:]
+
+
+def test_stats(coordinator):
+    """
+    GIVEN a cluster job running on three agents
+    WHEN the cluster stats are requested
+    THEN the counters are added up and the percentiles are taken over
+    the latencies of every agent
+    """
+    agents = FakeAgents()
+    with mock.patch.object(cluster, '_call_agent', agents):
+        coordinator.post(
+            url_for('api.start_cluster_job'),
+            json={'job': 'python', 'rate': 300}
+        )
+        res = coordinator.get(url_for('api.get_cluster_stats', job='python'))
+    stats = res.json['python']
+    assert stats['agents'] == 3
+    assert stats['processes'] == 6
+    assert stats['arrival']['sent'] == 30
+    latency = stats['latency']['scenario_a']['200']
+    assert latency['count'] == 3
+    assert latency['p50'] == pytest.approx(2.0, rel=0.01)
+
+
+def test_not_coordinator(client):
+    """
+    GIVEN a Dyno which is not a coordinator
+    WHEN an agent tries to register with it
+    THEN the request is refused
+    """
+    res = client.post(url_for('api.register_agent'), json={'url': AGENT_URLS[0]})  # noqa
+    assert res.status_code == 400
@@ -19,6 +19,9 @@
 """
 Tests for the Openbeans Dyno
 """
+import json
+import signal
+import time
 import dyno.app.api.control
 from unittest import mock
 from flask import url_for
@@ -31,7 +34,23 @@ def test_scenarios(client, scenarios):
     THEN it receives back a list of active scenarios
     """
     res = client.get(url_for('api.get_scenarios'))
-    assert res.json == {'scenarios': scenarios}
+    assert res.json['scenarios'] == scenarios
+    assert set(res.json['metadata']) == set(scenarios)
+    assert res.json['metadata']['dyno']['valid'] is True
+
+
+def test_start_unknown_scenario(client):
+    """
+    GIVEN an HTTP client
+    WHEN the client requests /api/start with a scenario which does not exist
+    THEN the request is refused without launching anything
+    """
+    query = {'job': 'test-job', 'port': '999', 'scenario': 'no_such_scenario'}
+    with mock.patch('dyno.app.api.control._launch_job') as job_launcher_mock:
+        res = client.post(url_for('api.start_job'), json=query)
+    assert res.status_code == 400
+    assert b'no_such_scenario' in res.data
+    job_launcher_mock.assert_not_called()
 
 
 def test_start(client):
@@ -43,7 +62,7 @@ def test_start(client):
     query = {
             'job': 'test-job',
             'port': '999',
-            'scenario': 'test_scenario',
+            'scenario': 'molotov_scenarios',
             'duration': '1234',
             'delay': '4321'
             }
@@ -56,7 +75,7 @@ def test_start(client):
                 'duration': '1234',
                 'delay': '4321',
                 'workers': '3',
-                'scenario': 'scenarios/test_scenario.py',
+                'scenario': 'scenarios/molotov_scenarios.py',
                 'error_weight': '0',
                 'app_latency_weight': '0',
                 'app_latency_label': 'dyno_latency',
@@ -66,6 +85,116 @@ def test_start(client):
     assert res.json == {}
 
 
+def test_start_shape(client):
+    """
+    GIVEN a job with a load shape
+    WHEN it is started through /api/start
+    THEN it starts with the shape and the time the shape starts at, and
+         a shape which is not valid is refused
+    """
+    shape = [{'type': 'ramp', 'to': 100, 'duration': 60}]
+    query = {'job': 'python', 'port': '999', 'shape': shape, 'start_at': 5.0}
+    with mock.patch('dyno.app.api.control._launch_job') as job_launcher_mock:
+        res = client.post(url_for('api.start_job'), json=query)
+        bad = client.post(url_for('api.start_job'), json=dict(
+            query, shape=[{'type': 'ramp', 'to': 100}]))
+    assert res.status_code == 200
+    config = job_launcher_mock.call_args[0][1]
+    assert config['shape'] == shape
+    assert config['shape_start'] == 5.0
+    assert job_launcher_mock.call_count == 1
+    assert bad.status_code == 400
+    assert b'duration' in bad.data
+
+
+def test_start_autotune(client):
+    """
+    GIVEN a job with an autotune SLO
+    WHEN it is started through /api/start
+    THEN it starts open-loop at the first rate of the search and the
+         search begins, and a search which is not valid is refused
+    """
+    query = {'job': 'python', 'port': '999',
+             'autotune': {'p99': 200, 'start_rate': 25}}
+    with mock.patch('dyno.app.api.control._launch_job') as job_launcher_mock, \
+            mock.patch('dyno.app.api.control._start_autotune') as tune_mock:
+        res = client.post(url_for('api.start_job'), json=query)
+        bad = client.post(url_for('api.start_job'), json=dict(
+            query, autotune={'p99': 200, 'factor': 0.5}))
+    assert res.status_code == 200
+    assert job_launcher_mock.call_args[0][1]['rate'] == 25.0
+    assert tune_mock.call_args[0][0] == 'python'
+    assert tune_mock.call_args[0][1]['p99'] == 200.0
+    assert bad.status_code == 400
+    assert b'factor' in bad.data
+
+
+def test_autotune_overridden(client, job_status):
+    """
+    GIVEN a running job whose rate is being tuned
+    WHEN the client sets its rate by hand, or the job is stopped
+    THEN the search is cancelled and no longer reported as running
+    """
+    job_status['python'].update(running=True, max_workers=32, workers=3)
+    proc_mock = mock.Mock()
+    proc_mock.poll.return_value = None
+    with mock.patch.dict('dyno.app.api.control.JOB_STATUS', job_status), \
+            mock.patch.dict('dyno.app.api.control.JOB_MANAGER', {'python': proc_mock}), \
+            mock.patch('dyno.app.api.control._can_reload', return_value=True), \
+            mock.patch('dyno.app.api.control._write_job_config'):  # noqa
+        for request in ({'job': 'python', 'rate': 40}, None):
+            tuner = mock.Mock()
+            with mock.patch.dict('dyno.app.api.control.AUTOTUNE', {'python': tuner}):  # noqa
+                if request is None:
+                    with mock.patch('dyno.app.api.control.SUPERVISOR'):
+                        dyno.app.api.control._stop_job('python')
+                else:
+                    client.post(url_for('api.update_job'), json=request)
+                tuner.cancel.assert_called_once_with()
+                assert 'python' not in dyno.app.api.control.AUTOTUNE
+    assert job_status['python']['rate'] == 40
+
+
+def test_get_autotune(client, tmp_path):
+    """
+    GIVEN a job whose autotune search is over
+    WHEN a client requests the /autotune endpoint
+    THEN it receives the saved curve, and a job which was never tuned
+         is not found
+    """
+    (tmp_path / 'python').mkdir()
+    (tmp_path / 'python' / 'autotune.json').write_text(
+        '{"state": "done", "knee": 120.0, "curve": []}')
+    with mock.patch('dyno.app.api.control.RUNTIME_DIR', str(tmp_path)):
+        res = client.get(url_for('api.get_autotune', job='opbeans-python'))
+        missing = client.get(url_for('api.get_autotune', job='go'))
+    assert res.status_code == 200
+    assert res.json['knee'] == 120.0
+    assert missing.status_code == 404
+
+
+def test_list_shape(client, job_status):
+    """
+    GIVEN a running job with a load shape
+    WHEN a client requests the /list endpoint
+    THEN the job shows the rate it is sending at and its phase
+    """
+    job_status['python'].update(
+        running=True,
+        shape=[{'type': 'constant', 'rate': 10, 'duration': 30},
+               {'type': 'ramp', 'from': 10, 'to': 110, 'duration': 100}],
+        shape_start=time.time() - 80,
+        shape_scale=0.5,
+    )
+    with mock.patch.dict('dyno.app.api.control.JOB_STATUS', job_status):
+        res = client.get(url_for('api.get_list'))
+    status = res.json['python']
+    assert 29 <= status['target_rate'] <= 31
+    assert status['phase']['index'] == 1
+    assert status['phase']['type'] == 'ramp'
+    assert 49 <= status['phase']['elapsed'] <= 51
+
+
 def test_update_no_job(client):
     """
     GIVEN a request that does not specify a job
@@ -128,27 +257,135 @@ def test_stop(client):
     WHEN the client requests /api/stop with arguments
     THEN the request to stop the job is fufilled
     """
-    pid_mock = mock.patch('os.getpgid', return_value='999')
     proc_mock = mock.create_autospec('subprocess.Popen')
     proc_mock.pid = 99999
     query = {'job': 'test-job'}
-    with mock.patch('socketio.client.Client.emit') as fake_socketio:
+    with mock.patch('dyno.app.api.control.BUS.publish') as fake_socketio:
         with mock.patch.dict('dyno.app.api.control.JOB_STATUS', {'test-job': {'running': False}}):  # noqa
             with mock.patch.dict('dyno.app.api.control.JOB_MANAGER', {'test-job': proc_mock}):  # noqa
-                with pid_mock:
-                    with mock.patch('os.killpg') as kill_mock:
-                        res = client.get(
-                            url_for('api.stop_job'),
-                            query_string=query
-                            )
+                with mock.patch('os.killpg') as kill_mock:
+                    res = client.get(
+                        url_for('api.stop_job'),
+                        query_string=query
+                        )
     fake_socketio.assert_called_with(
         'service_state',
-        {'data': {'test-job': 'stop'}}
+        {'data': {'test-job': 'stop'}},
+        key='test-job'
         )
-    kill_mock.assert_called()
+    kill_mock.assert_called_with(99999, signal.SIGTERM)
     assert res.json == {}
 
 
+def test_restart_updated(job_status):
+    """
+    GIVEN a job which was updated since it was started with restart
+    WHEN it crashes and the supervisor restarts it
+    THEN it is launched again with its updated configuration
+    """
+    config = dict(job_status['python'], restart=True)
+    job_status['python'].update(restart=True, running=True, rate=50,
+                                exit_code=1, restarts=1)
+    with mock.patch.dict('dyno.app.api.control.JOB_STATUS', job_status):
+        with mock.patch('dyno.app.api.control.SUPERVISOR') as supervisor:
+            with mock.patch('dyno.app.api.control._launch_job') as launch_mock:  # noqa
+                dyno.app.api.control._watch_job('python', mock.Mock(), config)
+                restart = supervisor.watch.call_args[0][2]
+                restart()
+    relaunched = launch_mock.call_args[0][1]
+    assert relaunched['rate'] == 50
+    assert 'running' not in relaunched
+    assert 'exit_code' not in relaunched
+
+
+def test_start_running(client):
+    """
+    GIVEN a job which is running
+    WHEN the client starts it again
+    THEN the running process is stopped before the new one is launched
+    """
+    query = {'job': 'python', 'port': '999'}
+    calls = []
+    with mock.patch.dict('dyno.app.api.control.JOB_MANAGER', {'python': mock.Mock()}):  # noqa
+        with mock.patch('dyno.app.api.control._stop_job', side_effect=lambda job: calls.append('stop')):  # noqa
+            with mock.patch('dyno.app.api.control._launch_job', side_effect=lambda job, config: calls.append('launch')):  # noqa
+                res = client.post(url_for('api.start_job'), json=query)
+    assert res.status_code == 200
+    assert calls == ['stop', 'launch']
+
+
+def test_batch(client, job_status):
+    """
+    GIVEN an HTTP client
+    WHEN the client requests /api/jobs/batch with several jobs
+    THEN every job is started, updated or stopped and its outcome is
+         reported
+    """
+    body = {'jobs': [
+        {'job': 'opbeans-go', 'port': '8000', 'rate': 50},
+        {'job': 'python', 'action': 'update', 'workers': 2},
+        {'job': 'opbeans-ruby', 'action': 'stop'},
+    ]}
+    with mock.patch.dict('dyno.app.api.control.JOB_STATUS', job_status):
+        with mock.patch('dyno.app.api.control._launch_job') as launch_mock:
+            with mock.patch('dyno.app.api.control._stop_job') as stop_mock:
+                with mock.patch('dyno.app.api.control._update_status'):
+                    res = client.post(url_for('api.batch_jobs'), json=body)
+    assert res.status_code == 200
+    assert res.json == {
+        'opbeans-go': {'status': 200},
+        'python': {'status': 200},
+        'opbeans-ruby': {'status': 200},
+    }
+    launched = {c[0][0]: c[0][1] for c in launch_mock.call_args_list}
+    assert launched['go']['rate'] == 50
+    assert launched['python']['workers'] == 2
+    stop_mock.assert_has_calls([mock.call('python'), mock.call('ruby')],
+                               any_order=True)
+
+
+def test_batch_parallel(client):
+    """
+    GIVEN jobs which each take a while to launch
+    WHEN they are started in one batch
+    THEN they are launched at the same time, and a failed launch only
+         fails its own job
+    """
+    def launch(job, config):
+        time.sleep(0.5)
+        if job == 'node':
+            raise dyno.app.api.control.EngineError('engine is down')
+
+    body = {'jobs': [{'job': 'opbeans-' + name, 'port': '8000'}
+                     for name in ('go', 'java', 'node', 'python', 'ruby')]}
+    with mock.patch('dyno.app.api.control._launch_job', side_effect=launch):
+        started = time.monotonic()
+        res = client.post(url_for('api.batch_jobs'), json=body)
+        elapsed = time.monotonic() - started
+    assert elapsed < 1.5
+    assert res.status_code == 207
+    assert res.json['opbeans-node'] == {'status': 503, 'error': 'engine is down'}
+    assert res.json['opbeans-go'] == {'status': 200}
+
+
+def test_batch_invalid(client):
+    """
+    GIVEN a batch which names a job twice or has an unknown action
+    WHEN it is sent to /api/jobs/batch
+    THEN it is refused and no job is touched
+    """
+    with mock.patch('dyno.app.api.control._launch_job') as launch_mock:
+        twice = client.post(url_for('api.batch_jobs'), json={'jobs': [
+            {'job': 'opbeans-go'}, {'job': 'go', 'action': 'stop'}]})
+        unknown = client.post(url_for('api.batch_jobs'), json={'jobs': [
+            {'job': 'go', 'action': 'restart'}]})
+        empty = client.post(url_for('api.batch_jobs'), json={})
+    assert twice.status_code == 400
+    assert unknown.status_code == 400
+    assert empty.status_code == 400
+    launch_mock.assert_not_called()
+
+
 def test_list(client, job_status):
     """
     GIVEN an abritrary set of job
@@ -159,7 +396,7 @@ def test_list(client, job_status):
     assert ret.json == {}
 
 
-@mock.patch('socketio.client.Client.emit')
+@mock.patch('dyno.app.api.control.BUS.publish')
 @mock.patch('dyno.app.api.control._construct_toxi_env')
 @mock.patch('dyno.app.api.control._update_status')
 @mock.patch('subprocess.Popen')
@@ -189,9 +426,10 @@ def test_launch_job(
             'app_latency_upper_bound': 70
             }
         )
-    assert socketio_mock.called_with(
+    socketio_mock.assert_called_with(
         'service_state',
-        {'data': {'python': 'start'}}
+        {'data': {'python': 'start'}},
+        key='python'
     )
     assert toxi_env_mock.called_with('python', '990', 'fake_scenario', '994')
     assert update_status_mock.called_with(
@@ -216,9 +454,6 @@ def test_launch_job(
             '--uvloop',
             '--workers',
             '993',
-            '--statsd',
-            '--statsd-address',
-            'udp://stats-d:8125',
             'fake_scenario'
             ]
     [0]
@@ -242,3 +477,300 @@ def test_construct_toxi_env():
             'OPBEANS_NAME': 'opbeans-fake-job',
             'ERROR_WEIGHT': '99'
             }
+
+
+def test_update_running(client, job_status):
+    """
+    GIVEN a running job which was started with spare workers
+    WHEN the client requests /api/update with a new configuration
+    THEN the configuration is handed to the running job without a restart
+    """
+    job_status['python']['running'] = True
+    job_status['python']['max_workers'] = 32
+    proc_mock = mock.Mock()
+    proc_mock.poll.return_value = None
+    post_data = {'job': 'python', 'workers': 10, 'error_weight': 3}
+    with mock.patch.dict('dyno.app.api.control.JOB_STATUS', job_status):
+        with mock.patch.dict('dyno.app.api.control.JOB_MANAGER', {'python': proc_mock}):  # noqa
+            with mock.patch('dyno.app.api.control._stop_job') as stop_job_mock:
+                with mock.patch('dyno.app.api.control._launch_job') as launch_job_mock:  # noqa
+                    with mock.patch('dyno.app.api.control._write_job_config') as write_mock:  # noqa
+                        client.post(url_for('api.update_job'), json=post_data)
+
+    stop_job_mock.assert_not_called()
+    launch_job_mock.assert_not_called()
+    write_mock.assert_called_once()
+    assert write_mock.call_args[0][1]['workers'] == 10
+    assert write_mock.call_args[0][1]['error_weight'] == 3
+
+
+def test_update_ids(client, job_status):
+    """
+    GIVEN a running job
+    WHEN the client requests /api/update with distributions for its IDs
+    THEN valid distributions are handed to the running job, and
+         invalid ones are refused
+    """
+    job_status['python']['running'] = True
+    job_status['python']['max_workers'] = 32
+    job_status['python']['workers'] = 10
+    proc_mock = mock.Mock()
+    proc_mock.poll.return_value = None
+    ids = {'distribution': 'zipf', 'exponent': 1.2,
+           'scenarios': {'scenario_orders_id': 'sequential'}}
+    with mock.patch.dict('dyno.app.api.control.JOB_STATUS', job_status):
+        with mock.patch.dict('dyno.app.api.control.JOB_MANAGER', {'python': proc_mock}):  # noqa
+            with mock.patch('dyno.app.api.control._stop_job') as stop_job_mock:
+                with mock.patch('dyno.app.api.control._write_job_config') as write_mock:  # noqa
+                    res = client.post(url_for('api.update_job'),
+                                      json={'job': 'python', 'ids': ids})
+                    bad = client.post(url_for('api.update_job'), json={
+                        'job': 'python', 'ids': {'distribution': 'pareto'}})
+
+    assert res.status_code == 200
+    assert bad.status_code == 400
+    assert b'Unknown distribution' in bad.data
+    stop_job_mock.assert_not_called()
+    write_mock.assert_called_once()
+    assert write_mock.call_args[0][1]['ids'] == ids
+
+
+def test_stats(client, tmp_path):
+    """
+    GIVEN a job whose processes have written stats snapshots
+    WHEN the client requests /api/stats for the job
+    THEN it receives the merged counters
+    """
+    job_dir = tmp_path / 'python'
+    job_dir.mkdir()
+    (job_dir / 'stats-1.json').write_text(
+        '{"pid": 1, "started": 1, "ts": 2, "connections": {"reused": 3}}')
+    (job_dir / 'stats-2.json').write_text(
+        '{"pid": 2, "started": 1, "ts": 3, "connections": {"reused": 4}}')
+    with mock.patch('dyno.app.api.control.RUNTIME_DIR', str(tmp_path)):
+        res = client.get(
+            url_for('api.get_stats'),
+            query_string={'job': 'opbeans-python'}
+            )
+    assert res.json['python']['connections'] == {'reused': 7}
+    assert res.json['python']['processes'] == 2
+
+
+def test_time_to_first_request(client, tmp_path):
+    """
+    GIVEN a job whose processes have sent their first requests
+    WHEN the client requests /api/stats for the job
+    THEN it receives the time from launching the job to its first request
+    """
+    job_dir = tmp_path / 'python'
+    job_dir.mkdir()
+    (job_dir / 'stats-1.json').write_text(
+        '{"pid": 1, "started": 100.5, "ts": 110, "first_request": 101.25}')
+    (job_dir / 'stats-2.json').write_text(
+        '{"pid": 2, "started": 100.5, "ts": 110, "first_request": 100.75}')
+    with mock.patch('dyno.app.api.control.RUNTIME_DIR', str(tmp_path)):
+        with mock.patch.dict('dyno.app.api.control.JOB_STATUS', {'python': {'launched': 100.0}}):  # noqa
+            res = client.get(
+                url_for('api.get_stats'),
+                query_string={'job': 'opbeans-python'}
+                )
+    assert res.json['python']['time_to_first_request'] == 0.75
+
+
+@mock.patch('dyno.app.api.control.BUS.publish')
+@mock.patch('dyno.app.api.control._update_status')
+@mock.patch('subprocess.Popen')
+def test_launch_job_pool(proc_mock, update_status_mock, socketio_mock, tmp_path):  # noqa
+    """
+    GIVEN a job configuration with connection pool settings
+    WHEN the job is launched
+    THEN the settings are passed to the job in its environment
+    """
+    with mock.patch('dyno.app.api.control.RUNTIME_DIR', str(tmp_path)):
+        dyno.app.api.control._launch_job(
+            'python',
+            {
+                'port': '990',
+                'duration': '991',
+                'delay': '992',
+                'workers': '3',
+                'scenario': 'fake_scenario',
+                'error_weight': '0',
+                'pool_size': 50,
+                'keepalive_timeout': 30,
+                }
+            )
+    env = proc_mock.call_args[1]['env']
+    assert env['LOADGEN_POOL_SIZE'] == '50'
+    assert env['LOADGEN_KEEPALIVE_TIMEOUT'] == '30'
+    assert 'LOADGEN_DNS_TTL' not in env
+    assert env['LOADGEN_STATSD_ADDRESS'] == 'udp://stats-d:8125'
+
+
+@mock.patch('dyno.app.api.control.BUS.publish')
+@mock.patch('dyno.app.api.control._update_status')
+@mock.patch('subprocess.Popen')
+def test_launch_job_engine(proc_mock, update_status_mock, socketio_mock, tmp_path):  # noqa
+    """
+    GIVEN a job configuration for the engine mode
+    WHEN the job is launched and then stopped
+    THEN it is started and stopped in the engine without a new process
+    """
+    client_mock = mock.Mock()
+    with mock.patch('dyno.app.api.control.RUNTIME_DIR', str(tmp_path)):
+        with mock.patch('dyno.app.api.control._engine_client', return_value=client_mock):  # noqa
+            with mock.patch.dict('dyno.app.api.control.JOB_MANAGER', {}):
+                dyno.app.api.control._launch_job(
+                    'python',
+                    {
+                        'port': '990',
+                        'duration': '991',
+                        'delay': '0.5',
+                        'workers': '3',
+                        'scenario': 'fake_scenario',
+                        'error_weight': '0',
+                        'mode': 'engine',
+                        }
+                    )
+                dyno.app.api.control._stop_job('python')
+    proc_mock.assert_not_called()
+    args, kwargs = client_mock.start.call_args
+    assert args == ('python',)
+    assert kwargs['scenario'] == 'fake_scenario'
+    assert kwargs['delay'] == 0.5
+    assert kwargs['env']['OPBEANS_BASE_URL'].endswith(':990')
+    client_mock.stop.assert_called_with('python')
+
+
+@mock.patch('dyno.app.api.control.BUS.publish')
+@mock.patch('dyno.app.api.control._update_status')
+@mock.patch('dyno.app.api.control.ShardGroup')
+def test_launch_job_sharded(group_mock, update_status_mock, socketio_mock, tmp_path):  # noqa
+    """
+    GIVEN a job configuration with several processes
+    WHEN the job is launched
+    THEN one group of shards is started and tracked as one job
+    """
+    with mock.patch('dyno.app.api.control.RUNTIME_DIR', str(tmp_path)):
+        with mock.patch.dict('dyno.app.api.control.JOB_MANAGER', {}):
+            dyno.app.api.control._launch_job(
+                'python',
+                {
+                    'port': '990',
+                    'duration': '991',
+                    'delay': '0.5',
+                    'workers': '3',
+                    'scenario': 'fake_scenario',
+                    'error_weight': '0',
+                    'processes': 4,
+                    'pin': True,
+                    }
+                )
+            assert dyno.app.api.control.JOB_MANAGER['python'] is group_mock.return_value  # noqa
+    args, kwargs = group_mock.call_args
+    assert args[1] == 4
+    assert kwargs['pin'] is True
+
+
+@mock.patch('dyno.app.api.control.BUS.publish')
+@mock.patch('dyno.app.api.control._update_status')
+@mock.patch('subprocess.Popen')
+def test_launch_job_warm(proc_mock, update_status_mock, socketio_mock, tmp_path):  # noqa
+    """
+    GIVEN a sharded job configuration for the warm mode
+    WHEN the job is launched
+    THEN every shard is forked by the zygote into the group of the first
+    """
+    client_mock = mock.Mock()
+    client_mock.spawn.side_effect = [100, 101]
+    with mock.patch('dyno.app.api.control.RUNTIME_DIR', str(tmp_path)):
+        with mock.patch('dyno.app.api.control._zygote_client', return_value=client_mock):  # noqa
+            with mock.patch.dict('dyno.app.api.control.JOB_MANAGER', {}):
+                with mock.patch('dyno.app.api.control.SUPERVISOR'):
+                    dyno.app.api.control._launch_job(
+                        'python',
+                        {
+                            'port': '990',
+                            'duration': '991',
+                            'delay': '0.5',
+                            'workers': '3',
+                            'scenario': 'fake_scenario',
+                            'error_weight': '0',
+                            'mode': 'warm',
+                            'processes': 2,
+                            }
+                        )
+                    job = dyno.app.api.control.JOB_MANAGER['python']
+    proc_mock.assert_not_called()
+    assert job.pids == [100, 101]
+    first, second = client_mock.spawn.call_args_list
+    assert first[0][0][-1] == 'fake_scenario'
+    assert first[1]['leader'] is None
+    assert second[1]['leader'] == 100
+    assert second[0][1]['LOADGEN_SHARD'] == '1'
+
+
+@mock.patch('dyno.app.api.control.BUS.publish')
+@mock.patch('dyno.app.api.control._update_status')
+@mock.patch('subprocess.Popen')
+def test_launch_job_replay(proc_mock, update_status_mock, socketio_mock, client, tmp_path):  # noqa
+    """
+    GIVEN a scenario which is a JSONL capture
+    WHEN a job is started with it
+    THEN Molotov runs the replay scenario file with the capture and its
+         speed in the job configuration
+    """
+    query = {'job': 'python', 'port': '990', 'scenario': 'recorded_sample',
+             'replay_speed': 4, 'replay_loop': 'false'}
+    with mock.patch('dyno.app.api.control.RUNTIME_DIR', str(tmp_path)):
+        with mock.patch.dict('dyno.app.api.control.JOB_MANAGER', {}):
+            res = client.post(url_for('api.start_job'), json=query)
+    assert res.status_code == 200
+    cmd = proc_mock.call_args[0][0]
+    env = proc_mock.call_args[1]['env']
+    assert cmd[-1] == 'loadgen/replay_scenario.py'
+    assert env['LOADGEN_REPLAY_FILE'] == 'scenarios/recorded_sample.jsonl'
+    config = json.loads((tmp_path / 'python' / 'config.json').read_text())
+    assert config['replay_speed'] == 4
+    assert config['replay_loop'] is False
+
+
+@mock.patch('dyno.app.api.control.BUS.publish')
+@mock.patch('dyno.app.api.control._update_status')
+@mock.patch('subprocess.Popen')
+def test_launch_job_spec(proc_mock, update_status_mock, socketio_mock, client, tmp_path):  # noqa
+    """
+    GIVEN a scenario which is a declarative spec
+    WHEN a job is started with it
+    THEN Molotov runs the spec scenario file with the spec
+    """
+    query = {'job': 'python', 'port': '990', 'scenario': 'opbeans_spec'}
+    with mock.patch('dyno.app.api.control.RUNTIME_DIR', str(tmp_path)):
+        with mock.patch.dict('dyno.app.api.control.JOB_MANAGER', {}):
+            res = client.post(url_for('api.start_job'), json=query)
+    assert res.status_code == 200
+    cmd = proc_mock.call_args[0][0]
+    env = proc_mock.call_args[1]['env']
+    assert cmd[-1] == 'loadgen/spec_scenario.py'
+    assert env['LOADGEN_SPEC_FILE'] == 'scenarios/opbeans_spec.json'
+
+
+@mock.patch('dyno.app.api.control.BUS.publish')
+@mock.patch('dyno.app.api.control._update_status')
+@mock.patch('subprocess.Popen')
+def test_start_seed(proc_mock, update_status_mock, socketio_mock, client, tmp_path):  # noqa
+    """
+    GIVEN a seed for a job
+    WHEN the job is started with it
+    THEN the job is handed the seed, and a seed which is not an integer
+         is refused
+    """
+    query = {'job': 'python', 'port': '990', 'scenario': 'dyno', 'seed': 42}
+    with mock.patch('dyno.app.api.control.RUNTIME_DIR', str(tmp_path)):
+        with mock.patch.dict('dyno.app.api.control.JOB_MANAGER', {}):
+            res = client.post(url_for('api.start_job'), json=query)
+            bad = client.post(url_for('api.start_job'), json=dict(
+                query, job='go', seed='forty-two'))
+    assert res.status_code == 200
+    assert proc_mock.call_args[1]['env']['OPBEANS_SEED'] == '42'
+    assert bad.status_code == 400
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the in-process load engine
+"""
+import asyncio
+import os
+from unittest import mock
+
+from aiohttp import web
+from loadgen.engine import Engine, main
+
+SCENARIO = os.path.join(os.path.dirname(__file__), '../../scenarios/dyno.py')
+
+
+async def _run_jobs(engine):
+    hits = {}
+
+    async def handler(request):
+        name = request.headers.get('Host')
+        hits[name] = hits.get(name, 0) + 1
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        for job, host in (('python', '127.0.0.1'), ('java', 'localhost')):
+            env = dict(
+                os.environ,
+                OPBEANS_BASE_URL='http://{}:{}'.format(host, port),
+                OPBEANS_NAME='opbeans-' + job,
+            )
+            response = await engine.dispatch({
+                'op': 'start',
+                'job': job,
+                'scenario': SCENARIO,
+                'env': env,
+                'workers': 2,
+                'delay': 0.01,
+                'duration': 0.5,
+            })
+            assert response == {'ok': True}
+        await asyncio.sleep(0.2)
+        jobs = (await engine.dispatch({'op': 'list'}))['jobs']
+        assert jobs['python']['running'] and jobs['java']['running']
+        await engine.dispatch({'op': 'stop', 'job': 'java'})
+        await asyncio.sleep(0.5)
+    finally:
+        await runner.cleanup()
+    return hits
+
+
+def test_many_targets():
+    """
+    GIVEN an engine
+    WHEN two jobs against different targets are started and one is stopped
+    THEN both targets receive load from the one process
+    AND the stopped job is removed while the other runs to its duration
+    """
+    engine = Engine()
+    loop = asyncio.new_event_loop()
+    try:
+        hits = loop.run_until_complete(_run_jobs(engine))
+    finally:
+        loop.close()
+    assert len(hits) == 2
+    assert list(engine.jobs) == ['python']
+    assert not engine.jobs['python'].running
+    assert engine.jobs['python'].counters['ok'] > 0
+
+
+def test_bad_request():
+    """
+    GIVEN an engine
+    WHEN it is asked to start a job from a missing scenario file
+    THEN it answers with an error and keeps running
+    """
+    engine = Engine()
+    loop = asyncio.new_event_loop()
+    try:
+        response = loop.run_until_complete(engine.dispatch({
+            'op': 'start', 'job': 'python', 'scenario': 'missing.py'}))
+    finally:
+        loop.close()
+    assert response['ok'] is False
+    assert engine.jobs == {}
+
+
+def test_job_env():
+    """
+    GIVEN jobs given on the command line, one with settings of its own
+    WHEN the engine starts
+    THEN only that job is started with its settings
+    """
+    loop = asyncio.new_event_loop()
+    with mock.patch.object(Engine, 'start_job', mock.AsyncMock()) as start, \
+            mock.patch.object(Engine, 'serve', mock.AsyncMock()), \
+            mock.patch('asyncio.run', loop.run_until_complete):
+        main([
+            '--no-uvloop',
+            '--job', 'opbeans-python', 'http://opbeans-python:3000', '0', '60',
+            '--job', 'opbeans-java', 'http://opbeans-java:4000', '0.6', '60',
+            '--env', 'opbeans-python', 'ARRIVAL_RATE=10',
+        ])
+    loop.close()
+    envs = {call[0][0]: call[1]['env'] for call in start.call_args_list}
+    assert envs['opbeans-python']['ARRIVAL_RATE'] == '10'
+    assert envs['opbeans-python']['OPBEANS_BASE_URL'] == \
+        'http://opbeans-python:3000'
+    assert envs['opbeans-java'].get('ARRIVAL_RATE') == \
+        os.environ.get('ARRIVAL_RATE')
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the delivery of events to Socket.IO clients
+"""
+from unittest import mock
+
+from dyno.app.events import EventBus
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _bus():
+    clock = FakeClock()
+    bus = EventBus(interval=1.0, clock=clock)
+    bus.socketio = mock.Mock()
+    return bus, clock
+
+
+def test_publish_does_not_send():
+    """
+    GIVEN an event bus
+    WHEN an event is published
+    THEN nothing is sent until the bus is flushed
+    """
+    bus, _ = _bus()
+    bus.publish('service_state', {'data': {'python': 'start'}}, key='python')
+    bus.socketio.emit.assert_not_called()
+    assert bus.flush() == 1
+    bus.socketio.emit.assert_called_once_with(
+        'service_state',
+        {'data': {'python': 'start'}},
+        room=None
+    )
+
+
+def test_coalesce():
+    """
+    GIVEN several events of the same name and key
+    WHEN the bus is flushed
+    THEN only the latest of them is sent, and events with other keys
+         are kept
+    """
+    bus, _ = _bus()
+    bus.publish('service_state', {'data': {'python': 'start'}}, key='python')
+    bus.publish('service_state', {'data': {'python': 'stop'}}, key='python')
+    bus.publish('service_state', {'data': {'go': 'start'}}, key='go')
+    assert bus.flush() == 2
+    sent = [c[0][1] for c in bus.socketio.emit.call_args_list]
+    assert sent == [{'data': {'python': 'stop'}}, {'data': {'go': 'start'}}]
+
+
+def test_rate_limit_per_room():
+    """
+    GIVEN a room which was just sent an event
+    WHEN more events are published before the interval has passed
+    THEN they wait for the interval, while other rooms are sent theirs
+    """
+    bus, clock = _bus()
+    bus.publish('stats', {'rps': 1}, room='python')
+    bus.flush()
+    clock.now = 0.5
+    bus.publish('stats', {'rps': 2}, room='python')
+    bus.publish('stats', {'rps': 3}, room='go')
+    assert bus.flush() == 1
+    bus.socketio.emit.assert_called_with('stats', {'rps': 3}, room='go')
+    clock.now = 1.0
+    assert bus.flush() == 1
+    bus.socketio.emit.assert_called_with('stats', {'rps': 2}, room='python')
+    assert bus.sent == 3
+
+
+def test_merge():
+    """
+    GIVEN a pending event which holds only the fields that changed
+    WHEN another such event is published before the room is sent
+    THEN the two are merged into one event
+    """
+    bus, _ = _bus()
+    bus.publish('stats', {'seq': 1, 'rps': 1, 'p50': 2}, room='go', key='go',
+                merge=True)
+    bus.publish('stats', {'seq': 2, 'rps': 3}, room='go', key='go',
+                merge=True)
+    bus.flush()
+    bus.socketio.emit.assert_called_once_with(
+        'stats', {'seq': 2, 'rps': 3, 'p50': 2}, room='go')
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the log-linear latency histograms
+"""
+import random
+from loadgen import histogram, report
+from loadgen.histogram import Histogram
+
+
+def test_precision():
+    """
+    GIVEN values spread over every order of magnitude
+    WHEN each is recorded on its own
+    THEN its reported value is within 1/64 of the true value
+    """
+    for value in [1, 127, 128, 1000, 65535, 10 ** 6, 3 * 10 ** 9]:
+        hist = Histogram()
+        hist.record(value)
+        assert abs(hist.percentile(50) - value) <= value / 64.0
+
+
+def test_constant_size():
+    """
+    GIVEN a histogram
+    WHEN values up to and beyond the largest bucket are recorded
+    THEN the histogram does not grow
+    """
+    hist = Histogram()
+    for value in [0, 1, histogram.MAX_VALUE, histogram.MAX_VALUE * 10]:
+        hist.record(value)
+    assert len(hist.counts) == histogram.SIZE
+    assert hist.count == 4
+
+
+def test_merge():
+    """
+    GIVEN two histograms recorded in different processes
+    WHEN their snapshots are merged and summarized
+    THEN the percentiles are those of a single histogram of all values
+    """
+    rng = random.Random(1)
+    values = [int(rng.expovariate(1 / 5000.0)) for _ in range(10000)]
+    whole = Histogram()
+    parts = [Histogram(), Histogram()]
+    for i, value in enumerate(values):
+        whole.record(value)
+        parts[i % 2].record(value)
+    merged = report.merge([{'h': p.snapshot()} for p in parts])['h']
+    assert Histogram.from_snapshot(merged).counts == whole.counts
+    summary = histogram.summarize(merged, 10.0)
+    assert summary['count'] == 10000
+    assert summary['throughput'] == 1000.0
+    assert summary['p50'] == whole.percentile(50) / 1000.0
+    assert summary['p99.9'] == whole.percentile(99.9) / 1000.0
+
+
+def test_difference():
+    """
+    GIVEN two snapshots of the same histogram taken a while apart
+    WHEN their difference is taken
+    THEN it holds only the values recorded in between
+    """
+    hist = Histogram()
+    for value in [1000] * 10:
+        hist.record(value)
+    earlier = hist.snapshot()
+    for value in [5000] * 4:
+        hist.record(value)
+    delta = Histogram.from_snapshot(
+        histogram.difference(hist.snapshot(), earlier))
+    assert delta.count == 4
+    assert delta.total == 20000
+    assert delta.percentile(50) == histogram.value_of(
+        histogram.index_of(5000))
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for live reconfiguration of scenarios
+"""
+import os
+import time
+from loadgen import live
+from loadgen.table import ScenarioTable, IDLE_SCENARIO, WAIT_SCENARIO
+
+
+def _table(config):
+    table = ScenarioTable(config)
+
+    @table.scenario(weight=1)
+    async def scenario_live_static(session):
+        pass
+
+    @table.scenario(weight=0, tunable='error_weight')
+    async def scenario_live_tunable(session):
+        pass
+    return table
+
+
+def test_refresh(tmp_path):
+    """
+    GIVEN a live configuration watching a file
+    WHEN the file is rewritten
+    THEN the new values are loaded on the next refresh
+    """
+    path = os.path.join(str(tmp_path), 'job', 'config.json')
+    live.write(path, {'error_weight': 1})
+    config = live.LiveConfig(path, {'error_weight': 0, 'workers': None}, interval=0)  # noqa
+    assert config.refresh()
+    assert config['error_weight'] == 1
+    assert not config.refresh()
+
+    live.write(path, {'error_weight': 5})
+    os.utime(path, ns=(0, 0))
+    assert config.refresh()
+    assert config['error_weight'] == 5
+    assert config.version == 2
+
+
+def test_tunable_weight():
+    """
+    GIVEN a scenario whose weight is tied to a configuration key
+    WHEN the key changes
+    THEN the scenario is picked according to the new weight
+    """
+    config = live.LiveConfig(defaults={'error_weight': 0})
+    table = _table(config)
+    picks = {table.pick(0, i) for i in range(100)}
+    assert picks == {'scenario_live_static'}
+
+    config.update({'error_weight': 1000000})
+    picks = [table.pick(0, i) for i in range(100)]
+    assert picks.count('scenario_live_tunable') > 90
+
+
+def test_idle_workers():
+    """
+    GIVEN a configuration with fewer workers than Molotov started
+    WHEN a worker above that count picks a scenario
+    THEN it is given the idle scenario
+    """
+    config = live.LiveConfig(defaults={'workers': 2})
+    table = _table(config)
+    assert table.pick(1, 0) == 'scenario_live_static'
+    assert table.pick(2, 0) == IDLE_SCENARIO
+
+    config.update({'workers': 3})
+    assert table.pick(2, 0) == 'scenario_live_static'
+
+
+def test_start_at():
+    """
+    GIVEN a configuration with a start time in the future
+    WHEN a worker picks a scenario
+    THEN it waits until the start time has passed
+    """
+    config = live.LiveConfig(defaults={'start_at': time.time() + 60})
+    table = _table(config)
+    assert table.pick(0, 0) == WAIT_SCENARIO
+
+    config.update({'start_at': time.time() - 1})
+    assert table.pick(0, 0) == 'scenario_live_static'
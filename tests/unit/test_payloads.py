@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the pools of pre-encoded request bodies
+"""
+import asyncio
+import io
+import json
+import random
+
+from aiohttp import FormData
+from werkzeug.formparser import parse_form_data
+
+from loadgen import live
+from loadgen.payloads import (
+    BOUNDARY,
+    CSV_HEADERS,
+    csv_orders,
+    json_orders,
+    order_csv,
+)
+from loadgen.table import ScenarioTable
+
+
+class Buffer(object):
+    def __init__(self):
+        self.data = b''
+
+    async def write(self, data):
+        self.data += data
+
+
+def _form_data(customer_id, csv):
+    """
+    Encode an order the way the scenarios did before the pools
+    """
+    data = FormData()
+    data.add_field('customer', str(customer_id))
+    data.add_field(
+        'file',
+        io.BytesIO(csv),
+        filename='data.csv',
+        content_type='text/plain'
+    )
+    writer = data()
+    buf = Buffer()
+    asyncio.get_event_loop().run_until_complete(writer.write(buf))
+    return buf.data.replace(writer.boundary.encode(), BOUNDARY.encode())
+
+
+def test_json_orders():
+    """
+    GIVEN a pool of JSON orders
+    WHEN the bodies are decoded
+    THEN each is a valid order
+    """
+    pool = json_orders(size=50, seed=1)
+    assert len(pool) == 50
+    for body in pool.bodies:
+        order = json.loads(body)
+        assert 1 <= order['customer_id'] <= 1000
+        assert 1 <= len(order['lines']) <= 5
+        for line in order['lines']:
+            assert 1 <= line['id'] <= 6
+            assert 1 <= line['amount'] <= 4
+
+
+def test_csv_orders_match_form_data():
+    """
+    GIVEN a multipart order from the pool
+    WHEN it is compared with the same order encoded by aiohttp
+    THEN the bodies are the same, and a server reads the customer and
+         the CSV file from it
+    """
+    rng = random.Random(3)
+    body = order_csv(random.Random(3))
+    customer_id = rng.randint(1, 1000)
+    lines = [(rng.randint(1, 6), rng.randint(1, 4))
+             for _ in range(rng.randint(1, 5))]
+    csv = '\n'.join('{},{}'.format(*line) for line in lines).encode()
+    assert body == _form_data(customer_id, csv)
+
+    _, form, files = parse_form_data({
+        'REQUEST_METHOD': 'POST',
+        'CONTENT_TYPE': CSV_HEADERS['Content-Type'],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    })
+    assert form['customer'] == str(customer_id)
+    assert files['file'].filename == 'data.csv'
+    assert files['file'].read() == csv
+
+
+def test_cycle_and_reseed():
+    """
+    GIVEN a pool
+    WHEN bodies are taken from it and it is reseeded
+    THEN it hands out its bodies in turn, the same seed builds the same
+         bodies and another seed builds other bodies
+    """
+    pool = csv_orders(size=3, seed=7)
+    taken = [pool.next() for _ in range(6)]
+    assert taken == list(pool.bodies) * 2
+    first = pool.bodies
+    pool.reseed(8)
+    assert pool.bodies != first
+    assert pool.next() == pool.bodies[0]
+    pool.reseed(7)
+    assert pool.bodies == first
+
+
+def test_table_reseeds_pools():
+    """
+    GIVEN a pool added to a scenario table
+    WHEN the configured `payload_seed` changes
+    THEN the pool is rebuilt from the new seed
+    """
+    config = live.LiveConfig(defaults={'payload_seed': 5})
+    table = ScenarioTable(config)
+    pool = table.add_pool(json_orders(size=4))
+    table.rebuild()
+    assert pool.bodies == json_orders(size=4, seed=5).bodies
+    config.update({'payload_seed': 6})
+    table.pick(0, 0)
+    assert pool.bodies == json_orders(size=4, seed=6).bodies
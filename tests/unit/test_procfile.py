@@ -71,3 +71,56 @@ def test_with_rls():
     with mock.patch('sys.stdout.write') as fake_sys:
         generate_procfile.create_procfile("opbeans-python:http://opbeans-python:3000", rls_env_string="opbeans-python:500")  # noqa E501
     fake_sys.assert_called_with('python: OPBEANS_BASE_URL=http://opbeans-python:3000 OPBEANS_NAME=opbeans-python molotov -v --duration 500 --delay 0.600 --uvloop molotov_scenarios.py\n')  # noqa E501
+
+
+def test_with_arrival(monkeypatch):
+    """
+    GIVEN a request to create a Procfile with an open-loop arrival process
+    WHEN the request is issued
+    THEN the RPM is passed as an arrival rate and Molotov does not delay
+    """
+    monkeypatch.setenv('OPBEANS_ARRIVAL', 'poisson')
+    with mock.patch('sys.stdout.write') as fake_sys:
+        generate_procfile.create_procfile("opbeans-python:http://opbeans-python:3000", rpm_env_string="opbeans-python:600")  # noqa E501
+    fake_sys.assert_called_with('python: OPBEANS_BASE_URL=http://opbeans-python:3000 OPBEANS_NAME=opbeans-python ARRIVAL_RATE=10.000 ARRIVAL_PROCESS=poisson molotov -v --duration 31536000 --delay 0 --uvloop molotov_scenarios.py\n')  # noqa E501
+
+
+def test_with_arrival_ws(monkeypatch):
+    """
+    GIVEN a request to create a Procfile with an arrival process and stats-d
+    WHEN the request is issued
+    THEN the arrival rate is passed and metrics still go to stats-d
+    """
+    monkeypatch.setenv('OPBEANS_ARRIVAL', 'fixed')
+    monkeypatch.setenv('WS', '1')
+    with mock.patch('sys.stdout.write') as fake_sys:
+        generate_procfile.create_procfile("opbeans-python:http://opbeans-python:3000", rpm_env_string="opbeans-python:600")  # noqa E501
+    fake_sys.assert_called_with('python: OPBEANS_BASE_URL=http://opbeans-python:3000 OPBEANS_NAME=opbeans-python ARRIVAL_RATE=10.000 ARRIVAL_PROCESS=fixed LOADGEN_STATSD_ADDRESS=udp://stats-d:8125 molotov -v --duration 31536000 --delay 0 --uvloop molotov_scenarios.py\n')  # noqa E501
+
+
+def test_with_engine(monkeypatch):
+    """
+    GIVEN a request to create a Procfile for the load engine
+    WHEN the request is issued
+    THEN a single engine process is configured with a job per URL
+    """
+    monkeypatch.setenv('OPBEANS_ENGINE', '1')
+    with mock.patch('sys.stdout.write') as fake_sys:
+        generate_procfile.create_procfile("opbeans-python:http://opbeans-python:3000,opbeans-java:http://opbeans-java:4000", rpm_env_string="opbeans-java:600")  # noqa E501
+    fake_sys.assert_called_once_with('loadgen: python -m loadgen.engine --socket /tmp/loadgen.sock --scenario molotov_scenarios.py --job opbeans-python http://opbeans-python:3000 0.600 31536000 --job opbeans-java http://opbeans-java:4000 0.100 31536000\n')  # noqa E501
+
+
+def test_with_engine_arrival_ws(monkeypatch):
+    """
+    GIVEN a request to create a Procfile for the load engine with an
+          arrival process and stats-d
+    WHEN the request is issued
+    THEN the engine sends metrics to stats-d and each job gets its
+         arrival rate and no delay
+    """
+    monkeypatch.setenv('OPBEANS_ENGINE', '1')
+    monkeypatch.setenv('OPBEANS_ARRIVAL', 'poisson')
+    monkeypatch.setenv('WS', '1')
+    with mock.patch('sys.stdout.write') as fake_sys:
+        generate_procfile.create_procfile("opbeans-python:http://opbeans-python:3000,opbeans-java:http://opbeans-java:4000", rpm_env_string="opbeans-java:600")  # noqa E501
+    fake_sys.assert_called_once_with('loadgen: LOADGEN_STATSD_ADDRESS=udp://stats-d:8125 ARRIVAL_PROCESS=poisson python -m loadgen.engine --socket /tmp/loadgen.sock --scenario molotov_scenarios.py --job opbeans-python http://opbeans-python:3000 0 31536000 --env opbeans-python ARRIVAL_RATE=1.667 --job opbeans-java http://opbeans-java:4000 0 31536000 --env opbeans-java ARRIVAL_RATE=10.000\n')  # noqa E501
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the registry of scenarios
+"""
+import json
+import os
+
+from dyno.app.registry import ScenarioRegistry
+
+SCENARIO = '''
+import os
+
+SERVICE_NAME = os.environ.get('OPBEANS_NAME', 'default')
+ERROR_WEIGHT = int(os.environ.get('ERROR_WEIGHT', 3))
+URLS = URLCatalogue(os.environ['OPBEANS_BASE_URL'])
+STATS_URL = URLS.join('api', 'stats')
+OOPSIE_URL = URLS.join('oopsie')
+
+
+@scenario(weight=8)
+async def scenario_stats(session):
+    pass
+
+
+if SERVICE_NAME.startswith(('opbeans-python', 'opbeans-go')):
+    @scenario(weight=ERROR_WEIGHT, tunable='error_weight')
+    async def scenario_oopsie(session):
+        pass
+'''
+
+
+def test_describe_python(tmp_path):
+    """
+    GIVEN a Python scenario file
+    WHEN the registry describes it
+    THEN its scenarios, weights, services, environment and endpoints are
+         found without importing it
+    """
+    (tmp_path / 'mine.py').write_text(SCENARIO)
+    meta = ScenarioRegistry(str(tmp_path)).get('mine')
+    assert meta['valid'] is True
+    assert meta['file'] == 'scenarios/mine.py'
+    assert meta['scenarios'] == [
+        {'name': 'scenario_stats', 'weight': 8, 'tunable': None,
+         'services': []},
+        {'name': 'scenario_oopsie', 'weight': 3, 'tunable': 'error_weight',
+         'services': ['opbeans-python', 'opbeans-go']},
+    ]
+    assert meta['services'] == ['opbeans-go', 'opbeans-python']
+    assert meta['env'] == ['ERROR_WEIGHT', 'OPBEANS_BASE_URL', 'OPBEANS_NAME']
+    assert meta['endpoints'] == ['/api/stats', '/oopsie']
+
+
+def test_invalid(tmp_path):
+    """
+    GIVEN scenarios which cannot be run
+    WHEN the registry describes them
+    THEN they are marked invalid with the reason
+    """
+    (tmp_path / 'broken.py').write_text('def oops(:\n')
+    (tmp_path / 'empty.py').write_text('import os\n')
+    (tmp_path / 'bad_spec.json').write_text(json.dumps({'scenarios': [{}]}))
+    (tmp_path / 'bad_capture.jsonl').write_text('not json\n')
+    (tmp_path / 'notes.txt').write_text('not a scenario')
+    registry = ScenarioRegistry(str(tmp_path))
+    scenarios = registry.scenarios()
+    assert set(scenarios) == {'broken', 'empty', 'bad_spec', 'bad_capture'}
+    assert not any(meta['valid'] for meta in scenarios.values())
+    assert scenarios['empty']['error'] == 'No scenarios are registered'
+    assert registry.get('notes') is None
+
+
+def test_refresh(tmp_path):
+    """
+    GIVEN a described scenario
+    WHEN its file is left alone, then changed, then removed
+    THEN it is only described again once changed, and forgotten once
+         removed
+    """
+    path = tmp_path / 'mine.py'
+    path.write_text(SCENARIO)
+    registry = ScenarioRegistry(str(tmp_path))
+    first = registry.get('mine')
+    assert registry.get('mine') is first
+    path.write_text('import os\n')
+    os.utime(str(path), ns=(1, 1))
+    assert registry.get('mine')['valid'] is False
+    path.unlink()
+    assert registry.get('mine') is None
+
+
+def test_precedence(tmp_path):
+    """
+    GIVEN a capture and a Python scenario of the same name
+    WHEN the name is looked up
+    THEN the capture is used, as it is when a job is launched
+    """
+    (tmp_path / 'both.py').write_text(SCENARIO)
+    (tmp_path / 'both.jsonl').write_text('{"path": "/"}\n')
+    registry = ScenarioRegistry(str(tmp_path))
+    assert registry.get('both')['kind'] == 'capture'
+    assert list(registry.scenarios()) == ['both']
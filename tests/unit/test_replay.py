@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the replay of recorded requests
+"""
+import asyncio
+import json
+
+from loadgen.live import LiveConfig
+from loadgen.replay import Replayer, parse, read
+from loadgen.shard import Shard
+
+
+class FakeResponse(object):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def read(self):
+        return b''
+
+
+class FakeSession(object):
+    """
+    Records when each request was sent, relative to the first
+    """
+    def __init__(self):
+        self.sent = []
+
+    def request(self, method, url, headers=None, data=None):
+        now = asyncio.get_event_loop().time()
+        self.start = getattr(self, 'start', now)
+        self.sent.append((round(now - self.start, 2), method, url, data))
+        return FakeResponse()
+
+
+def _capture(tmp_path, records):
+    path = tmp_path / 'capture.jsonl'
+    path.write_text(''.join(
+        (r if isinstance(r, str) else json.dumps(r)) + '\n' for r in records
+    ))
+    return str(path)
+
+
+def _run(replayer, duration):
+    session = FakeSession()
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(replayer.run(session, duration=duration))
+        loop.run_until_complete(asyncio.sleep(0.05))
+    finally:
+        loop.close()
+    return session.sent
+
+
+def test_parse():
+    """
+    GIVEN lines of a capture
+    WHEN they are parsed
+    THEN requests are filled in with their defaults and lines without a
+         request are None
+    """
+    assert parse(b'{"ts": 1.5, "path": "/api/types"}') == \
+        (1.5, 'GET', '/api/types', None, None)
+    assert parse(b'{"method": "post", "path": "/api/orders", '
+                 b'"body": {"customer_id": 1}}') == \
+        (0.0, 'POST', '/api/orders', None, b'{"customer_id": 1}')
+    assert parse(b'{"ts": 2}') is None
+    assert parse(b'not json') is None
+    assert parse(b'[1, 2]') is None
+
+
+def test_read_shards(tmp_path):
+    """
+    GIVEN a capture replayed by a job of two processes
+    WHEN each process reads it
+    THEN each gets every other line
+    """
+    path = _capture(tmp_path, [{'path': '/{}'.format(i)} for i in range(5)])
+    first = [r[2] for r in read(path, Shard(0, 2))]
+    second = [r[2] for r in read(path, Shard(1, 2))]
+    assert first == ['/0', '/2', '/4']
+    assert second == ['/1', '/3']
+
+
+def test_timing(tmp_path):
+    """
+    GIVEN a capture replayed at twice the recorded speed
+    WHEN a slice of it is replayed
+    THEN the requests are sent at half their recorded offsets, lines
+         which are not requests are skipped, and the requests which
+         are not due yet are left for the next slice
+    """
+    path = _capture(tmp_path, [
+        {'ts': 10.0, 'path': '/a'},
+        'garbage',
+        {'ts': 10.2, 'method': 'POST', 'path': '/b', 'body': 'x'},
+        {'ts': 10.6, 'path': '/c'},
+        {'ts': 20.0, 'path': '/d'},
+    ])
+    config = LiveConfig(defaults={'replay_speed': 2})
+    replayer = Replayer(config, path, 'http://opbeans:3000/')
+    sent = _run(replayer, 0.5)
+    assert sent == [
+        (0.0, 'GET', 'http://opbeans:3000/a', None),
+        (0.1, 'POST', 'http://opbeans:3000/b', b'x'),
+        (0.3, 'GET', 'http://opbeans:3000/c', None),
+    ]
+    assert replayer.counters['skipped'] == 1
+    assert replayer.counters['completed'] == 3
+    assert replayer._next[2] == '/d'
+
+
+def test_loop(tmp_path):
+    """
+    GIVEN a short capture
+    WHEN the replay reaches its end
+    THEN it starts over unless looping is off
+    """
+    path = _capture(tmp_path, [
+        {'ts': 0, 'path': '/a'},
+        {'ts': 0.1, 'path': '/b'},
+    ])
+    looping = Replayer(LiveConfig(defaults={}), path, 'http://opbeans')
+    assert len(_run(looping, 0.35)) >= 4
+    assert looping.counters['passes'] >= 2
+    once = Replayer(LiveConfig(defaults={'replay_loop': False}), path,
+                    'http://opbeans')
+    assert len(_run(once, 0.35)) == 2
+    assert once.counters['passes'] == 1
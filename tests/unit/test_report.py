@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the per-process stats snapshots
+"""
+from loadgen import report
+
+
+def test_merge():
+    """
+    GIVEN snapshots from two processes of the same job
+    WHEN they are merged
+    THEN the counters are summed and the timestamps span both processes
+    """
+    merged = report.merge([
+        {'pid': 1, 'started': 10.0, 'ts': 20.0, 'first_request': 12.0,
+         'connections': {'created': 2, 'reused': 8}},
+        {'pid': 2, 'started': 11.0, 'ts': 21.0, 'first_request': 11.5,
+         'connections': {'created': 3, 'reused': 7}},
+        ])
+    assert merged == {
+        'processes': 2,
+        'started': 10.0,
+        'first_request': 11.5,
+        'ts': 21.0,
+        'connections': {'created': 5, 'reused': 15},
+        }
+
+
+def test_write_read(tmp_path):
+    """
+    GIVEN a reporter writing to a job directory
+    WHEN the directory is read and then cleared
+    THEN the snapshot is found and then removed
+    """
+    reporter = report.Reporter(str(tmp_path))
+    reporter.add_source('connections', lambda: {'reused': 4})
+    reporter.write()
+    snapshots = report.read(str(tmp_path))
+    assert len(snapshots) == 1
+    assert snapshots[0]['connections'] == {'reused': 4}
+    report.clear(str(tmp_path))
+    assert report.read(str(tmp_path)) == []
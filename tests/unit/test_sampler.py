@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for IDs drawn ahead of time
+"""
+from collections import Counter
+
+import pytest
+
+from loadgen import live
+from loadgen.sampler import (
+    Sampler,
+    check,
+    hotspot,
+    sequential,
+    uniform,
+    zipf,
+)
+from loadgen.table import ScenarioTable
+from loadgen.urls import URLCatalogue
+
+
+def _draws(distribution, count=20000, **kw):
+    sampler = Sampler(distribution, seed=1, **kw)
+    return [sampler.next() for _ in range(count)]
+
+
+def test_distributions():
+    """
+    GIVEN uniform, Zipf and hotspot distributions
+    WHEN IDs are drawn from them
+    THEN the IDs are in range and as skewed as asked for
+    """
+    ids = Counter(_draws(uniform(10)))
+    assert set(ids) == set(range(10))
+    assert min(ids.values()) > 1600
+
+    ids = Counter(_draws(zipf(100, 1.0)))
+    assert max(ids) < 100
+    assert ids[0] > ids[1] > ids[9] > ids[99]
+    # The first of 100 IDs takes 1 / H(100), about 19%, of a Zipf law
+    assert 0.17 < ids[0] / 20000.0 < 0.21
+
+    ids = _draws(hotspot(100, keys=0.1, share=0.9))
+    hot = sum(1 for id_ in ids if id_ < 10) / float(len(ids))
+    assert 0.88 < hot < 0.92
+
+
+def test_invalid():
+    """
+    GIVEN parameters which do not make a distribution
+    WHEN the distribution is built
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        uniform(0)
+    with pytest.raises(ValueError):
+        zipf(10, -1)
+    with pytest.raises(ValueError):
+        hotspot(10, keys=0, share=0.5)
+
+
+def test_blocks():
+    """
+    GIVEN samplers with small blocks, drawn in the background or not
+    WHEN many IDs are taken from them
+    THEN both hand out the same IDs for the same seed, across blocks
+    """
+    first = _draws(zipf(50, 1.2), count=1000, block=64)
+    second = _draws(zipf(50, 1.2), count=1000, block=64, background=False)
+    assert first == second
+    sampler = Sampler(uniform(5), block=10, background=False)
+    for _ in range(25):
+        sampler.next()
+    assert sampler.counters['blocks'] == 4
+
+
+def test_reseed():
+    """
+    GIVEN a sampler part way through its IDs
+    WHEN it is reseeded
+    THEN it hands out the IDs of the new seed from the start
+    """
+    sampler = Sampler(uniform(1000), block=16, seed=3)
+    expected = [sampler.next() for _ in range(40)]
+    sampler.reseed(4)
+    sampler.reseed(3)
+    assert [sampler.next() for _ in range(40)] == expected
+
+
+def test_url_table(monkeypatch):
+    """
+    GIVEN a table of URLs with a sampler added to a seeded scenario table
+    WHEN URLs are picked
+    THEN they follow the sampler and are the same in every run
+    """
+    monkeypatch.setenv('OPBEANS_SEED', '9')
+    runs = []
+    for _ in range(2):
+        table = ScenarioTable(live.LiveConfig(defaults={}))
+        urls = URLCatalogue('http://opbeans:3000').ids(
+            'api/customers/{}', 1, 1000)
+        urls.sampler = table.add_sampler(Sampler(hotspot(1000, 0.01, 1.0)))
+        runs.append([urls.pick() for _ in range(100)])
+    assert runs[0] == runs[1]
+    assert all(int(url.rsplit('/', 1)[1]) <= 10 for url in runs[0])
+    assert table._sampler_counters()['blocks'] >= 1
+
+
+def test_sequential():
+    """
+    GIVEN a sequential distribution
+    WHEN IDs are drawn across several blocks
+    THEN every ID comes in turn, starting over after the last one
+    """
+    ids = _draws(sequential(7), count=30, block=4)
+    assert ids == [i % 7 for i in range(30)]
+
+
+def test_check():
+    """
+    GIVEN the ID distributions of a job
+    WHEN they are checked
+    THEN the defaults are filled in, and invalid ones are refused
+    """
+    spec = check({'distribution': 'hotspot', 'share': 0.9,
+                  'scenarios': {'scenario_orders_id': 'zipf'}})
+    assert spec == {
+        'distribution': 'hotspot', 'keys': 0.2, 'share': 0.9,
+        'scenarios': {
+            'scenario_orders_id': {'distribution': 'zipf', 'exponent': 1.0},
+        },
+    }
+    for invalid in ({'distribution': 'pareto'},
+                    {'distribution': 'zipf', 'keys': 0.1},
+                    {'distribution': 'zipf', 'exponent': 'steep'},
+                    {'distribution': 'hotspot', 'share': 2},
+                    {'scenarios': ['scenario_orders_id']},
+                    42):
+        with pytest.raises(ValueError):
+            check(invalid)
+
+
+def test_configured_ids():
+    """
+    GIVEN ID tables added to a table with their scenarios, and ID
+          distributions for the job and for one scenario
+    WHEN the configuration changes
+    THEN each scenario draws its IDs from its own distribution, or the
+         job's, and uniformly once the distributions are removed, and a
+         table which was not added is always uniform
+    """
+    urls = URLCatalogue('http://opbeans:3000')
+    customer_urls = urls.ids('api/customers/{}', 1, 1000)
+    order_urls = urls.ids('api/orders/{}', 1, 1000)
+    config = live.LiveConfig(defaults={'ids': {
+        'distribution': 'hotspot', 'keys': 0.01, 'share': 1.0,
+        'scenarios': {'scenario_orders_id': 'sequential'},
+    }})
+    table = ScenarioTable(config)
+    wrong_urls = urls.ids('api/customers/{}', 5000, 10000)
+
+    @table.scenario()
+    async def scenario_customers_id(session):
+        customer_urls.pick()
+
+    @table.scenario()
+    async def scenario_orders_id(session):
+        order_urls.pick()
+
+    @table.scenario()
+    async def scenario_wrong_customers_id(session):
+        wrong_urls.pick()
+
+    table.add_urls(customer_urls, 'scenario_customers_id')
+    table.add_urls(order_urls, 'scenario_orders_id')
+    table.rebuild()
+    assert wrong_urls.sampler is None
+    customers = [customer_urls.pick() for _ in range(100)]
+    assert all(int(url.rsplit('/', 1)[1]) <= 10 for url in customers)
+    assert [order_urls.pick() for _ in range(3)] == [
+        'http://opbeans:3000/api/orders/1',
+        'http://opbeans:3000/api/orders/2',
+        'http://opbeans:3000/api/orders/3',
+    ]
+    assert table._sampler_counters()['blocks'] >= 2
+
+    config.update({'ids': None})
+    table.rebuild()
+    assert customer_urls.sampler is None
+    assert order_urls.sampler is None
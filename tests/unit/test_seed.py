@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for seeded, reproducible load generation
+"""
+import contextvars
+import random
+
+from loadgen import live, seed
+from loadgen.payloads import json_orders
+from loadgen.table import ScenarioTable
+from loadgen.urls import URLCatalogue
+
+URLS = URLCatalogue('http://opbeans:3000').ids('api/customers/{}', 1, 1000)
+
+
+def _table(monkeypatch, value):
+    if value is None:
+        monkeypatch.delenv('OPBEANS_SEED', raising=False)
+    else:
+        monkeypatch.setenv('OPBEANS_SEED', str(value))
+    table = ScenarioTable(live.LiveConfig(defaults={}))
+    for name in ('scenario_seed_a', 'scenario_seed_b', 'scenario_seed_c'):
+        table.scenario(weight=1)(_noop(name))
+    return table
+
+
+def _noop(name):
+    async def scenario(session):
+        pass
+    scenario.__name__ = name
+    return scenario
+
+
+def _run(table, worker_id, steps=50):
+    """
+    Return the scenarios a worker picks and the URL each one requests,
+    in a context of its own as a Molotov worker has
+    """
+    def steps_():
+        ret = []
+        for step in range(steps):
+            ret.append((table.pick(worker_id, step), URLS.pick()))
+        return ret
+    return contextvars.copy_context().run(steps_)
+
+
+def test_stream():
+    """
+    GIVEN a seed
+    WHEN streams are derived from it
+    THEN the same keys give the same stream and other keys another
+    """
+    first = [seed.stream(42, 'worker', 0, 1).random() for _ in range(3)]
+    again = [seed.stream(42, 'worker', 0, 1).random() for _ in range(3)]
+    assert first == again
+    assert seed.stream(42, 'worker', 0, 2).random() != first[0]
+    assert seed.stream(43, 'worker', 0, 1).random() != first[0]
+
+
+def test_seeded_workers(monkeypatch):
+    """
+    GIVEN two runs of a job with the same seed
+    WHEN their workers pick scenarios and IDs
+    THEN each worker makes the same choices in both runs, and different
+         choices from the other workers
+    """
+    first = _table(monkeypatch, 7)
+    second = _table(monkeypatch, 7)
+    assert _run(first, 0) == _run(second, 0)
+    assert _run(first, 1) == _run(second, 1)
+    assert _run(first, 0) != _run(first, 1)
+    other = _table(monkeypatch, 8)
+    assert _run(other, 0) != _run(second, 0)
+
+
+def test_unseeded(monkeypatch):
+    """
+    GIVEN a job without a seed
+    WHEN its workers pick scenarios and IDs
+    THEN the choices come from the `random` module
+    """
+    table = _table(monkeypatch, None)
+    assert table.seed is None
+    assert seed.current() is random
+    assert _run(table, 0) != _run(table, 0)
+
+
+def test_seeded_payloads(monkeypatch):
+    """
+    GIVEN a seeded job without a `payload_seed`
+    WHEN its order bodies are built
+    THEN they are the same in every run with that seed
+    """
+    first = _table(monkeypatch, 7)
+    second = _table(monkeypatch, 7)
+    pools = [t.add_pool(json_orders(size=8)) for t in (first, second)]
+    first.rebuild()
+    second.rebuild()
+    assert pools[0].bodies == pools[1].bodies
+    assert pools[0].bodies != json_orders(size=8).bodies
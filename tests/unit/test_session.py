@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the shared worker session setup
+"""
+import asyncio
+from aiohttp import ClientSession, web
+from loadgen.session import SessionSetup
+
+
+async def _fetch_twice(setup):
+    async def hello(request):
+        return web.Response(text='hello')
+
+    app = web.Application()
+    app.router.add_get('/', hello)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        sessions = []
+        for worker_id in range(2):
+            session = ClientSession(**await setup.options(worker_id))
+            await setup.setup_session(worker_id, session)
+            sessions.append(session)
+        for session in sessions:
+            async with session.get('http://127.0.0.1:{}/'.format(port)) as resp:  # noqa
+                await resp.text()
+        for session in sessions:
+            await session.close()
+        setup.close()
+    finally:
+        await runner.cleanup()
+
+
+def test_connection_reuse():
+    """
+    GIVEN two worker sessions from the same session setup
+    WHEN each makes a request to the same target in turn
+    THEN the second request reuses the connection opened by the first
+    """
+    setup = SessionSetup({'pool_size': 10})
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(_fetch_twice(setup))
+    finally:
+        loop.close()
+    assert setup.counters['created'] == 1
+    assert setup.counters['reused'] == 1
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for load shapes
+"""
+import pytest
+
+from loadgen.shape import Shape
+
+
+def test_phases():
+    """
+    GIVEN a shape with a ramp, steps, spikes and a sine wave
+    WHEN its rate is asked for at different times
+    THEN each phase gives the rate it describes, in turn
+    """
+    shape = Shape([
+        {'type': 'ramp', 'from': 10, 'to': 110, 'duration': 10},
+        {'type': 'steps', 'rates': [200, 400], 'hold': 5},
+        {'type': 'spike', 'rate': 100, 'peak': 1000, 'every': 10,
+         'length': 2, 'duration': 20},
+        {'type': 'sine', 'mean': 300, 'amplitude': 100, 'period': 40},
+    ])
+    assert shape.rate(-1) == 0
+    assert shape.rate(0) == 10
+    assert shape.rate(5) == 60
+    assert shape.rate(12) == 200
+    assert shape.rate(17) == 400
+    assert shape.rate(21) == 100
+    assert shape.rate(28.5) == 1000
+    assert shape.rate(31) == 100
+    assert shape.rate(40) == pytest.approx(300)
+    assert shape.rate(50) == pytest.approx(400)
+    assert shape.rate(10 ** 6 + 40) == pytest.approx(300)
+
+
+def test_end():
+    """
+    GIVEN a shape whose every phase has a duration
+    WHEN it is over
+    THEN its last rate is kept and its phase is reported as done
+    """
+    shape = Shape([{'type': 'ramp', 'to': 50, 'duration': 10}])
+    assert shape.describe(4) == {'index': 0, 'type': 'ramp', 'elapsed': 4}
+    assert shape.rate(60) == 50
+    assert shape.describe(60) == {'index': 1, 'type': 'done', 'elapsed': 50}
+
+
+@pytest.mark.parametrize('spec', [
+    [],
+    {'type': 'ramp'},
+    [{'type': 'zigzag'}],
+    [{'type': 'ramp', 'to': 10}],
+    [{'type': 'constant', 'rate': -1}],
+    [{'type': 'constant', 'rate': float('nan')}],
+    [{'type': 'ramp', 'from': 0, 'to': 'NaN', 'duration': 10}],
+    [{'type': 'steps', 'rates': [], 'hold': 1}],
+    [{'type': 'spike', 'rate': 1, 'peak': 2, 'every': 1, 'length': 2}],
+    [{'type': 'constant', 'rate': 1}, {'type': 'constant', 'rate': 2}],
+])
+def test_invalid(spec):
+    """
+    GIVEN a shape which is not valid
+    WHEN it is parsed
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        Shape(spec)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for sharding a job across processes
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+from loadgen.arrival import ArrivalScheduler
+from loadgen.live import LiveConfig
+from loadgen.shard import Shard, ShardGroup, exit_code
+
+
+def test_split():
+    """
+    GIVEN a job split into shards
+    WHEN the workers and rate are divided between them
+    THEN every shard gets a fixed part and the parts add up to the whole
+    """
+    shards = [Shard(i, 4) for i in range(4)]
+    assert [s.split(10) for s in shards] == [3, 3, 2, 2]
+    assert sum(s.scale(100.0) for s in shards) == 100.0
+
+
+def test_interleave():
+    """
+    GIVEN shards of a job with a fixed arrival rate
+    WHEN each works out when to send first
+    THEN the shards' sends fall on distinct, evenly spaced wall-clock slots
+    """
+    config = LiveConfig(defaults={'rate': 100, 'arrival': 'fixed'})
+    interval = 4 / 100.0
+    for now in (1000.0, 1000.013, time.time()):
+        for i in range(4):
+            scheduler = ArrivalScheduler(config, None, shard=Shard(i, 4),
+                                         clock=lambda: now)
+            slot = (now + scheduler._offset(scheduler.rate())) / interval
+            assert abs(slot - round(slot - i / 4.0) - i / 4.0) < 1e-4
+
+
+def test_group():
+    """
+    GIVEN a command started as a group of shards
+    WHEN the process group of the first shard is signalled
+    THEN every shard knew its place and all of them stop
+    """
+    cmd = [
+        sys.executable,
+        '-c',
+        'import os, time; print(os.environ["LOADGEN_SHARD"], flush=True); time.sleep(30)'  # noqa
+    ]
+    group = ShardGroup(cmd, 3, dict(os.environ), stdout=subprocess.PIPE)
+    try:
+        assert len({os.getpgid(pid) for pid in group.pids}) == 1
+        shards = sorted(p.stdout.readline().strip() for p in group.processes)
+        assert shards == [b'0', b'1', b'2']
+        assert group.poll() is None
+    finally:
+        os.killpg(os.getpgid(group.pid), signal.SIGTERM)
+        for p in group.processes:
+            p.wait(5)
+            p.stdout.close()
+    assert group.poll() == -signal.SIGTERM
+
+
+def test_exit_code():
+    """
+    GIVEN the exit codes of the processes of a job
+    WHEN the exit code of the job is worked out
+    THEN a crashed process fails the job even while others run
+    """
+    assert exit_code([None, None]) is None
+    assert exit_code([0, None]) is None
+    assert exit_code([None, 2, None]) == 2
+    assert exit_code([0, -15]) == -15
+    assert exit_code([0, 0]) == 0
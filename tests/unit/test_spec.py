@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for declarative scenario specs
+"""
+import asyncio
+import json
+import os
+
+import pytest
+
+from loadgen import spec
+from loadgen.live import LiveConfig
+from loadgen.table import ScenarioTable
+
+SPEC = os.path.join(os.path.dirname(__file__),
+                    '../../scenarios/opbeans_spec.json')
+
+ROOT = os.path.join(os.path.dirname(__file__), '../..')
+
+
+class FakeResponse(object):
+    def __init__(self, status):
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class FakeSession(object):
+    def __init__(self, status=200):
+        self.status = status
+        self.sent = []
+
+    def request(self, method, url, data=None, headers=None):
+        self.sent.append((method, url, data, headers))
+        return FakeResponse(self.status)
+
+
+def _table():
+    return ScenarioTable(LiveConfig(defaults={'error_weight': 5}))
+
+
+def _names(table):
+    return [entry[0] for entry in table.entries]
+
+
+def test_install_for_service():
+    """
+    GIVEN the spec of the Opbeans scenarios
+    WHEN it is installed for two Opbeans
+    THEN each gets the scenarios available to it, with their weights
+    """
+    python = _table()
+    spec.install(spec.load(SPEC), python, 'http://opbeans:3000',
+                 'opbeans-python')
+    node = _table()
+    spec.install(spec.load(SPEC), node, 'http://opbeans:3000', 'opbeans-node')
+    assert 'scenario_oopsie' in _names(python)
+    assert 'scenario_throw_error' not in _names(python)
+    assert 'scenario_throw_error' in _names(node)
+    assert 'scenario_oopsie' not in _names(node)
+    weights = python.weights()
+    assert weights['scenario_stats'] == 8
+    assert weights['scenario_oopsie'] == 5
+    assert len(python.pools) == 2
+
+
+@pytest.mark.parametrize('path', [
+    'scenarios/opbeans_spec.json',
+    'scenarios/high_error_rates.json',
+    'molotov_scenarios.json',
+])
+def test_shipped(path):
+    """
+    GIVEN a spec which ships with the load generator
+    WHEN it is installed for each Opbean
+    THEN it is valid and every Opbean gets the common scenarios
+    """
+    loaded = spec.load(os.path.join(ROOT, path))
+    for service in ('opbeans-python', 'opbeans-node', 'opbeans-ruby'):
+        names = spec.install(loaded, _table(), 'http://opbeans:3000', service)
+        assert 'scenario_customers_id' in names
+
+
+def test_requests():
+    """
+    GIVEN scenarios compiled from a spec
+    WHEN they run
+    THEN they send pre-built requests and check the status, and only a
+         single range of IDs can be skewed
+    """
+    table = _table()
+    spec.install({'scenarios': [
+        {'name': 'one', 'path': 'api/customers/{}', 'params': [[3, 3]]},
+        {'name': 'two', 'path': 'api/products/{}/customers?limit={}',
+         'params': [[1, 1], [50, 50, 10]], 'status': [200, 404]},
+        {'name': 'three', 'method': 'post', 'path': 'api/orders',
+         'body': 'json_orders', 'headers': {'X-Test': '1'}},
+        {'name': 'four', 'path': 'oopsie', 'status': 500},
+    ]}, table, 'http://opbeans:3000', 'opbeans-python')
+    assert [names for _, names in table._urls.values()] == [['one']]
+    funcs = table.funcs
+    session = FakeSession(404)
+    loop = asyncio.new_event_loop()
+    try:
+        with pytest.raises(AssertionError):
+            loop.run_until_complete(funcs['one'](session))
+        loop.run_until_complete(funcs['two'](session))
+        session.status = 200
+        loop.run_until_complete(funcs['three'](session))
+        with pytest.raises(AssertionError):
+            loop.run_until_complete(funcs['four'](session))
+    finally:
+        loop.close()
+    assert session.sent[0] == (
+        'GET', 'http://opbeans:3000/api/customers/3', None, None)
+    assert session.sent[1][1] == \
+        'http://opbeans:3000/api/products/1/customers?limit=50'
+    method, url, data, headers = session.sent[2]
+    assert (method, url) == ('POST', 'http://opbeans:3000/api/orders')
+    assert json.loads(data)['lines']
+    assert headers == {'Content-Type': 'text/plain; charset=utf-8',
+                       'X-Test': '1'}
+
+
+@pytest.mark.parametrize('bad', [
+    [],
+    {'scenarios': [{'path': 'api'}]},
+    {'scenarios': [{'name': 'a', 'path': 'api/{}'}]},
+    {'scenarios': [{'name': 'a', 'path': 'api', 'weight': -1}]},
+    {'scenarios': [{'name': 'a', 'path': 'api', 'body': 'bricks'}]},
+    {'scenarios': [{'name': 'a', 'path': 'api', 'verb': 'GET'}]},
+    {'scenarios': [{'name': 'a', 'path': 'a'}, {'name': 'a', 'path': 'b'}]},
+    {'scenarios': [{'name': 'a', 'path': 'api/{}', 'params': [[5, 1]]}]},
+    {'scenarios': [{'name': 'a', 'path': 'api/{}/{}',
+                    'params': [[1, 2], [3, 1]]}]},
+    {'scenarios': [{'name': 'a', 'path': 'api/{}', 'params': [[1, 5, 0]]}]},
+    {'scenarios': [{'name': 'a', 'path': 'api/{}', 'params': [[1, 5, -1]]}]},
+    {'scenarios': [{'name': 'a', 'path': 'api', 'headers': 'x'}]},
+    {'scenarios': [{'name': 'a', 'path': 'api', 'headers': {'X-Test': 1}}]},
+    {'scenarios': [{'name': 'a', 'path': 'api', 'weight': True}]},
+    {'scenarios': [{'name': 'a', 'path': 'api', 'weight': float('nan')}]},
+    {'scenarios': [{'name': 'a', 'path': 'api/{}', 'params': [[0, True]]}]},
+    {'scenarios': [{'name': 'a', 'path': 'api', 'status': [200, False]}]},
+])
+def test_check(bad):
+    """
+    GIVEN a spec which is not valid
+    WHEN it is checked
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        spec.check(bad)
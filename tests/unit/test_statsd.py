@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the aggregating stats-d sink
+"""
+import random
+import socket
+from unittest import mock
+
+from loadgen.statsd import StatsdSink
+
+
+class StatsdStandIn(object):
+    """
+    A local UDP socket which stands in for stats-d and totals
+    what it receives
+    """
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.5)
+        self.address = 'udp://127.0.0.1:{}'.format(self.sock.getsockname()[1])
+        self.packets = []
+        self.counters = {}
+        self.timers = {}
+
+    def receive(self):
+        try:
+            while True:
+                packet = self.sock.recv(65536)
+                self.packets.append(packet)
+                self.sock.settimeout(0.05)
+                for line in packet.decode('utf-8').split('\n'):
+                    name, rest = line.split(':', 1)
+                    fields = rest.split('|')
+                    rate = float(fields[2][1:]) if len(fields) > 2 else 1.0
+                    if fields[1] == 'c':
+                        self.counters[name] = self.counters.get(name, 0) + int(fields[0]) / rate  # noqa
+                    else:
+                        self.timers[name] = self.timers.get(name, 0) + 1 / rate  # noqa
+        except socket.timeout:
+            pass
+        finally:
+            self.sock.close()
+
+
+def test_totals_conserved():
+    """
+    GIVEN a sink which has gathered many counters and timings
+    WHEN it is flushed to a stats-d stand-in
+    THEN the totals received match and every packet fits the MTU
+    """
+    standin = StatsdStandIn()
+    sink = StatsdSink(standin.address, mtu=512)
+    for i in range(3000):
+        name = 'molotov.host.GET.opbeans.path{}'.format(i % 7)
+        sink.increment(name + '.200')
+        sink.timing(name, i % 100)
+    sink.stop()
+    standin.receive()
+    assert sum(standin.counters.values()) == 3000
+    assert sum(standin.timers.values()) == 3000
+    assert sink.dropped == 0
+    assert len(standin.packets) < 3000 / 10
+    assert max(len(p) for p in standin.packets) <= 512
+
+
+def test_sample_rate():
+    """
+    GIVEN a sink which only keeps a quarter of its timings
+    WHEN it is flushed to a stats-d stand-in
+    THEN counts are exact and timings, scaled by the rate, come out right
+    """
+    standin = StatsdStandIn()
+    sink = StatsdSink(standin.address, sample_rate=0.25, rng=random.Random(1))
+    for i in range(4000):
+        sink.increment('molotov.requests.200')
+        sink.timing('molotov.requests', 10)
+    sink.stop()
+    standin.receive()
+    assert standin.counters['molotov.requests.200'] == 4000
+    assert 3600 <= standin.timers['molotov.requests'] <= 4400
+
+
+def test_resolved_once():
+    """
+    GIVEN a sink sending to stats-d by name
+    WHEN it flushes several times, and a send fails
+    THEN the name is only looked up again after the failure
+    """
+    standin = StatsdStandIn()
+    port = standin.address.rsplit(':', 1)[1]
+    sink = StatsdSink('udp://localhost:{}'.format(port))
+    lookup = socket.getaddrinfo
+    with mock.patch('socket.getaddrinfo', side_effect=lookup) as getaddrinfo:
+        for _ in range(3):
+            sink.increment('molotov.requests.200')
+            sink.flush()
+        assert getaddrinfo.call_count == 1
+        sink._sock.close()
+        sink.increment('molotov.requests.200')
+        sink.flush()
+        assert sink.dropped == 1
+        sink.increment('molotov.requests.200')
+        sink.stop()
+        assert getaddrinfo.call_count == 2
+    standin.receive()
+    assert standin.counters['molotov.requests.200'] == 4
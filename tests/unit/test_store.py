@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the persistent job store
+"""
+import os
+import signal
+import subprocess
+import sys
+from unittest import mock
+
+import dyno.app.api.control as control
+from dyno.app import store
+
+
+def _sleeper():
+    return subprocess.Popen(
+        [sys.executable, '-c', 'import time; time.sleep(60)'],
+        start_new_session=True
+    )
+
+
+def test_latest_record(tmp_path):
+    """
+    GIVEN a job store with several records for a job and a line cut short
+    WHEN it is read back
+    THEN the latest complete record of each job is returned
+    """
+    path = os.path.join(str(tmp_path), 'state', 'jobs.jsonl')
+    jobs = store.JobStore(path)
+    jobs.save('python', store.RUNNING, {'workers': 3})
+    jobs.save('go', store.RUNNING, {'workers': 1})
+    jobs.save('python', store.STOPPED, {'workers': 5})
+    with open(path, 'a') as fh_:
+        fh_.write('{"job": "go", "desi')
+    jobs = store.JobStore(path)
+    records = jobs.load()
+    assert records['python']['desired'] == store.STOPPED
+    assert records['python']['config'] == {'workers': 5}
+    assert records['go']['desired'] == store.RUNNING
+
+    with mock.patch.object(store, 'COMPACT_LINES', 3):
+        jobs.save('go', store.STOPPED, {'workers': 1})
+    with open(path) as fh_:
+        assert len(fh_.readlines()) == 2
+    assert jobs.load()['go']['desired'] == store.STOPPED
+
+
+def test_adopt(tmp_path):
+    """
+    GIVEN the record of a running job process
+    WHEN it is adopted
+    THEN the process is tracked until it exits, and a process which
+    does not match the record is not adopted
+    """
+    jobs = store.JobStore(os.path.join(str(tmp_path), 'jobs.jsonl'))
+    proc = _sleeper()
+    try:
+        jobs.save('python', store.RUNNING, {}, proc)
+        record = jobs.load()['python']
+        assert record['pids'] == [proc.pid]
+        adopted = store.adopt(record)
+        assert adopted.pid == proc.pid
+        assert adopted.poll() is None
+        assert store.adopt(dict(record, started=1)) is None
+    finally:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    assert adopted.poll() == 0
+    assert store.adopt(record) is None
+
+
+def test_recover(job_store):
+    """
+    GIVEN a job store from an earlier Dyno with a live job, a dead job
+    and a stopped job
+    WHEN Dyno recovers
+    THEN the live job is adopted, the dead job is launched again and
+    the stopped job is forgotten
+    """
+    config = {
+        'port': '8000', 'duration': '60', 'delay': '0.600',
+        'scenario': 'scenarios/molotov_scenarios.py', 'workers': '3',
+        'error_weight': '0', 'rate': 10,
+    }
+    proc = _sleeper()
+    dead = _sleeper()
+    os.killpg(dead.pid, signal.SIGKILL)
+    dead.wait()
+    job_store.save('python', store.RUNNING, dict(config, port='8001'), proc)
+    job_store.save('go', store.RUNNING, config, dead)
+    job_store.save('java', store.STOPPED, config)
+    try:
+        with mock.patch.dict(control.JOB_STATUS, clear=True), \
+                mock.patch.dict(control.JOB_MANAGER, clear=True), \
+                mock.patch.object(control, 'SUPERVISOR') as supervisor, \
+                mock.patch.object(control, '_launch_job') as launch:
+            control.recover()
+            assert control.JOB_MANAGER['python'].pid == proc.pid
+            assert control.JOB_STATUS['python']['port'] == '8001'
+            assert control.JOB_STATUS['python']['rate'] == 10
+            supervisor.watch.assert_called_once()
+            launch.assert_called_once_with('go', config)
+            assert 'java' not in control.JOB_STATUS
+    finally:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    assert sorted(job_store.load()) == ['go', 'python']
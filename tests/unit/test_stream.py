@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the live stats frames
+"""
+from unittest import mock
+
+from dyno.app.events import EventBus
+from dyno.app.stream import KEYFRAME_EVERY, StatsStream
+from loadgen.histogram import Histogram
+
+
+class FakeJob(object):
+    """
+    Produces the merged raw stats of a job, one tick at a time
+    """
+    def __init__(self):
+        self.ts = 100.0
+        self.ok = Histogram()
+        self.failed = Histogram()
+        self.in_flight = 0
+
+    def run(self, ok=0, failed=0, latency=10000, seconds=1.0):
+        for _ in range(ok):
+            self.ok.record(latency)
+        for _ in range(failed):
+            self.failed.record(latency)
+        self.ts += seconds
+
+    def stats(self):
+        return {
+            'processes': 1,
+            'ts': self.ts,
+            'latency': {'scenario_products': {
+                '200': self.ok.snapshot(),
+                '500': self.failed.snapshot(),
+            }},
+            'requests': {'in_flight': self.in_flight},
+        }
+
+
+def _stream(job, config, listening=True):
+    bus = EventBus()
+    bus.listening = mock.Mock(return_value=listening)
+    bus.publish = mock.Mock()
+    stream = StatsStream(
+        bus,
+        lambda: {'python': config},
+        lambda name: job.stats()
+    )
+    return stream, bus
+
+
+def _frames(bus):
+    return [c[0][1] for c in bus.publish.call_args_list]
+
+
+def test_frames():
+    """
+    GIVEN a running job with a subscriber
+    WHEN the stream ticks while the job sends requests
+    THEN a full frame with the rates of the last tick is followed by
+         frames holding only what changed
+    """
+    job = FakeJob()
+    stream, bus = _stream(job, {'error_weight': 2, 'app_latency_weight': 0})
+    stream.tick()
+    job.run(ok=90, failed=10)
+    job.in_flight = 4
+    stream.tick()
+    job.run(ok=50, latency=20000, seconds=0.5)
+    stream.tick()
+    first, second = _frames(bus)
+    assert first['full']
+    assert first['seq'] == 1
+    assert first['rps'] == 100.0
+    assert first['error_rate'] == 0.1
+    assert 9.8 <= first['p50'] <= 10.2
+    assert first['in_flight'] == 4
+    assert first['error_weight'] == 2
+    assert first['app_latency_weight'] == 0
+    assert 'full' not in second
+    assert 'rps' not in second
+    assert second['error_rate'] == 0.0
+    assert 19.6 <= second['p50'] <= 20.4
+    assert 'in_flight' not in second
+    assert 'error_weight' not in second
+    assert second['ts'] == job.ts
+    bus.publish.assert_called_with(
+        'stats', second, room='python', key='python', merge=True)
+
+
+def test_no_new_stats():
+    """
+    GIVEN a job whose processes did not write new stats since the last
+          tick
+    WHEN the stream ticks
+    THEN no frame is published
+    """
+    job = FakeJob()
+    stream, bus = _stream(job, {})
+    stream.tick()
+    job.run(ok=10)
+    stream.tick()
+    stream.tick()
+    assert len(_frames(bus)) == 1
+
+
+def test_keyframes():
+    """
+    GIVEN a stream of frames
+    WHEN a client subscribes or enough frames were sent
+    THEN the next frame holds every field
+    """
+    job = FakeJob()
+    stream, bus = _stream(job, {})
+    stream.tick()
+    for _ in range(3):
+        job.run(ok=10)
+        stream.tick()
+    assert ['full' in f for f in _frames(bus)] == [True, False, False]
+    stream.resync('python')
+    for _ in range(KEYFRAME_EVERY):
+        job.run(ok=10)
+        stream.tick()
+    full = [f['seq'] for f in _frames(bus) if f.get('full')]
+    assert full == [1, 4, KEYFRAME_EVERY]
+
+
+def test_no_subscribers():
+    """
+    GIVEN a running job nobody subscribed to
+    WHEN the stream ticks
+    THEN the stats of the job are not even read
+    """
+    job = FakeJob()
+    job.stats = mock.Mock()
+    stream, bus = _stream(job, {}, listening=False)
+    stream.tick()
+    job.stats.assert_not_called()
+    bus.publish.assert_not_called()
+
+
+def test_job_starts():
+    """
+    GIVEN a subscribed job whose processes have not written stats yet
+    WHEN their first stats come in
+    THEN the first frame covers the time since they started
+    """
+    job = FakeJob()
+    stats = job.stats
+    job.stats = mock.Mock(return_value={'processes': 0, 'latency': {}})
+    stream, bus = _stream(job, {})
+    stream.tick()
+    job.run(ok=20, seconds=2.0)
+    job.stats = lambda: dict(stats(), started=100.0)
+    stream.tick()
+    assert _frames(bus)[0]['rps'] == 10.0
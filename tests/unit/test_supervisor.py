@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the supervision of job processes
+"""
+import os
+import subprocess
+import sys
+import time
+from unittest import mock
+
+from dyno.app.supervisor import Supervisor
+from loadgen.shard import ShardGroup
+
+
+def _spawn(code):
+    return subprocess.Popen(
+        [sys.executable, '-c', code],
+        start_new_session=True
+    )
+
+
+def _wait_for(supervisor, job, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while job not in supervisor.exits:
+        assert time.monotonic() < deadline
+        supervisor.check()
+        time.sleep(0.05)
+    return supervisor.exits[job]
+
+
+def test_reap():
+    """
+    GIVEN a supervised process
+    WHEN the process exits
+    THEN it is reaped and its exit code and runtime are reported
+    """
+    on_exit = mock.Mock()
+    supervisor = Supervisor(on_exit=on_exit)
+    proc = _spawn('import sys; sys.exit(3)')
+    supervisor.watch('python', proc)
+    record = _wait_for(supervisor, 'python')
+    assert record['exit_code'] == 3
+    assert record['runtime'] >= 0
+    assert not record['stopped']
+    assert proc.returncode == 3
+    assert supervisor.children == {}
+    on_exit.assert_called_once_with('python', record)
+
+
+def test_restart_backoff():
+    """
+    GIVEN a job which crashes every time it is started
+    WHEN the supervisor restarts it
+    THEN the wait before each restart doubles
+    """
+    now = [0.0]
+    supervisor = Supervisor(clock=lambda: now[0])
+    restarts = []
+    crashed = mock.Mock()
+    crashed.poll.return_value = 1
+
+    def restart():
+        restarts.append(now[0])
+        supervisor.watch('python', crashed, restart)
+
+    supervisor.watch('python', crashed, restart)
+    for _ in range(80):
+        supervisor.check()
+        now[0] += 0.25
+    waits = [b - a for a, b in zip(restarts, restarts[1:])]
+    # Each crash is seen at the first check after the restart
+    assert restarts[0] == 1.0
+    assert waits[:3] == [2.25, 4.25, 8.25]
+    assert supervisor.exits['python']['restarts'] == len(restarts) + 1
+
+
+def test_stop_escalates():
+    """
+    GIVEN a supervised process which ignores SIGTERM
+    WHEN it is stopped
+    THEN it is killed once the grace period is over
+    """
+    supervisor = Supervisor(grace=0.5)
+    proc = _spawn(
+        'import signal, sys, time\n'
+        'signal.signal(signal.SIGTERM, signal.SIG_IGN)\n'
+        'sys.stdout.close()\n'
+        'time.sleep(60)'
+    )
+    supervisor.watch('python', proc, restart=mock.Mock())
+    time.sleep(0.5)
+    supervisor.stop('python', proc)
+    record = _wait_for(supervisor, 'python')
+    assert record['exit_code'] == -9
+    assert record['stopped']
+    assert supervisor.pending == {}
+
+
+def test_shard_crash():
+    """
+    GIVEN a job of three shards, one of which crashes
+    WHEN the supervisor checks the job
+    THEN the crash is recorded at once, the other shards are stopped
+         and the whole job is restarted
+    """
+    restart = mock.Mock()
+    supervisor = Supervisor(grace=5.0)
+    group = ShardGroup([
+        sys.executable,
+        '-c',
+        'import os, sys, time\n'
+        'if os.environ["LOADGEN_SHARD"] == "1":\n'
+        '    sys.exit(3)\n'
+        'time.sleep(60)',
+    ], 3, dict(os.environ))
+    supervisor.watch('python', group, restart)
+    record = _wait_for(supervisor, 'python')
+    assert record['exit_code'] == 3
+    assert not record['stopped']
+    deadline = time.monotonic() + 10
+    while supervisor.stopping or 'python' in supervisor.pending:
+        assert time.monotonic() < deadline
+        supervisor.check()
+        time.sleep(0.05)
+    assert not group.running()
+    assert supervisor.exits['python'] is record
+    restart.assert_called_once_with()
+
+
+def test_stop_leader_gone():
+    """
+    GIVEN a job of three shards whose first shard has already exited
+    WHEN the job is stopped
+    THEN the shards which are left are stopped too
+    """
+    supervisor = Supervisor(grace=5.0)
+    group = ShardGroup([
+        sys.executable,
+        '-c',
+        'import os, time\n'
+        'time.sleep(0.5 if os.environ["LOADGEN_SHARD"] == "0" else 60)',
+    ], 3, dict(os.environ))
+    supervisor.watch('python', group)
+    deadline = time.monotonic() + 10
+    while group.processes[0].poll() is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    supervisor.stop('python', group)
+    record = _wait_for(supervisor, 'python')
+    assert record['stopped']
+    assert not group.running()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for the pre-built scenario URLs
+"""
+from urllib.parse import urljoin
+from loadgen.urls import URLCatalogue
+
+BASE_URL = 'http://toxi:9999'
+
+
+def test_join():
+    """
+    GIVEN a URL catalogue for a base URL
+    WHEN a static path is joined
+    THEN the result matches what urljoin produces for the same fragments
+    """
+    urls = URLCatalogue(BASE_URL)
+    assert urls.join('api', 'products', 'top') == urljoin(BASE_URL, 'api/products/top')  # noqa
+
+
+def test_ids():
+    """
+    GIVEN a URL template with an ID range
+    WHEN a table is built from it
+    THEN every ID in the inclusive range maps to its URL
+    """
+    table = URLCatalogue(BASE_URL).ids('api/customers/{}', 5000, 10000)
+    assert len(table) == 5001
+    assert table[5000] == 'http://toxi:9999/api/customers/5000'
+    assert table[10000] == 'http://toxi:9999/api/customers/10000'
+    assert table.pick(lambda: 0.9999999) == table[10000]
+
+
+def test_product():
+    """
+    GIVEN a URL template with several parameter ranges
+    WHEN a table is built from it
+    THEN it holds one URL per combination of parameters
+    """
+    table = URLCatalogue(BASE_URL).product(
+        'api/products/{}/customers?limit={}', range(1, 7), range(50, 120, 10))
+    assert len(table) == 42
+    assert 'http://toxi:9999/api/products/6/customers?limit=110' in table.urls
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+
+"""
+Tests for forking warm Molotov jobs
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from loadgen.engine_client import WarmJob, ZygoteClient
+
+SCENARIO = '''
+import asyncio
+import molotov
+
+
+@molotov.scenario()
+async def scenario_wait(session):
+    await asyncio.sleep(0.1)
+'''
+
+
+@pytest.fixture
+def zygote(tmp_path):
+    path = os.path.join(str(tmp_path), 'zygote.sock')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'loadgen.zygote', '--socket', path],
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    )
+    client = ZygoteClient(path)
+    deadline = time.monotonic() + 30
+    while not client.ping():
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+    yield client
+    proc.kill()
+    proc.wait()
+
+
+def _wait(job, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while job.poll() is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+    return job.poll()
+
+
+def test_exit_codes(zygote, tmp_path):
+    """
+    GIVEN a zygote
+    WHEN it forks jobs which succeed and fail
+    THEN their exit codes are reported
+    """
+    ok = WarmJob(zygote, [zygote.spawn(['--version'], dict(os.environ))])
+    failed = WarmJob(zygote, [zygote.spawn(
+        ['-q', 'missing_scenario'],
+        dict(os.environ),
+        cwd=str(tmp_path)
+    )])
+    assert _wait(ok) == 0
+    assert _wait(failed) == 1
+
+
+def test_shards(zygote, tmp_path):
+    """
+    GIVEN a zygote
+    WHEN it forks the two shards of a job
+    THEN both run the scenario file in the process group of the first
+    """
+    (tmp_path / 'scenario.py').write_text(SCENARIO)
+    args = ['-q', '--duration', '30', 'scenario.py']
+    leader = zygote.spawn(args, dict(os.environ), cwd=str(tmp_path))
+    shard = zygote.spawn(args, dict(os.environ), cwd=str(tmp_path), leader=leader)  # noqa
+    job = WarmJob(zygote, [leader, shard])
+    try:
+        assert job.poll() is None
+        assert os.getpgid(shard) == leader
+    finally:
+        os.killpg(leader, signal.SIGTERM)
+    assert _wait(job) == -signal.SIGTERM